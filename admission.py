@@ -0,0 +1,297 @@
+"""Admission control: per-client rate limits and prioritized upstream concurrency.
+
+Requests are sorted into route classes (stream, search, suggest). Each
+client gets a token bucket per class, and every upstream call takes one of
+a fixed number of slots for its provider. When the slots are busy, calls
+wait in a bounded queue ordered by the priority of the request that made
+them, so resolving a stream someone is waiting to play goes ahead of
+searches and background work. Instead of letting queues grow, a request
+that can't be served soon is rejected with Overloaded, which the app
+turns into 429 (client over its rate) or 503 (server saturated) with a
+Retry-After.
+
+The priority travels in a context variable, which fan_out copies into its
+worker threads and asyncio copies into tasks.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import asynccontextmanager, contextmanager
+
+import config
+
+# Lower is served first
+PRIORITIES = {
+    'stream': 0,
+    'search': 1,
+    'suggest': 2,
+}
+BACKGROUND = 3  # home feed refreshes and anything outside a classified request
+
+_priority = contextvars.ContextVar('admission_priority', default=BACKGROUND)
+
+_rejections = defaultdict(int)  # (reason, route class or provider) -> count
+_rejections_lock = threading.Lock()
+
+
+class Overloaded(Exception):
+    """Rejected by admission control; ``status`` is 429 or 503"""
+
+    def __init__(self, message, status=503, retry_after=1.0):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    def retry_after_header(self):
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+def _reject(reason, label, message, status, retry_after):
+    with _rejections_lock:
+        _rejections[(reason, label)] += 1
+    return Overloaded(message, status, retry_after)
+
+
+def set_priority(route_class):
+    """Priority for the rest of this request (None: background)"""
+    _priority.set(PRIORITIES.get(route_class, BACKGROUND))
+
+
+def current_priority():
+    return _priority.get()
+
+
+# ==================== Per-client rate limits ====================
+class TokenBucket:
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now):
+        """0 if a token was taken, else seconds until one is available"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class ClientRateLimiter:
+    """Token buckets per (client, route class), for the most recent ``max_clients`` clients.
+
+    Buckets live in the worker process, so with several workers a client can
+    get up to that many times the configured rate.
+    """
+
+    def __init__(self, limits=None, max_clients=None):
+        self.limits = limits if limits is not None else config.RATE_LIMITS
+        self.max_clients = max_clients if max_clients is not None else config.RATE_LIMIT_CLIENTS
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, client, route_class):
+        """Raise Overloaded (429) if ``client`` is over its rate for ``route_class``"""
+        rate, burst = self.limits.get(route_class, (0, 0))
+        if rate <= 0:
+            return
+        now = time.monotonic()
+        key = (client, route_class)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(rate, burst, now)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            wait = bucket.take(now)
+        if wait:
+            raise _reject('rate_limited', route_class, 'Too many requests, slow down', 429, wait)
+
+
+rate_limiter = ClientRateLimiter()
+
+
+# ==================== Provider concurrency ====================
+class _Waiter:
+    __slots__ = ('granted', 'rejected', 'wake')
+
+    def __init__(self, wake):
+        self.granted = False
+        self.rejected = False
+        self.wake = wake
+
+
+class PriorityLimiter:
+    """At most ``limit`` concurrent calls; the rest wait, best priority first.
+
+    At most ``max_waiting`` calls wait at once. When the queue is full, a
+    call with a better priority than the worst waiter takes its place (the
+    waiter is rejected); otherwise the new call is rejected. A call that
+    waits longer than ``max_wait`` is rejected too. Works from threads
+    (slot) and from an asyncio loop (slot_async) alike.
+    """
+
+    def __init__(self, name, limit, max_waiting=None, max_wait=None):
+        self.name = name
+        self.limit = limit
+        self.max_waiting = max_waiting if max_waiting is not None else config.ADMISSION_QUEUE_SIZE
+        self.max_wait = max_wait if max_wait is not None else config.ADMISSION_MAX_WAIT
+        self.active = 0
+        self._waiters = []  # heap of (priority, seq, waiter)
+        self._waiting = 0   # waiters neither granted nor rejected
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _enter(self, priority, wake):
+        """A waiter already granted, or one queued to be woken; raises Overloaded if neither"""
+        with self._lock:
+            if self.active < self.limit and not self._waiting:
+                self.active += 1
+                waiter = _Waiter(wake)
+                waiter.granted = True
+                return waiter
+            if self._waiting >= self.max_waiting:
+                worst = max((entry for entry in self._waiters if not (entry[2].granted or entry[2].rejected)),
+                            key=lambda entry: (entry[0], entry[1]), default=None)
+                # No waiter to push out when the queue holds none (ADMISSION_QUEUE_SIZE=0)
+                if worst is None or worst[0] <= priority:
+                    raise _reject('queue_full', self.name, f'{self.name} is saturated, try again shortly', 503,
+                                  self.max_wait)
+                # Make room: the newest of the lowest-priority waiters goes
+                worst[2].rejected = True
+                self._waiting -= 1
+                worst[2].wake()
+            if len(self._waiters) > 4 * self.max_waiting:
+                # Drop entries of waiters that gave up, which release() would otherwise skip one by one
+                self._waiters = [entry for entry in self._waiters if not (entry[2].granted or entry[2].rejected)]
+                heapq.heapify(self._waiters)
+            waiter = _Waiter(wake)
+            heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+            self._waiting += 1
+            return waiter
+
+    def _settle(self, waiter):
+        """After waiting: return if the slot was handed over, else raise why not"""
+        with self._lock:
+            if waiter.granted:
+                return
+            if waiter.rejected:
+                reason = 'shed'  # pushed out by a higher-priority call
+            else:
+                reason = 'timed_out'
+                waiter.rejected = True
+                self._waiting -= 1
+        raise _reject(reason, self.name, f'{self.name} is saturated, try again shortly', 503, self.max_wait)
+
+    def _cancel(self, waiter):
+        with self._lock:
+            granted = waiter.granted
+            if not granted and not waiter.rejected:
+                waiter.rejected = True
+                self._waiting -= 1
+        if granted:
+            self.release()
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                _, _, waiter = heapq.heappop(self._waiters)
+                if waiter.granted or waiter.rejected:
+                    continue
+                # Hand the slot straight over; active stays the same
+                waiter.granted = True
+                self._waiting -= 1
+                waiter.wake()
+                return
+            self.active -= 1
+
+    @contextmanager
+    def slot(self, priority=None):
+        event = threading.Event()
+        waiter = self._enter(current_priority() if priority is None else priority, event.set)
+        if not waiter.granted:
+            event.wait(self.max_wait)
+            self._settle(waiter)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self, priority=None):
+        loop = asyncio.get_running_loop()
+        woken = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: woken.done() or woken.set_result(None))
+
+        waiter = self._enter(current_priority() if priority is None else priority, wake)
+        if not waiter.granted:
+            try:
+                await asyncio.wait_for(woken, self.max_wait)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                self._cancel(waiter)
+                raise
+            self._settle(waiter)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def saturated(self):
+        """True when a new call of the current priority would be rejected outright"""
+        priority = current_priority()
+        with self._lock:
+            if self._waiting < self.max_waiting:
+                return False
+            return all(entry[0] <= priority for entry in self._waiters
+                       if not (entry[2].granted or entry[2].rejected))
+
+    def stats(self):
+        with self._lock:
+            return {'active': self.active, 'waiting': self._waiting, 'limit': self.limit}
+
+
+provider_limits = {name: PriorityLimiter(name, limit) for name, limit in config.PROVIDER_CONCURRENCY.items()}
+
+
+def providers_for(route_class, provider):
+    """Providers a search or typeahead request is going to call"""
+    if route_class == 'suggest':
+        return ['saavn']
+    return ['saavn', 'youtube'] if provider in ('all', 'mixed') else [provider]
+
+
+def check_providers(providers):
+    """Shed a request up front when every provider it needs is saturated"""
+    limiters = [provider_limits[name] for name in providers if name in provider_limits]
+    if limiters and all(limiter.saturated() for limiter in limiters):
+        raise _reject('queue_full', ','.join(providers), 'Upstream providers are saturated, try again shortly',
+                      503, max(limiter.max_wait for limiter in limiters))
+
+
+def render_metrics():
+    """Prometheus gauges for provider slots plus rejection counters"""
+    lines = ['# TYPE provider_active_calls gauge']
+    for name, limiter in provider_limits.items():
+        lines.append(f'provider_active_calls{{provider="{name}"}} {limiter.stats()["active"]}')
+    lines.append('# TYPE provider_waiting_calls gauge')
+    for name, limiter in provider_limits.items():
+        lines.append(f'provider_waiting_calls{{provider="{name}"}} {limiter.stats()["waiting"]}')
+    lines.append('# TYPE admission_rejected_total counter')
+    with _rejections_lock:
+        rejections = sorted(_rejections.items())
+    for (reason, label), count in rejections:
+        lines.append(f'admission_rejected_total{{reason="{reason}",scope="{label}"}} {count}')
+    return lines
@@ -1,116 +1,327 @@
-from flask import Flask, render_template, request, jsonify, Response
-import requests
+from flask import Blueprint, Flask, render_template, request, jsonify, Response, g
 import json
+import logging
 from datetime import datetime, timedelta
 import re
 import base64
-import urllib3
-from Crypto.Cipher import DES
-from Crypto.Util.Padding import unpad
-import yt_dlp
-import traceback
-from fuzzywuzzy import fuzz
-from http.cookies import SimpleCookie
-import tempfile
 import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import wait as futures_wait
 
-# Disable SSL warnings
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+import config
+import http_client
+import metrics
+from cache import make_cache
+from catalog import TrackCatalog
+from fanout import FanOutResult, fan_out, fan_out_iter
+from home_feed import HomeFeed
+from log import configure_logging
+from pagination import InvalidCursor, SearchPage
+from prefetch import QueuePrefetcher, SkipPrefetch, StopPrefetch
+from admission import Overloaded
+from resilience import CircuitOpen, UpstreamError, hedged, provider_health
+from track import dumps, saavn_track
+import admission
+import pagination
+import resilience
+import responses
+from ytdlp_pool import ExtractionPoolFull, ExtractionTimeout, YtDlpPool
+import ytmusic_parse
 
-app = Flask(__name__)
+logger = logging.getLogger(__name__)
+
+# Routes and request hooks; create_app() registers them on a Flask app
+bp = Blueprint('music', __name__)
+
+# ==================== Search Cache ====================
+search_cache = make_cache('search', config.SEARCH_CACHE_SIZE)
+
+def search_cache_key(provider, query, limit):
+    """Cache key for a search: case and whitespace in the query don't matter"""
+    return (provider, ' '.join(query.lower().split()), limit)
+
+def cached_search(provider, query, limit, loader):
+    """Serve a provider search from the cache, loading it at most once per key.
+    
+    Empty results are not cached since every provider returns [] on error.
+    """
+    ttl = config.SEARCH_CACHE_TTLS.get(provider, 0)
+    return search_cache.get_or_load(
+        search_cache_key(provider, query, limit),
+        lambda: catalog_search(provider, query, limit, loader),
+        ttl=lambda results: ttl if results else 0
+    )
+
+# ==================== Track Catalog ====================
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_catalog():
+    """The process's TrackCatalog, opened on first use (None when disabled)"""
+    global _catalog
+    if _catalog is None and config.CATALOG_PATH:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = TrackCatalog(config.CATALOG_PATH)
+    return _catalog
+
+def catalog_search(provider, query, limit, loader):
+    """Answer a search from the local catalog if it can, else call ``loader`` and remember its answer"""
+    results = catalog_lookup(provider, query, limit)
+    if results is not None:
+        return results
+    results = loader()
+    catalog_remember(provider, query, limit, results)
+    return results
+
+def catalog_lookup(provider, query, limit):
+    """Catalog answer for a search, or None to go upstream"""
+    catalog = get_catalog()
+    if catalog is None:
+        return None
+    try:
+        with metrics.timed('catalog_lookup'):
+            return catalog.lookup(provider, query, limit)
+    except sqlite3.Error as e:
+        logger.warning('catalog lookup failed', extra={'provider': provider, 'query': query, 'error': e})
+        return None
+
+def catalog_remember(provider, query, limit, results):
+    # Empty answers are what providers return on error; don't remember them
+    catalog = get_catalog()
+    if catalog is None or not results:
+        return
+    try:
+        with metrics.timed('catalog_write'):
+            catalog.remember(provider, query, limit, results)
+    except sqlite3.Error as e:
+        logger.warning('catalog write failed', extra={'provider': provider, 'query': query, 'error': e})
+
+def catalog_add_tracks(tracks):
+    catalog = get_catalog()
+    if catalog is None or not tracks:
+        return
+    try:
+        with metrics.timed('catalog_write'):
+            catalog.add_tracks(tracks)
+    except sqlite3.Error as e:
+        logger.warning('catalog write failed', extra={'error': e})
 
 # ==================== JioSaavn API ====================
 class JioSaavnService:
-    BASE_URL = 'https://www.jiosaavn.com/api.php'
+    BASE_URL = config.SAAVN_BASE_URL
+    
+    DES_KEY = b'38346591'
+    DES_BLOCK_SIZE = 8
     
     @staticmethod
-    def decode_url(encrypted_url):
-        """Decrypt JioSaavn encrypted media URLs"""
+    def decode_url(encrypted_url, cipher=None):
+        """Decrypt JioSaavn encrypted media URLs
+        
+        Pass a cipher from new_cipher() to reuse it across many URLs.
+        """
+        from Crypto.Util.Padding import unpad
+        
         try:
-            key = b'38346591'
-            cipher = DES.new(key, DES.MODE_ECB)
-            encrypted_data = base64.b64decode(encrypted_url)
-            decrypted = unpad(cipher.decrypt(encrypted_data), DES.block_size)
-            decoded_url = decrypted.decode('utf-8')
-            decoded_url = re.sub(r'\.mp4.*', '.mp4', decoded_url)
-            decoded_url = re.sub(r'\.m4a.*', '.m4a', decoded_url)
-            return decoded_url.replace('http:', 'https:')
+            if cipher is None:
+                cipher = JioSaavnService.new_cipher()
+            with metrics.timed('des_decode'):
+                encrypted_data = base64.b64decode(encrypted_url)
+                decrypted = unpad(cipher.decrypt(encrypted_data), JioSaavnService.DES_BLOCK_SIZE)
+                decoded_url = decrypted.decode('utf-8')
+                decoded_url = re.sub(r'\.mp4.*', '.mp4', decoded_url)
+                decoded_url = re.sub(r'\.m4a.*', '.m4a', decoded_url)
+                return decoded_url.replace('http:', 'https:')
         except Exception as e:
-            print(f"Decode error: {e}")
+            logger.warning('saavn url decode failed', extra={'error': e})
             return None
     
+    @staticmethod
+    def new_cipher():
+        # Imported on first use, like the other heavy dependencies
+        from Crypto.Cipher import DES
+        return DES.new(JioSaavnService.DES_KEY, DES.MODE_ECB)
+    
+    @staticmethod
+    def _get(params, hedge=False):
+        """Call api.php under the JioSaavn circuit breaker and adaptive timeout
+        
+        With ``hedge``, a duplicate request is sent once the first one has
+        taken longer than the recent p95. Waits for a JioSaavn slot first
+        (raises Overloaded when none frees up in time).
+        """
+        health = provider_health['saavn']
+        with admission.provider_limits['saavn'].slot(), health.track() as read_timeout:
+            timeout = (config.HTTP_CONNECT_TIMEOUT, read_timeout)
+            fetch = lambda: http_client.get(JioSaavnService.BASE_URL, params=params, timeout=timeout)
+            with metrics.timed('saavn_fetch'):
+                response = hedged(fetch, health.hedge_delay() if hedge else None)
+            if response.status_code != 200:
+                raise UpstreamError(f'JioSaavn answered {response.status_code}')
+            with metrics.timed('saavn_json'):
+                return http_client.json_body(response)
+    
     @staticmethod
     def search(query, limit=20):
+        return cached_search('saavn', query, limit, lambda: JioSaavnService._search(query, limit))
+    
+    @staticmethod
+    def search_params(query):
+        return {
+            '__call': 'autocomplete.get',
+            '_format': 'json',
+            '_marker': '0',
+            'cc': 'in',
+            'includeMetaTags': '1',
+            'query': query
+        }
+    
+    @staticmethod
+    def parse_search_results(data, limit=20):
+        if 'songs' in data and 'data' in data['songs']:
+            return [saavn_track(song) for song in data['songs']['data'][:limit]]
+        return []
+    
+    @staticmethod
+    def search_page(query, page):
+        """SearchPage ``page`` (from 1) of search.getResults, which goes as deep as the catalog does
+        
+        autocomplete.get, behind search(), stops after its first handful of
+        songs. Raises on upstream errors; cached like search() but not
+        remembered in the catalog.
+        """
+        ttl = config.SEARCH_CACHE_TTLS['saavn']
+        return search_cache.get_or_load(
+            search_cache_key('saavn', query, ('page', page)),
+            lambda: JioSaavnService.parse_results_page(
+                JioSaavnService._get(JioSaavnService.results_params(query, page)), page),
+            ttl=lambda result: ttl if result.tracks else 0
+        )
+    
+    @staticmethod
+    def results_params(query, page):
+        return {
+            '__call': 'search.getResults',
+            '_format': 'json',
+            '_marker': '0',
+            'api_version': '4',
+            'ctx': 'web6dot0',
+            'cc': 'in',
+            'q': query,
+            'p': str(page),
+            'n': str(config.SAAVN_RESULTS_PAGE_SIZE)
+        }
+    
+    @staticmethod
+    def parse_results_page(data, page):
+        songs = [song for song in data.get('results') or [] if song.get('type', 'song') == 'song']
         try:
-            params = {
-                '__call': 'autocomplete.get',
-                '_format': 'json',
-                '_marker': '0',
-                'cc': 'in',
-                'includeMetaTags': '1',
-                'query': query
-            }
-            
-            response = requests.get(JioSaavnService.BASE_URL, params=params, verify=False)
-            data = response.json()
-            
-            results = []
-            
-            # Process songs
-            if 'songs' in data and 'data' in data['songs']:
-                for song in data['songs']['data'][:limit]:
-                    more_info = song.get('more_info', {})
-                    # Use 500x500 for good quality without slow loading
-                    image_url = song.get('image', '')
-                    if image_url:
-                        image_url = image_url.replace('150x150', '500x500').replace('50x50', '500x500')
-                    
-                    results.append({
-                        'id': song.get('id'),
-                        'title': song.get('title', ''),
-                        'artist': more_info.get('singers', song.get('subtitle', '')),
-                        'album': more_info.get('album', ''),
-                        'image': image_url,
-                        'duration': more_info.get('duration', ''),
-                        'year': song.get('year', ''),
-                        'language': song.get('language', ''),
-                        'has_320kbps': more_info.get('320kbps') == 'true',
-                        'type': 'song',
-                        'provider': 'saavn'
-                    })
-            
-            return results
+            total = int(data.get('total') or 0)
+        except (TypeError, ValueError):
+            total = 0
+        more = bool(data.get('results')) and page * config.SAAVN_RESULTS_PAGE_SIZE < total
+        return SearchPage([saavn_track(song) for song in songs], page + 1 if more else None)
+    
+    @staticmethod
+    def _search(query, limit=20):
+        try:
+            data = JioSaavnService._get(JioSaavnService.search_params(query), hedge=config.HEDGE_SAAVN_SEARCH)
+            return JioSaavnService.parse_search_results(data, limit)
+        
+        except (CircuitOpen, Overloaded):
+            # Not an empty answer: the fan-out reports the provider as missing
+            raise
         
         except Exception as e:
-            print(f"JioSaavn search error: {e}")
+            logger.warning('saavn search failed', extra={'query': query, 'error': e})
             return []
     
+    @staticmethod
+    def details_params(song_ids):
+        return {
+            '__call': 'song.getDetails',
+            'cc': 'in',
+            'pids': ','.join(song_ids),
+            '_format': 'json',
+            '_marker': '0'
+        }
+    
+    @staticmethod
+    def parse_song_details(data, song_id):
+        if isinstance(data, dict) and song_id in data:
+            return data[song_id]
+        elif isinstance(data, list) and len(data) > 0:
+            return data[0]
+        
+        return None
+    
     @staticmethod
     def get_song_details(song_id):
         """Get detailed song information including encrypted URL"""
         try:
-            params = {
-                '__call': 'song.getDetails',
-                'cc': 'in',
-                'pids': song_id,
-                '_format': 'json',
-                '_marker': '0'
-            }
+            data = JioSaavnService._get(JioSaavnService.details_params([song_id]))
             
-            response = requests.get(JioSaavnService.BASE_URL, params=params, verify=False)
-            data = response.json()
-            
-            if isinstance(data, dict) and song_id in data:
-                return data[song_id]
-            elif isinstance(data, list) and len(data) > 0:
-                return data[0]
-            
-            return None
+            return JioSaavnService.parse_song_details(data, song_id)
+        
+        except Overloaded:
+            raise
         
         except Exception as e:
-            print(f"JioSaavn details error: {e}")
+            logger.warning('saavn details failed', extra={'song_id': song_id, 'error': e})
             return None
     
+    @staticmethod
+    def get_songs_details(song_ids):
+        """Get details for several songs with one multi-pid request
+        
+        Returns {song_id: details} for the songs JioSaavn knew about.
+        """
+        if not song_ids:
+            return {}
+        
+        try:
+            data = JioSaavnService._get(JioSaavnService.details_params(song_ids))
+            
+            return JioSaavnService.parse_songs_details(data, song_ids)
+        
+        except Exception as e:
+            logger.warning('saavn batch details failed', extra={'songs': len(song_ids), 'error': e})
+            return {}
+    
+    @staticmethod
+    def parse_songs_details(data, song_ids):
+        # Keyed by pid, occasionally wrapped in a 'songs' list instead
+        if isinstance(data, dict) and isinstance(data.get('songs'), list):
+            songs = data['songs']
+        elif isinstance(data, dict):
+            songs = [data[song_id] for song_id in song_ids if isinstance(data.get(song_id), dict)]
+        elif isinstance(data, list):
+            songs = data
+        else:
+            songs = []
+        
+        details = {}
+        for song in songs:
+            if isinstance(song, dict) and song.get('id'):
+                details[song['id']] = song
+        return details
+    
+    @staticmethod
+    def stream_url_from_details(song_details, cipher=None):
+        """Decode the highest-quality streaming URL out of a song's details"""
+        more_info = song_details.get('more_info', {})
+        encrypted_url = song_details.get('encrypted_media_url', more_info.get('encrypted_media_url'))
+        
+        if encrypted_url:
+            decrypted_url = JioSaavnService.decode_url(encrypted_url, cipher)
+            if decrypted_url:
+                # Request the highest quality
+                return decrypted_url.replace('_96.mp4', '_320.mp4').replace('_96.m4a', '_320.m4a')
+        
+        return None
+    
     @staticmethod
     def get_song_url(song_id):
         """Get streaming URL for a song"""
@@ -120,66 +331,59 @@ class JioSaavnService:
             if not song_details:
                 return None
             
-            # Try to get the best quality URL
-            more_info = song_details.get('more_info', {})
-            encrypted_url = song_details.get('encrypted_media_url', more_info.get('encrypted_media_url'))
-            
-            if encrypted_url:
-                decrypted_url = JioSaavnService.decode_url(encrypted_url)
-                if decrypted_url:
-                    # Request the highest quality
-                    quality_url = decrypted_url.replace('_96.mp4', '_320.mp4').replace('_96.m4a', '_320.m4a')
-                    return quality_url
-            
-            return None
+            return JioSaavnService.stream_url_from_details(song_details)
+        
+        except Overloaded:
+            raise
         
         except Exception as e:
-            print(f"JioSaavn URL error: {e}")
+            logger.warning('saavn stream url failed', extra={'song_id': song_id, 'error': e})
             return None
     
+    @staticmethod
+    def get_song_urls(song_ids):
+        """Get streaming URLs for many songs: {song_id: url or None}
+        
+        Ids are sent in chunks of SAAVN_DETAILS_BATCH_SIZE pids per request and
+        every URL is decoded with the same cipher.
+        """
+        urls = dict.fromkeys(song_ids)
+        cipher = JioSaavnService.new_cipher()
+        batch_size = config.SAAVN_DETAILS_BATCH_SIZE
+        
+        for start in range(0, len(song_ids), batch_size):
+            details = JioSaavnService.get_songs_details(song_ids[start:start + batch_size])
+            for song_id, song_details in details.items():
+                if song_id in urls:
+                    urls[song_id] = JioSaavnService.stream_url_from_details(song_details, cipher)
+        
+        return urls
+    
+    TRENDING_PARAMS = {
+        '__call': 'content.getTrending',
+        '_format': 'json',
+        '_marker': '0',
+        'entity_type': 'song',
+        'entity_language': 'hindi'
+    }
+    
+    @staticmethod
+    def parse_trending(data, limit=15):
+        songs = data if isinstance(data, list) else []
+        return [saavn_track(song) for song in songs[:limit]]
+    
     @staticmethod
     def get_trending(limit=15):
         """Get trending/popular songs"""
         try:
-            params = {
-                '__call': 'content.getTrending',
-                '_format': 'json',
-                '_marker': '0',
-                'entity_type': 'song',
-                'entity_language': 'hindi'
-            }
-            
-            response = requests.get(JioSaavnService.BASE_URL, params=params, verify=False)
-            data = response.json()
-            
-            results = []
-            songs = data if isinstance(data, list) else []
-            
-            for song in songs[:limit]:
-                more_info = song.get('more_info', {})
-                # Use 500x500 for good quality without slow loading
-                image_url = song.get('image', '')
-                if image_url:
-                    image_url = image_url.replace('150x150', '500x500').replace('50x50', '500x500')
-                
-                results.append({
-                    'id': song.get('id'),
-                    'title': song.get('title', ''),
-                    'artist': more_info.get('singers', song.get('subtitle', '')),
-                    'album': more_info.get('album', ''),
-                    'image': image_url,
-                    'duration': more_info.get('duration', ''),
-                    'year': song.get('year', ''),
-                    'language': song.get('language', ''),
-                    'has_320kbps': more_info.get('320kbps') == 'true',
-                    'type': 'song',
-                    'provider': 'saavn'
-                })
+            data = JioSaavnService._get(JioSaavnService.TRENDING_PARAMS)
             
+            results = JioSaavnService.parse_trending(data, limit)
+            catalog_add_tracks(results)
             return results
         
         except Exception as e:
-            print(f"JioSaavn trending error: {e}")
+            logger.warning('saavn trending failed', extra={'error': e})
             return []
 
 # ==================== YouTube Music API ====================
@@ -225,405 +429,938 @@ class YtMusicService:
         self.context = self.initialize_context()
     
     def search(self, query, limit=10):
+        return cached_search('youtube', query, limit, lambda: self._search(query, limit))
+    
+    def search_page(self, query, continuation=None):
+        """SearchPage of a songs search: the first page, or the one ``continuation`` points to
+        
+        Cached whole, so search() and the pages after it share one fetch of
+        the first page. Raises on upstream errors.
+        """
+        ttl = config.SEARCH_CACHE_TTLS['youtube']
+        return search_cache.get_or_load(
+            search_cache_key('youtube', query, ('page', continuation)),
+            lambda: self._fetch_page(query, continuation),
+            ttl=lambda page: ttl if page.tracks else 0
+        )
+    
+    def search_request(self, query, continuation=None):
+        """(url, body, params) of a youtubei songs search, or of its page at ``continuation``"""
         if not self.headers:
             self.init()
         
         body = dict(self.context)
+        if continuation is not None:
+            # The query and filter are encoded in the token itself
+            params = dict(YTM_PARAMS, ctoken=continuation, continuation=continuation, type='next')
+            return f'{config.YTM_BASE_URL}/youtubei/v1/search', body, params
+        
         body['query'] = query
         body['params'] = 'EgWKAQIIAWoMEA4QChADEAQQCRAF'  # Songs filter
         
-        url = f'https://{YTM_DOMAIN}/youtubei/v1/search'
+        return f'{config.YTM_BASE_URL}/youtubei/v1/search', body, YTM_PARAMS
+    
+    def _fetch_page(self, query, continuation=None):
+        url, body, params = self.search_request(query, continuation)
         
-        try:
-            response = requests.post(url, headers=self.headers, json=body, params=YTM_PARAMS, verify=False)
+        health = provider_health['youtube']
+        
+        with admission.provider_limits['youtube'].slot(), health.track() as read_timeout:
+            timeout = (config.HTTP_CONNECT_TIMEOUT, read_timeout)
+            with metrics.timed('ytm_fetch'):
+                response = http_client.post(url, headers=self.headers, json=body, params=params, timeout=timeout)
             
             if response.status_code != 200:
-                return []
+                raise UpstreamError(f'YouTube Music answered {response.status_code}')
             
-            data = response.json()
-            results = self._parse_search_results(data, limit)
-            return results
+            with metrics.timed('ytm_json'):
+                data = http_client.json_body(response)
         
-        except Exception as e:
-            print(f"YouTube search error: {e}")
-            return []
+        with metrics.timed('ytm_parse'):
+            return SearchPage(*ytmusic_parse.parse_search_page(data))
     
-    def _parse_search_results(self, data, limit=10):
-        results = []
-        
+    def _search(self, query, limit=10):
         try:
-            contents = data.get('contents', {})
-            tabs = contents.get('tabbedSearchResultsRenderer', {}).get('tabs', [])
-            
-            if not tabs:
-                return []
-            
-            tab_content = tabs[0].get('tabRenderer', {}).get('content', {})
-            sections = tab_content.get('sectionListRenderer', {}).get('contents', [])
-            
-            for section in sections:
-                items = section.get('musicShelfRenderer', {}).get('contents', [])
-                
-                for item in items:
-                    if len(results) >= limit:
-                        break
-                        
-                    try:
-                        renderer = item.get('musicResponsiveListItemRenderer', {})
-                        
-                        # Get video ID
-                        video_id = renderer.get('playlistItemData', {}).get('videoId')
-                        if not video_id:
-                            continue
-                        
-                        # Get title
-                        title_runs = renderer.get('flexColumns', [{}])[0].get(
-                            'musicResponsiveListItemFlexColumnRenderer', {}
-                        ).get('text', {}).get('runs', [])
-                        title = title_runs[0].get('text', '') if title_runs else ''
-                        
-                        # Get artists and album
-                        subtitle_runs = []
-                        if len(renderer.get('flexColumns', [])) > 1:
-                            subtitle_runs = renderer.get('flexColumns', [])[1].get(
-                                'musicResponsiveListItemFlexColumnRenderer', {}
-                            ).get('text', {}).get('runs', [])
-                        
-                        artists = []
-                        album = ''
-                        duration = ''
-                        
-                        for run in subtitle_runs:
-                            text = run.get('text', '')
-                            endpoint = run.get('navigationEndpoint', {}).get('browseEndpoint', {})
-                            page_type = endpoint.get('browseEndpointContextSupportedConfigs', {}).get(
-                                'browseEndpointContextMusicConfig', {}
-                            ).get('pageType', '')
-                            
-                            if page_type == 'MUSIC_PAGE_TYPE_ARTIST':
-                                artists.append(text)
-                            elif page_type == 'MUSIC_PAGE_TYPE_ALBUM':
-                                album = text
-                            elif ':' in text and text.replace(':', '').replace(' ', '').isdigit():
-                                parts = text.split(':')
-                                if len(parts) == 2:
-                                    duration = str(int(parts[0]) * 60 + int(parts[1]))
-                        
-                        # Get thumbnail
-                        thumbnails = renderer.get('thumbnail', {}).get(
-                            'musicThumbnailRenderer', {}
-                        ).get('thumbnail', {}).get('thumbnails', [])
-                        image = thumbnails[0].get('url', '') if thumbnails else ''
-                        image = image.replace('w60-h60', 'w500-h500')
-                        
-                        results.append({
-                            'id': video_id,
-                            'title': title,
-                            'artist': ', '.join(artists),
-                            'album': album,
-                            'image': image,
-                            'duration': duration,
-                            'type': 'song',
-                            'provider': 'youtube'
-                        })
-                    
-                    except Exception as e:
-                        print(f"Error parsing item: {e}")
-                        continue
+            return self.search_page(query).tracks[:limit]
         
-        except Exception as e:
-            print(f"Error parsing search results: {e}")
+        except (CircuitOpen, Overloaded):
+            # Not an empty answer: the fan-out reports the provider as missing
+            raise
         
-        return results
-
-ytm_service = YtMusicService()
+        except Exception as e:
+            logger.warning('youtube search failed', extra={'query': query, 'error': e})
+            return []
 
 # ==================== YouTube Audio Extraction ====================
+ytdlp_pool = YtDlpPool(
+    workers=config.YTDLP_WORKERS,
+    queue_size=config.YTDLP_QUEUE_SIZE,
+    timeout=config.YTDLP_JOB_TIMEOUT,
+    mode=config.YTDLP_POOL_MODE
+)
+
 def get_youtube_audio_url(video_id):
-    """Extract direct audio URL from YouTube using yt-dlp"""
-    try:
-        print(f"Extracting audio URL for YouTube video: {video_id}")
-        
-        # Generate dynamic cookies using SimpleCookie
-        import random
-        import string
-        
-        cookie = SimpleCookie()
-        
-        # Use the CONSENT cookie that works
-        cookie['CONSENT'] = 'YES+1'
-        cookie['CONSENT']['domain'] = '.youtube.com'
-        cookie['CONSENT']['path'] = '/'
-        
-        # Generate realistic visitor ID
-        visitor_id = ''.join(random.choices(string.ascii_letters + string.digits + '_-', k=22))
-        cookie['VISITOR_INFO1_LIVE'] = visitor_id
-        cookie['VISITOR_INFO1_LIVE']['domain'] = '.youtube.com'
-        cookie['VISITOR_INFO1_LIVE']['path'] = '/'
-        
-        # Add PREF cookie
-        pref_value = f'tz=America.New_York&f6={random.randint(10000, 99999)}&f5={random.randint(20000, 29999)}'
-        cookie['PREF'] = pref_value
-        cookie['PREF']['domain'] = '.youtube.com'
-        cookie['PREF']['path'] = '/'
-        
-        # Create temporary cookie file
-        cookie_file = tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.txt')
-        cookie_file.write('# Netscape HTTP Cookie File\n')
-        cookie_file.write('# This is a generated file! Do not edit.\n\n')
-        
-        for key in cookie:
-            domain = cookie[key].get('domain', '.youtube.com')
-            path = cookie[key].get('path', '/')
-            secure = 'TRUE'
-            expires = '2147483647'  # Year 2038
-            name = key
-            value = cookie[key].value
-            cookie_file.write(f'{domain}\tTRUE\t{path}\t{secure}\t{expires}\t{name}\t{value}\n')
-        
-        cookie_file.close()
-        
-        try:
-            ydl_opts = {
-                'format': 'bestaudio/best',
-                'quiet': True,
-                'no_warnings': True,
-                'nocheckcertificate': True,
-                'socket_timeout': 30,
-                'http_chunk_size': 10485760,
-                'extractor_retries': 3,
-                'retries': 3,
-                'cookiefile': cookie_file.name,
-                'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'referer': 'https://www.youtube.com/',
-                'headers': {
-                    'Accept': '*/*',
-                    'Accept-Language': 'en',
-                    'Accept-Encoding': 'gzip, deflate',
-                    'Content-Type': 'application/json',
-                    'Origin': 'https://www.youtube.com',
-                    'Cookie': 'CONSENT=YES+1',
-                },
-                'extractor_args': {
-                    'youtube': {
-                        'player_client': ['android', 'web'],
-                        'skip': ['hls', 'dash', 'translated_subs']
-                    }
-                }
-            }
-            
-            url = f'https://www.youtube.com/watch?v={video_id}'
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                
-                # Try to get the best audio format URL directly
-                if 'url' in info:
-                    print(f"Found direct audio URL")
-                    return info['url']
-                
-                # Try to get the best audio format
-                if 'formats' in info:
-                    # Filter audio-only formats
-                    audio_formats = [f for f in info['formats'] 
-                                   if f.get('acodec') != 'none' and f.get('vcodec') == 'none']
-                    
-                    if audio_formats:
-                        # Sort by audio bitrate and get the best
-                        best_audio = max(audio_formats, key=lambda x: x.get('abr', 0) or 0)
-                        audio_url = best_audio.get('url')
-                        print(f"Found best audio format: {best_audio.get('format_note', 'unknown')} - {best_audio.get('abr', 0)}kbps")
-                        return audio_url
-                    
-                    # Fallback: get any format with audio
-                    for fmt in info['formats']:
-                        if fmt.get('acodec') != 'none' and fmt.get('url'):
-                            print(f"Using fallback format: {fmt.get('format_note', 'unknown')}")
-                            return fmt['url']
-                
-                print("No audio URL found")
-                return None
-        finally:
-            # Clean up cookie file
-            try:
-                os.unlink(cookie_file.name)
-            except:
-                pass
+    """Extract direct audio URL from YouTube using the yt-dlp worker pool
     
-    except Exception as e:
-        print(f"Error extracting YouTube audio: {e}")
-        traceback.print_exc()
-        return None
+    Raises ExtractionPoolFull / ExtractionTimeout when the pool can't take
+    or finish the job in time.
+    """
+    logger.debug('extracting youtube audio url', extra={'video_id': video_id})
+    audio_url = ytdlp_pool.extract(video_id)
+    if not audio_url:
+        logger.warning('no youtube audio url found', extra={'video_id': video_id})
+    return audio_url
+
+def submit_extractions(video_ids):
+    """Queue extractions on the yt-dlp pool: {video_id: Future, or ExtractionPoolFull if it had no room}"""
+    jobs = {}
+    for video_id in video_ids:
+        try:
+            jobs[video_id] = ytdlp_pool.submit(video_id)
+        except ExtractionPoolFull as e:
+            jobs[video_id] = e
+    return jobs
+
+def extraction_results(jobs):
+    """{video_id: audio URL, None or exception} for submit_extractions' jobs; unfinished ones are dropped"""
+    results = {}
+    for video_id, job in jobs.items():
+        if isinstance(job, Exception):
+            results[video_id] = job
+        elif not job.done():
+            # Drop it if it never started; a running job finishes in the background
+            job.cancel()
+            results[video_id] = ExtractionTimeout(
+                f'yt-dlp extraction of {video_id} took longer than {ytdlp_pool.timeout}s')
+        else:
+            results[video_id] = job.exception() or job.result()
+    return results
 
 # ==================== Mixed API ====================
 class MixedAPI:
     """Smart API that searches both JioSaavn and YouTube Music and returns best match"""
     
-    @staticmethod
-    def select_best_match(query, saavn_result, yt_result):
-        """Compare search results and select the best match using fuzzy string matching"""
-        # Create comparison strings
-        saavn_str = f"{saavn_result['title']} {saavn_result['artist']}".lower().strip()
-        yt_str = f"{yt_result['title']} {yt_result['artist']}".lower().strip()
-        query_lower = query.lower().strip()
-        
-        # Calculate similarity scores
-        saavn_ratio = fuzz.ratio(query_lower, saavn_str)
-        saavn_partial = fuzz.partial_ratio(query_lower, saavn_str)
-        
-        yt_ratio = fuzz.ratio(query_lower, yt_str)
-        yt_partial = fuzz.partial_ratio(query_lower, yt_str)
-        
-        # Use best score for each provider
-        saavn_score = max(saavn_ratio, saavn_partial)
-        yt_score = max(yt_ratio, yt_partial)
-        
-        print(f"MixedAPI - JioSaavn: '{saavn_str}' score={saavn_score}, YouTube: '{yt_str}' score={yt_score}")
-        
-        # Return the better match
-        if saavn_score >= yt_score:
-            print(f"Selected JioSaavn result (score: {saavn_score})")
-            return saavn_result
-        else:
-            print(f"Selected YouTube result (score: {yt_score})")
-            return yt_result
-    
     @staticmethod
     def search_mixed(query, limit=10):
         """Search both providers and return intelligently merged results"""
-        print(f"MixedAPI searching: {query}")
+        return MixedAPI.search_mixed_partial(query, limit=limit)[0]
+    
+    @staticmethod
+    def search_mixed_partial(query, limit=10):
+        """Like search_mixed, but returns (results, partial)"""
+        return MixedAPI.search_mixed_counts(query, limit=limit)[:2]
+    
+    @staticmethod
+    def search_mixed_counts(query, limit=10):
+        """Like search_mixed_partial, plus {provider: tracks it gave the merge} (see first_page_positions)"""
+        key = search_cache_key('mixed', query, limit)
+        cached = search_cache.get(key)
+        if cached is not None:
+            return cached, False, cached_merge_counts(query, ['saavn', 'youtube'], limit)
         
-        # Search both providers
-        saavn_results = JioSaavnService.search(query, limit=limit)
-        yt_results = ytm_service.search(query, limit=limit)
+        logger.debug('mixed search', extra={'query': query})
         
+        # Search both providers concurrently
+        fanned = search_providers(query, ['saavn', 'youtube'], limit=limit)
+        results = MixedAPI.merge_and_cache(query, fanned.results, fanned.partial, limit=limit)
+        return results, fanned.partial, first_page_counts(query, fanned.results)
+    
+    @staticmethod
+    def merge_and_cache(query, provider_results, partial, limit=10):
+        """Merge {provider: results} and cache the merge if every provider answered"""
+        results = MixedAPI.merge_results(
+            query,
+            provider_results.get('saavn', []),
+            provider_results.get('youtube', []),
+            limit=limit
+        )
+        # Only a complete merge is worth reusing
+        if results and not partial:
+            search_cache.set(search_cache_key('mixed', query, limit), results, config.SEARCH_CACHE_TTLS['mixed'])
+        return results
+    
+    @staticmethod
+    def merge_results(query, saavn_results, yt_results, limit=10):
+        """Merge results from both providers, keeping the better of each matched pair"""
         if not saavn_results and not yt_results:
             return []
         
         if not saavn_results:
-            print("Only YouTube results available")
+            logger.debug('mixed search: only youtube results available')
             return yt_results
         
         if not yt_results:
-            print("Only JioSaavn results available")
+            logger.debug('mixed search: only saavn results available')
             return saavn_results
         
-        # Match results from both providers and select best
-        merged_results = []
-        used_saavn_ids = set()
-        used_yt_ids = set()
-        
-        # For each JioSaavn result, try to find matching YouTube result
-        for saavn_item in saavn_results:
-            best_match = None
-            best_score = 80  # Minimum confidence threshold
-            
-            saavn_str = f"{saavn_item['title']} {saavn_item['artist']}".lower().strip()
-            
-            for yt_item in yt_results:
-                if yt_item['id'] in used_yt_ids:
-                    continue
-                
-                yt_str = f"{yt_item['title']} {yt_item['artist']}".lower().strip()
-                
-                # Check if they're the same song
-                ratio = fuzz.ratio(saavn_str, yt_str)
-                partial = fuzz.partial_ratio(saavn_str, yt_str)
-                score = max(ratio, partial)
-                
-                if score > best_score:
-                    best_score = score
-                    best_match = yt_item
-            
-            if best_match:
-                # Found a match - select the better one
-                selected = MixedAPI.select_best_match(query, saavn_item, best_match)
-                merged_results.append(selected)
-                used_saavn_ids.add(saavn_item['id'])
-                used_yt_ids.add(best_match['id'])
-            else:
-                # No match found, add JioSaavn result
-                merged_results.append(saavn_item)
-                used_saavn_ids.add(saavn_item['id'])
-        
-        # Add remaining YouTube results that weren't matched
-        for yt_item in yt_results:
-            if yt_item['id'] not in used_yt_ids:
-                merged_results.append(yt_item)
+        # Match results one-to-one across providers and keep the better of each pair
+        from matching import merge_tracks
         
-        print(f"MixedAPI returned {len(merged_results)} results")
-        return merged_results[:limit]
+        with metrics.timed('mixed_merge'):
+            merged_results = merge_tracks(query, saavn_results, yt_results, limit=limit)
+        logger.debug('mixed search merged', extra={'query': query, 'results': len(merged_results)})
+        return merged_results
 
 # ==================== Initialize Services ====================
 ytm_service = YtMusicService()
 
-# ==================== Routes ====================
+# ==================== Typeahead ====================
+# Suggestions per normalized prefix. A prefix missing here is first answered
+# by filtering the suggestions of its longest cached shorter prefix
+# ("arijit si" -> "arijit sin"); only if too few of those match does the
+# request go to JioSaavn's autocomplete.
+suggest_cache = make_cache('suggest', config.SUGGEST_CACHE_SIZE)
 
-@app.route('/')
-def index():
-    # Get popular songs to display on home page
-    popular_queries = ['Saiyara', 'War', 'Rolling', 'Where have you been']
-    trending_songs = []
+SUGGEST_TOKEN_PATTERN = re.compile(r'\w+')
+
+def suggest_prefix(query):
+    return ' '.join(query.lower().split())
+
+def matches_prefix(track, prefix):
+    """Every word of the prefix starts some word of the track's title, artist or album"""
+    words = SUGGEST_TOKEN_PATTERN.findall(f"{track.get('title', '')} {track.get('artist', '')} {track.get('album', '')}".lower())
+    return all(any(word.startswith(part) for word in words) for part in SUGGEST_TOKEN_PATTERN.findall(prefix))
+
+def suggestions_from_shorter_prefix(prefix):
+    """Suggestions filtered from the longest cached shorter prefix, or None"""
+    for end in range(len(prefix) - 1, config.SUGGEST_MIN_CHARS - 1, -1):
+        cached = suggest_cache.peek(prefix[:end])
+        if cached is None:
+            continue
+        matches = [track for track in cached if matches_prefix(track, prefix)]
+        return matches if len(matches) >= config.SUGGEST_MIN_RESULTS else None
+    return None
+
+def load_suggestions(prefix):
+    local = suggestions_from_shorter_prefix(prefix)
+    if local is not None:
+        return local
+    try:
+        results = JioSaavnService._search(prefix, config.SUGGEST_FETCH_LIMIT)
+    except CircuitOpen:
+        return []
+    catalog_add_tracks(results)
+    return results
+
+def suggest(query, limit=None):
+    """Typeahead suggestions (JioSaavn tracks) for a partially typed query"""
+    prefix = suggest_prefix(query)
+    if len(prefix) < config.SUGGEST_MIN_CHARS:
+        return []
+    results = suggest_cache.get_or_load(
+        prefix,
+        lambda: load_suggestions(prefix),
+        ttl=lambda results: config.SUGGEST_TTL if results else 0
+    )
+    return results[:limit or config.SUGGEST_LIMIT]
+
+# ==================== Provider Fan-out ====================
+# The planning and merging steps of a search are shared with the ASGI app:
+# async_providers.AsyncProviders supplies its own I/O (coroutines instead of
+# callables, fan_out_async instead of fan_out) around the same helpers.
+def search_providers(query, providers, limit=None):
+    """Search several providers in parallel, each bounded by its own deadline.
     
+    Deadlines adapt to each provider's recent latency. Providers whose
+    circuit breaker is open are skipped, which downgrades mixed/all searches
+    to the healthy provider. Returns a FanOutResult; providers that were
+    skipped or missed their deadline are listed in ``missing`` and
+    ``partial`` is set.
+    """
+    calls, skipped = provider_search_calls(query, providers, limit)
+    return with_skipped(fan_out(calls, deadlines=provider_deadlines(calls)), skipped)
+
+def provider_calls(providers, make_call):
+    """({name: make_call(name)}, [providers skipped because their circuit is open])"""
+    calls = {}
+    skipped = []
+    for name in providers:
+        if provider_health[name].is_open():
+            skipped.append(name)
+        else:
+            calls[name] = make_call(name)
+    if skipped:
+        logger.debug('skipping providers with open circuits', extra={'providers': ','.join(skipped)})
+    return calls, skipped
+
+def provider_deadlines(calls):
+    return {name: provider_health[name].timeout() for name in calls}
+
+def with_skipped(fanned, skipped):
+    """``fanned`` with the providers skipped before the fan-out counted as missing"""
+    if skipped:
+        return FanOutResult(fanned.results, True, fanned.missing + skipped)
+    return fanned
+
+def search_limit(name, limit):
+    """Tracks to ask provider ``name`` for: ``limit``, or its page size when None"""
+    return config.SEARCH_PAGE_SIZES[name] if limit is None else limit
+
+def provider_search_calls(query, providers, limit=None):
+    """({name: search callable}, [providers skipped because their circuit is open])"""
+    search_fns = {
+        'saavn': JioSaavnService.search,
+        'youtube': ytm_service.search,
+    }
+    def make_call(name):
+        fn, size = search_fns[name], search_limit(name, limit)
+        return lambda: fn(query, limit=size)
+    return provider_calls(providers, make_call)
+
+def search_plan(provider):
+    """(providers to query, per-provider limit or None for each one's page size) for a /search provider value"""
+    if provider == 'mixed':
+        return ['saavn', 'youtube'], config.SEARCH_PAGE_SIZES['mixed']
+    if provider == 'all':
+        return ['saavn', 'youtube'], None
+    if provider in ('saavn', 'youtube'):
+        return [provider], None
+    return [], None
+
+def final_results(query, provider, provider_results, partial):
+    """What /search answers once the provider results are in"""
+    if provider == 'mixed':
+        return MixedAPI.merge_and_cache(query, provider_results, partial, limit=search_plan('mixed')[1])
+    results = []
+    for name in search_plan(provider)[0]:
+        results.extend(provider_results.get(name, []))
+    return results
+
+def cached_first_page(query, provider):
+    """(results, partial, counts) of a first page answered by a cached Smart Mix merge, else None"""
+    if provider != 'mixed':
+        return None
+    providers, limit = search_plan(provider)
+    cached = search_cache.get(search_cache_key('mixed', query, limit))
+    if cached is None:
+        return None
+    return cached, False, cached_merge_counts(query, providers, limit)
+
+def first_page(query, provider, fanned):
+    """(results, partial, counts) of a first /search page from its provider fan-out"""
+    counts = first_page_counts(query, fanned.results)
+    return final_results(query, provider, fanned.results, fanned.partial), fanned.partial, counts
+
+def provider_event(name, value, provider_results, missing):
+    """The search event for one provider's fan-out outcome, noted in ``provider_results`` or ``missing``"""
+    if isinstance(value, Exception):
+        missing.append(name)
+        return {'event': 'missing', 'provider': name}
+    provider_results[name] = value
+    return {'event': 'provider', 'provider': name, 'results': value}
+
+def merged_event(query, provider, results, partial, counts):
+    return {'event': 'merged', 'results': results, 'partial': partial,
+            'next': first_page_cursor(query, provider, counts)}
+
+def search_events(query, provider):
+    """Progressive search: yield an event per provider as soon as it answers.
+    
+    Events are dicts:
+    
+    - ``{'event': 'provider', 'provider': name, 'results': [...]}``
+    - ``{'event': 'missing', 'provider': name}`` when a provider failed, missed
+      its deadline or was skipped by its circuit breaker
+    - ``{'event': 'merged', 'results': [...], 'partial': bool, 'next': cursor}``,
+      always last, with the same first page /search returns
+    """
+    cached = cached_first_page(query, provider)
+    if cached is not None:
+        yield merged_event(query, provider, *cached)
+        return
+    
+    providers, limit = search_plan(provider)
+    calls, missing = provider_search_calls(query, providers, limit)
+    for name in missing:
+        yield {'event': 'missing', 'provider': name}
+    
+    provider_results = {}
+    for name, value in fan_out_iter(calls, deadlines=provider_deadlines(calls)):
+        yield provider_event(name, value, provider_results, missing)
+    
+    fanned = FanOutResult(provider_results, bool(missing), missing)
+    yield merged_event(query, provider, *first_page(query, provider, fanned))
+
+# ==================== Search Pagination ====================
+# Where each provider's results start (see pagination): JioSaavn pages are
+# numbered, 0 being autocomplete.get and the rest search.getResults; YouTube
+# Music's first page has no token, the others their continuation
+FIRST_POSITIONS = {'saavn': [0, 0], 'youtube': [None, 0]}
+# Page tokens a cursor may carry: a JioSaavn page number (0 being the
+# autocomplete.get page), a youtubei continuation (None for the first page)
+PAGE_TOKENS = {
+    'saavn': lambda token: type(token) is int and 0 <= token <= config.SAAVN_MAX_PAGE,
+    'youtube': lambda token: token is None or isinstance(token, str),
+}
+
+def provider_page(provider, query, token):
+    """SearchPage of ``provider`` at page token ``token``"""
+    if provider == 'saavn':
+        if token == 0:
+            tracks = JioSaavnService.search(query, limit=config.SEARCH_PAGE_SIZES['saavn'])
+            return SearchPage(tracks, 1 if tracks else None)
+        return JioSaavnService.search_page(query, int(token))
+    if provider == 'youtube':
+        return ytm_service.search_page(query, token)
+    raise ValueError(f'Unknown provider: {provider}')
+
+def page_size(provider, name):
+    """Tracks a /search page for ``provider`` takes from provider ``name``"""
+    return config.SEARCH_PAGE_SIZES['mixed' if provider == 'mixed' else name]
+
+def upstream_head(query, tracks):
+    """True when ``tracks`` are the first YouTube Music results for ``query``, in upstream order"""
+    page = search_cache.peek(search_cache_key('youtube', query, ('page', None)))
+    return (page is not None and bool(tracks)
+            and [track['id'] for track in tracks] == [track['id'] for track in page.tracks[:len(tracks)]])
+
+def first_page_counts(query, provider_results):
+    """{provider: tracks it gave a first page} for first_page_positions
+    
+    YouTube is left out, so its next page starts over, unless its tracks
+    are the head of upstream's first page. A catalog answer (catalog_search)
+    is the catalog's best matches, and continuing at an offset into
+    upstream's page would skip results never shown.
+    """
+    return {name: len(tracks) for name, tracks in provider_results.items()
+            if name != 'youtube' or not tracks or upstream_head(query, tracks)}
+
+def cached_merge_counts(query, providers, limit):
+    """first_page_counts for a cached Smart Mix merge"""
+    # Only complete merges are cached: both providers gave their share
+    counts = dict.fromkeys(providers, limit)
+    if 'youtube' in counts and not upstream_head(
+            query, search_cache.peek(search_cache_key('youtube', query, limit)) or []):
+        del counts['youtube']
+    return counts
+
+def first_page_positions(providers, counts):
+    """Where each provider's results continue after a first /search page.
+    
+    ``counts`` is how many tracks each provider gave that page (see
+    first_page_counts). Providers missing from it (failed, skipped, answered
+    from the catalog) start over on the next page. The first JioSaavn page
+    comes from autocomplete.get, so the next one starts at the top of
+    search.getResults; the client drops songs it already shows.
+    """
+    positions = {}
+    for name in providers:
+        if name not in counts:
+            positions[name] = FIRST_POSITIONS[name]
+        elif not counts[name]:
+            positions[name] = None
+        elif name == 'saavn':
+            positions[name] = [1, 0]
+        else:
+            positions[name] = [None, counts[name]]
+    return positions
+
+def first_page_cursor(query, provider, counts):
+    return pagination.encode_cursor(query, provider, first_page_positions(search_plan(provider)[0], counts))
+
+def search_first_page(query, provider):
+    """(results, partial, counts) of /search without a cursor"""
+    cached = cached_first_page(query, provider)
+    if cached is not None:
+        return cached
+    providers, limit = search_plan(provider)
+    return first_page(query, provider, search_providers(query, providers, limit))
+
+def next_page_calls(provider, positions, make_walk):
+    """({name: make_walk(name, position, size)}, [skipped], positions) for the /search page at ``positions``
+    
+    Providers whose results ran out are left out; the returned positions
+    are updated by next_page with where each walk stopped.
+    """
+    next_positions = {name: positions.get(name) for name in search_plan(provider)[0]}
+    calls, skipped = provider_calls([name for name, position in next_positions.items() if position is not None],
+                                    lambda name: make_walk(name, next_positions[name], page_size(provider, name)))
+    return calls, skipped, next_positions
+
+def next_page(query, provider, fanned, next_positions):
+    """(results, partial, positions after them) from the fan-out of next_page_calls"""
+    provider_results = {}
+    for name, (tracks, position) in fanned.results.items():
+        provider_results[name] = tracks
+        next_positions[name] = position
+    
+    if provider == 'mixed':
+        results = MixedAPI.merge_results(query, provider_results.get('saavn', []), provider_results.get('youtube', []),
+                                         limit=page_size(provider, 'saavn'))
+    else:
+        results = final_results(query, provider, provider_results, fanned.partial)
+    return results, fanned.partial, next_positions
+
+def search_next_page(query, provider, positions):
+    """(results, partial, positions after them) of the /search page at ``positions``
+    
+    Each provider's tracks come from its own generator walk (fetching a page
+    only once the one before is used up), concurrently and under its
+    adaptive deadline. A provider that fails or is skipped keeps its
+    position, so the next page tries it again. Mixed pages merge the next
+    window of each provider the way the first page does; matching is
+    within a window.
+    """
+    def walk(name, position, size):
+        fetch_page = lambda token: provider_page(name, query, token)
+        return lambda: pagination.take(pagination.iter_tracks(fetch_page, position), size)
+    
+    calls, skipped, next_positions = next_page_calls(provider, positions, walk)
+    fanned = with_skipped(fan_out(calls, deadlines=provider_deadlines(calls)), skipped)
+    return next_page(query, provider, fanned, next_positions)
+
+# ==================== Stream Resolution ====================
+stream_cache = make_cache('stream', config.STREAM_CACHE_SIZE)
+
+# Expiry timestamps embedded in signed CDN URLs: googlevideo's ``expire=``,
+# CloudFront's ``Expires=`` and Akamai's ``hdnea=exp=...``
+STREAM_EXPIRY_PATTERN = re.compile(r'(?:[?&~]|hdnea=)(?:expire|Expires|exp)=(\d{9,})')
+
+def stream_url_ttl(provider, url):
+    """Seconds a resolved stream URL may be reused (0 = don't cache)"""
+    if not url:
+        return 0
+    match = STREAM_EXPIRY_PATTERN.search(url)
+    if match:
+        remaining = int(match.group(1)) - time.time() - config.STREAM_EXPIRY_MARGIN
+        return max(remaining, 0)
+    return config.STREAM_URL_TTLS.get(provider, 0)
+
+def stream_loader(provider, song_id):
+    """Function fetching the track's stream URL from its provider, or None for an unknown provider"""
+    if provider == 'saavn':
+        return lambda: JioSaavnService.get_song_url(song_id)
+    if provider == 'youtube':
+        # Use yt-dlp to extract direct audio URL
+        return lambda: get_youtube_audio_url(song_id)
+    return None
+
+def resolve_stream_url(provider, song_id):
+    """Resolve a playable URL, reusing a previous resolution until it expires.
+    
+    Concurrent resolutions of the same (provider, id) share one upstream call.
+    """
+    loader = stream_loader(provider, song_id)
+    if loader is None:
+        return None
+    
+    return stream_cache.get_or_load(
+        (provider, song_id),
+        loader,
+        ttl=lambda url: stream_url_ttl(provider, url)
+    )
+
+def resolve_stream_urls(tracks):
+    """Resolve many (provider, id) pairs at once: {(provider, id): url or error}
+    
+    Cached URLs are reused; JioSaavn misses go out as multi-pid requests and
+    YouTube misses are extracted concurrently. Failures map to an exception.
+    """
+    resolved, saavn_ids, youtube_ids = plan_stream_urls(tracks)
+    deadline = time.monotonic() + ytdlp_pool.timeout
+    
+    # Straight onto the yt-dlp workers: a 20s extraction must not hold a fan-out thread searches need
+    jobs = submit_extractions(youtube_ids)
+    saavn_urls = {}
+    if saavn_ids:
+        try:
+            saavn_urls = JioSaavnService.get_song_urls(saavn_ids)
+        except Exception as e:
+            logger.warning('batch stream resolution failed', extra={'provider': 'saavn', 'error': e})
+    
+    pending = [job for job in jobs.values() if not isinstance(job, Exception)]
+    futures_wait(pending, timeout=max(deadline - time.monotonic(), 0))
+    return finish_stream_urls(tracks, resolved, saavn_urls, extraction_results(jobs))
+
+def plan_stream_urls(tracks):
+    """({key: cached url or error}, JioSaavn ids to fetch, YouTube ids to extract) for resolve_stream_urls
+    
+    At most STREAM_BATCH_MAX_YOUTUBE extractions per batch; the tracks past
+    that come back as errors, to be resolved on their own later.
+    """
+    resolved = {}
+    saavn_ids = []
+    youtube_ids = []
+    
+    for provider, song_id in dict.fromkeys(tracks):
+        url = stream_cache.get((provider, song_id))
+        if url:
+            resolved[(provider, song_id)] = url
+        elif provider == 'saavn':
+            saavn_ids.append(song_id)
+        elif provider == 'youtube' and len(youtube_ids) >= config.STREAM_BATCH_MAX_YOUTUBE:
+            resolved[(provider, song_id)] = LookupError('Too many YouTube tracks in one batch, resolve this one later')
+        elif provider == 'youtube':
+            youtube_ids.append(song_id)
+        else:
+            resolved[(provider, song_id)] = ValueError(f'Unknown provider: {provider}')
+    return resolved, saavn_ids, youtube_ids
+
+def finish_stream_urls(tracks, resolved, saavn_urls, youtube_urls):
+    """resolve_stream_urls' answer: new URLs cached, anything unresolved an exception"""
+    for song_id, url in saavn_urls.items():
+        resolved[('saavn', song_id)] = url
+        stream_cache.set(('saavn', song_id), url, stream_url_ttl('saavn', url))
+    for video_id, url in youtube_urls.items():
+        resolved[('youtube', video_id)] = url
+        if not isinstance(url, Exception):
+            stream_cache.set(('youtube', video_id), url, stream_url_ttl('youtube', url))
+    
+    for key in dict.fromkeys(tracks):
+        if not resolved.get(key):
+            resolved[key] = LookupError(f'Could not get stream URL from {key[0]}')
+    return resolved
+
+# ==================== Play-queue Prefetch ====================
+def prefetch_stream_url(provider, song_id):
+    """Resolve an upcoming track into the stream cache without getting in the way of plays
+
+    Prefetch threads never set a priority, so their upstream calls run at
+    background priority, behind /stream and searches. A YouTube extraction
+    only starts on an idle yt-dlp worker; a play would otherwise queue behind it.
+    
+    A prefetch never leads the stream cache's single-flight: a play asking
+    for the same track would wait on it at background priority. It skips a
+    track some play is resolving already, and otherwise loads on its own.
+    """
+    key = (provider, song_id)
+    cached = stream_cache.peek(key)
+    if cached:
+        return cached
+    if stream_cache.loading(key):
+        raise SkipPrefetch('a play is resolving it')
+    loader = stream_loader(provider, song_id)
+    if loader is None:
+        return None
+    if provider == 'youtube' and not ytdlp_pool.idle_workers():
+        raise StopPrefetch('yt-dlp workers are busy')
     try:
-        for query in popular_queries:
-            songs = JioSaavnService.search(query, limit=1)
-            if songs:
-                trending_songs.extend(songs)
-        
-        return render_template('index.html', trending_songs=trending_songs)
-    except:
-        return render_template('index.html', trending_songs=[])
+        url = loader()
+    except (Overloaded, ExtractionPoolFull) as e:
+        raise StopPrefetch(str(e)) from e
+    stream_cache.set(key, url, stream_url_ttl(provider, url))
+    return url
+
+queue_prefetcher = QueuePrefetcher(
+    prefetch_stream_url,
+    workers=config.PREFETCH_WORKERS,
+    max_tracks=config.PREFETCH_AHEAD,
+    budget=config.PREFETCH_BUDGET,
+    max_pending=config.PREFETCH_QUEUE_SIZE
+)
+
+def parse_track_keys(tracks):
+    """(provider, id) pairs from a JSON list of {"id", "provider"} objects, or None if malformed"""
+    if not isinstance(tracks, list):
+        return None
+    keys = []
+    for track in tracks:
+        if not isinstance(track, dict) or not track.get('id'):
+            return None
+        keys.append((track.get('provider', 'saavn'), str(track['id'])))
+    return keys
+
+# ==================== Home Feed ====================
+def build_home_feed():
+    """Fetch trending songs and the curated picks concurrently"""
+    calls = {'trending': lambda: JioSaavnService.get_trending(limit=config.HOME_FEED_TRENDING_LIMIT)}
+    for i, query in enumerate(config.HOME_FEED_QUERIES):
+        calls[f'curated:{i}'] = lambda query=query: JioSaavnService.search(query, limit=1)
+    fanned = fan_out(calls, deadlines={}, default_deadline=config.HTTP_READ_TIMEOUT)
+    
+    # Curated picks first, in configured order, then trending
+    tracks = []
+    for i in range(len(config.HOME_FEED_QUERIES)):
+        tracks.extend(fanned.results.get(f'curated:{i}', []))
+    tracks.extend(fanned.results.get('trending', []))
+    
+    unique_tracks = []
+    seen_ids = set()
+    for track in tracks:
+        if track['id'] not in seen_ids:
+            seen_ids.add(track['id'])
+            unique_tracks.append(track)
+    return unique_tracks
+
+# One snapshot per interval for all workers when the cache backend is shared
+home_feed_cache = make_cache('home_feed', 1)
+
+home_feed = HomeFeed(
+    build_home_feed,
+    interval=config.HOME_FEED_REFRESH_INTERVAL,
+    retry_interval=config.HOME_FEED_RETRY_INTERVAL,
+    cache=home_feed_cache
+)
+
+# ==================== Instrumentation ====================
+@bp.before_app_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    metrics.start_request()
+
+@bp.after_app_request
+def record_request_timing(response):
+    total = time.perf_counter() - g.get('request_start', time.perf_counter())
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.request_seconds.observe(total, route, request.method, str(response.status_code))
+    response.headers['Server-Timing'] = metrics.server_timing_header(metrics.request_timings(), total)
+    return response
+
+# ==================== Response Encoding ====================
+# Registered after record_request_timing, so it runs first and its time is counted
+@bp.after_app_request
+def encode_response(response):
+    """ETag / 304, Cache-Control and compression for complete JSON and HTML answers"""
+    if response.is_streamed or response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return response
+    with metrics.timed('encode'):
+        status, body, headers = responses.finish(
+            request.method, request.path, response.status_code, response.mimetype, response.get_data(),
+            request.headers.get('If-None-Match'), request.headers.get('Accept-Encoding'),
+            response.headers.get('Cache-Control')
+        )
+    if headers:
+        response.status_code = status
+        response.set_data(body)
+        for name, value in headers.items():
+            if name == 'Vary':
+                response.vary.add(value)
+            else:
+                response.headers[name] = value
+    return response
+
+# ==================== Admission Control ====================
+# Route class of each rate-limited path, for both apps; the class also sets
+# the priority of the request's upstream calls (admission.PRIORITIES)
+ROUTE_CLASSES = {
+    '/stream': 'stream',
+    '/stream/batch': 'stream',
+    '/search': 'search',
+    '/search/stream': 'search',
+    '/suggest': 'suggest',
+    '/queue/prefetch': 'prefetch',
+}
+
+def client_id():
+    if config.RATE_LIMIT_TRUST_FORWARDED_FOR and request.access_route:
+        return request.access_route[0]
+    return request.remote_addr
+
+@bp.before_app_request
+def admit_request():
+    route_class = ROUTE_CLASSES.get(request.url_rule.rule) if request.url_rule else None
+    admission.set_priority(route_class)
+    if route_class is None:
+        return
+    admission.rate_limiter.check(client_id(), route_class)
+    if route_class in ('search', 'suggest'):
+        # Streams can push searches out of the queue; searches can't even queue, so fail now
+        admission.check_providers(admission.providers_for(route_class, request.args.get('provider', 'all')))
+
+def overloaded_response(e):
+    return jsonify({'error': str(e)}), e.status, {'Retry-After': e.retry_after_header()}
+
+@bp.app_errorhandler(Overloaded)
+def handle_overloaded(e):
+    logger.info('request shed', extra={'path': request.path, 'status': e.status, 'error': e})
+    return overloaded_response(e)
+
+# ==================== App Shell ====================
+# The page links its static files as /static/<name>?v=<hash of the file>.
+# A versioned URL never changes content, so it is served with
+# VERSIONED_ASSET_CACHE_CONTROL and browsers skip revalidating it. The
+# service worker (/sw.js, templates/sw.js) keeps the page and those files
+# in a cache named after SHELL_VERSION, so a change to any of them installs
+# a new worker with a fresh cache.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSET_VERSIONS = {
+    name: responses.content_version(os.path.join(BASE_DIR, 'static', name)) for name in config.SHELL_ASSETS
+}
+SHELL_VERSION = responses.content_version(
+    *(os.path.join(BASE_DIR, 'static', name) for name in config.SHELL_ASSETS),
+    os.path.join(BASE_DIR, 'templates', 'index.html'),
+    os.path.join(BASE_DIR, 'templates', 'sw.js'),
+)
+
+def asset_url(filename):
+    """URL of a static file, versioned when it is one of the shell's"""
+    version = ASSET_VERSIONS.get(filename)
+    return f'/static/{filename}?v={version}' if version else f'/static/{filename}'
+
+def shell_urls():
+    """What the service worker precaches: the page and its versioned assets"""
+    return ['/'] + [asset_url(name) for name in config.SHELL_ASSETS]
+
+def stale_asset(filename, version):
+    """True for a shell asset fetched at a ?v= other than its current one
+    
+    Answered with a 404: serving today's file under an old page's URL would
+    mix versions, and let browsers keep it there for a year.
+    """
+    current = ASSET_VERSIONS.get(filename)
+    return bool(version and current and version != current)
+
+def asset_cache_control(filename, version):
+    """Cache-Control for a static file fetched at ``version`` (its ?v=), None to keep the default"""
+    if version and ASSET_VERSIONS.get(filename) == version:
+        return config.VERSIONED_ASSET_CACHE_CONTROL
+    return None
+
+@bp.app_context_processor
+def shell_context():
+    return {'asset_url': asset_url}
+
+@bp.before_app_request
+def reject_stale_assets():
+    if request.endpoint == 'static' and stale_asset(request.view_args.get('filename'), request.args.get('v')):
+        return Response('Not Found', status=404, mimetype='text/plain', headers={'Cache-Control': 'no-store'})
+
+@bp.after_app_request
+def cache_versioned_assets(response):
+    if request.endpoint == 'static' and response.status_code in (200, 304):
+        cache_control = asset_cache_control(request.view_args.get('filename'), request.args.get('v'))
+        if cache_control:
+            response.headers['Cache-Control'] = cache_control
+    return response
+
+# ==================== Routes ====================
+
+def tracks_response(payload):
+    """jsonify for payloads of Tracks; each track is encoded once and reused"""
+    return Response(dumps(payload), mimetype='application/json')
 
-@app.route('/providers')
+@bp.route('/')
+def index():
+    # Rendered from the background-built snapshot; never waits on JioSaavn.
+    # The service worker checks the version of the page it has cached
+    return render_template('index.html', trending_songs=home_feed.snapshot()), {'X-Shell-Version': SHELL_VERSION}
+
+@bp.route('/sw.js')
+def service_worker():
+    # Served from the root so it controls the whole app. no-cache: browsers
+    # check it on every visit, and a new SHELL_VERSION changes its bytes
+    body = render_template('sw.js', version=SHELL_VERSION, shell=shell_urls())
+    return Response(body, mimetype='application/javascript', headers={'Cache-Control': 'no-cache'})
+
+PROVIDERS = [
+    {'id': 'mixed', 'name': 'Smart Mix (Best Results)', 'enabled': True},
+    {'id': 'saavn', 'name': 'JioSaavn', 'enabled': True},
+    {'id': 'youtube', 'name': 'YouTube Music', 'enabled': True},
+    {'id': 'all', 'name': 'All Providers', 'enabled': True}
+]
+
+@bp.route('/providers')
 def get_providers():
     """Get list of available music providers"""
-    return jsonify({
-        'providers': [
-            {'id': 'mixed', 'name': 'Smart Mix (Best Results)', 'enabled': True},
-            {'id': 'saavn', 'name': 'JioSaavn', 'enabled': True},
-            {'id': 'youtube', 'name': 'YouTube Music', 'enabled': True},
-            {'id': 'all', 'name': 'All Providers', 'enabled': True}
-        ]
-    })
-
-@app.route('/search')
+    return jsonify({'providers': PROVIDERS})
+
+def all_cache_stats():
+    stats = [search_cache.stats(), suggest_cache.stats(), stream_cache.stats(), home_feed_cache.stats(),
+             responses.compressed_cache.stats()]
+    catalog = get_catalog()
+    if catalog is not None:
+        stats.append(catalog.stats())
+    return stats
+
+def cache_stats_payload():
+    catalog = get_catalog()
+    return {
+        'search': search_cache.stats(),
+        'suggest': suggest_cache.stats(),
+        'stream': stream_cache.stats(),
+        'home_feed': home_feed_cache.stats(),
+        'compressed': responses.compressed_cache.stats(),
+        'catalog': catalog.stats() if catalog else None
+    }
+
+def render_metrics():
+    return metrics.render(
+        metrics.render_cache_stats(all_cache_stats()) + resilience.render_metrics() + admission.render_metrics()
+        + queue_prefetcher.render_metrics() + ytmusic_parse.render_metrics()
+    )
+
+@bp.route('/cache/stats')
+def cache_stats():
+    """Hit/miss/eviction counters for sizing the caches"""
+    return jsonify(cache_stats_payload())
+
+@bp.route('/metrics')
+def prometheus_metrics():
+    """Stage and request latency histograms plus cache counters, Prometheus text format"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/search')
 def search():
+    """One page of search results; ``next`` is the cursor of the page after it (None on the last)"""
     query = request.args.get('q', '')
     provider = request.args.get('provider', 'all')
+    cursor = request.args.get('cursor')
     
     if not query:
         return jsonify({'error': 'No query provided'}), 400
     
-    print(f"Searching '{query}' on provider: {provider}")
-    
-    all_results = []
+    logger.debug('search', extra={'query': query, 'provider': provider, 'cursor': bool(cursor)})
     
     try:
-        if provider == 'mixed':
-            # Use intelligent mixed search
-            all_results = MixedAPI.search_mixed(query)
-        elif provider == 'all':
-            # Return all results from both providers
-            saavn_results = JioSaavnService.search(query)
-            all_results.extend(saavn_results)
-            
-            ytm_results = ytm_service.search(query)
-            all_results.extend(ytm_results)
-        elif provider == 'saavn':
-            all_results = JioSaavnService.search(query)
-        elif provider == 'youtube':
-            all_results = ytm_service.search(query)
+        if cursor:
+            positions = pagination.decode_cursor(cursor, query, provider, PAGE_TOKENS)
+            all_results, partial, positions = search_next_page(query, provider, positions)
+        else:
+            all_results, partial, counts = search_first_page(query, provider)
+            positions = first_page_positions(search_plan(provider)[0], counts)
         
-        return jsonify(all_results)
+        next_cursor = pagination.encode_cursor(query, provider, positions)
+        response = tracks_response({'results': all_results, 'partial': partial, 'next': next_cursor})
+        if partial:
+            response.headers['Cache-Control'] = config.PARTIAL_SEARCH_CACHE_CONTROL
+        return response
+    
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    except Overloaded as e:
+        return overloaded_response(e)
     
     except Exception as e:
-        print(f"Search error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('search failed', extra={'query': query, 'provider': provider})
         return jsonify({'error': str(e)}), 500
 
-@app.route('/stream')
+@bp.route('/suggest')
+def suggestions():
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', type=int)
+    
+    try:
+        return tracks_response({'suggestions': suggest(query, limit)})
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        logger.exception('suggest failed', extra={'query': query})
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/search/stream')
+def search_stream():
+    """Progressive /search: one NDJSON line per event from search_events"""
+    query = request.args.get('q', '')
+    provider = request.args.get('provider', 'all')
+    
+    if not query:
+        return jsonify({'error': 'No query provided'}), 400
+    
+    logger.debug('progressive search', extra={'query': query, 'provider': provider})
+    
+    def generate():
+        try:
+            for event in search_events(query, provider):
+                yield dumps(event) + '\n'
+        except Exception as e:
+            logger.exception('progressive search failed', extra={'query': query, 'provider': provider})
+            yield json.dumps({'event': 'error', 'error': str(e)}) + '\n'
+    
+    # X-Accel-Buffering stops nginx from holding the events back
+    return Response(generate(), mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
+
+@bp.route('/stream')
 def stream():
     song_id = request.args.get('id', '')
     provider = request.args.get('provider', 'saavn')
@@ -631,29 +1368,141 @@ def stream():
     if not song_id:
         return jsonify({'error': 'No ID provided'}), 400
     
-    print(f"Stream request for ID: {song_id}, provider: {provider}")
+    logger.debug('stream', extra={'song_id': song_id, 'provider': provider})
     
     try:
-        stream_url = None
-        
-        if provider == 'saavn':
-            stream_url = JioSaavnService.get_song_url(song_id)
-        elif provider == 'youtube':
-            # Use yt-dlp to extract direct audio URL
-            stream_url = get_youtube_audio_url(song_id)
+        stream_url = resolve_stream_url(provider, song_id)
         
         if stream_url:
-            print(f"Successfully got stream URL from {provider}: {stream_url[:80]}...")
             return jsonify({'url': stream_url, 'provider': provider})
         else:
-            print(f"Failed to get stream URL from {provider}")
+            logger.warning('no stream url', extra={'song_id': song_id, 'provider': provider})
             return jsonify({'error': f'Could not get stream URL from {provider}'}), 500
     
+    except Overloaded as e:
+        logger.warning('stream rejected', extra={'song_id': song_id, 'error': e})
+        return overloaded_response(e)
+    
+    except ExtractionPoolFull as e:
+        logger.warning('stream rejected', extra={'song_id': song_id, 'error': e})
+        return jsonify({'error': 'Too many YouTube streams being resolved, try again shortly'}), 503, {'Retry-After': '1'}
+    
+    except ExtractionTimeout as e:
+        logger.warning('stream timed out', extra={'song_id': song_id, 'error': e})
+        return jsonify({'error': str(e)}), 504
+    
     except Exception as e:
-        print(f"Error in stream endpoint: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('stream failed', extra={'song_id': song_id, 'provider': provider})
         return jsonify({'error': str(e)}), 500
 
+@bp.route('/stream/batch', methods=['POST'])
+def stream_batch():
+    """Resolve stream URLs for a whole queue in one call
+    
+    Body: {"tracks": [{"id": "...", "provider": "saavn"}, ...]}
+    """
+    payload = request.get_json(silent=True) or {}
+    tracks = payload.get('tracks')
+    
+    if not isinstance(tracks, list) or not tracks:
+        return jsonify({'error': 'No tracks provided'}), 400
+    if len(tracks) > config.STREAM_BATCH_MAX:
+        return jsonify({'error': f'At most {config.STREAM_BATCH_MAX} tracks per batch'}), 400
+    
+    keys = parse_track_keys(tracks)
+    if keys is None:
+        return jsonify({'error': 'Every track needs an id'}), 400
+    
+    logger.debug('batch stream', extra={'tracks': len(keys)})
+    
+    resolved = resolve_stream_urls(keys)
+    results = []
+    for provider, song_id in keys:
+        outcome = resolved[(provider, song_id)]
+        if isinstance(outcome, Exception):
+            results.append({'id': song_id, 'provider': provider, 'error': str(outcome)})
+        else:
+            results.append({'id': song_id, 'provider': provider, 'url': outcome})
+    
+    return jsonify({'results': results})
+
+@bp.route('/queue/prefetch', methods=['POST'])
+def queue_prefetch():
+    """Resolve the listener's upcoming tracks in the background
+    
+    Body: {"session": "...", "tracks": [{"id": "...", "provider": "saavn"}, ...]},
+    next track first. Replaces the session's previous queue; an empty list
+    just cancels it. Only the first PREFETCH_AHEAD tracks are resolved.
+    """
+    payload = request.get_json(silent=True) or {}
+    keys = parse_track_keys(payload.get('tracks'))
+    
+    if keys is None:
+        return jsonify({'error': 'tracks must be a list of {"id", "provider"} objects'}), 400
+    
+    # One queue per page session, so two tabs behind one address don't cancel each other
+    client = (client_id(), str(payload.get('session', '')))
+    scheduled = queue_prefetcher.submit(client, keys)
+    return jsonify({'scheduled': scheduled}), 202
+
+# ==================== Startup ====================
+_warm = False
+_warm_lock = threading.Lock()
+
+def preload():
+    """Import the heavy dependencies without starting anything.
+    
+    For a pre-forking server's master process (gunicorn --preload): modules
+    loaded here are shared copy-on-write by every worker. Threads, sockets
+    and SQLite connections don't survive a fork, so those wait for warmup().
+    """
+    import matching  # noqa: F401  rapidfuzz + numpy
+    import requests  # noqa: F401
+    from Crypto.Cipher import DES  # noqa: F401
+    if config.WARMUP_YTDLP:
+        import yt_dlp  # noqa: F401
+
+def warmup():
+    """Get this worker ready for traffic (idempotent).
+    
+    Builds the upstream HTTP session, the YouTube Music request context and
+    the DES cipher, opens the track catalog, starts a yt-dlp worker (unless
+    WARMUP_YTDLP is off) and starts the home feed refresher. gunicorn.conf.py,
+    the ASGI lifespan and ``python app.py`` call it before serving; anything
+    else gets it on its first request.
+    """
+    global _warm
+    if _warm:
+        return
+    with _warm_lock:
+        if _warm:
+            return
+        start = time.perf_counter()
+        preload()
+        http_client.get_session()
+        ytm_service.init()
+        JioSaavnService.new_cipher()
+        get_catalog()
+        if config.WARMUP_YTDLP:
+            ytdlp_pool.warm()
+        home_feed.start()
+        _warm = True
+    logger.info('worker warmed up', extra={'seconds': round(time.perf_counter() - start, 3)})
+
+@bp.before_app_request
+def ensure_warm():
+    warmup()
+
+def create_app():
+    """Build the Flask app. Cheap: no network, no threads; see warmup()"""
+    configure_logging()
+    flask_app = Flask(__name__)
+    flask_app.json = responses.FastJSONProvider(flask_app)
+    flask_app.register_blueprint(bp)
+    return flask_app
+
+app = create_app()
+
 if __name__ == '__main__':
+    warmup()
     app.run(debug=True, host='0.0.0.0', port=8080)
@@ -0,0 +1,372 @@
+"""ASGI serving mode: the same API as app.py on an asyncio event loop.
+
+Every in-flight /search or /stream waits on upstream I/O without holding a
+thread, so one process can keep thousands of upstream calls open. Run with:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8080
+"""
+import asyncio
+import contextlib
+import functools
+import json
+import logging
+import os
+import time
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+
+import admission
+import config
+import metrics
+import pagination
+import responses
+from admission import Overloaded
+from app import (PAGE_TOKENS, PROVIDERS, ROUTE_CLASSES, SHELL_VERSION, app as flask_app, asset_cache_control,
+                 asset_url, cache_stats_payload, first_page_positions, home_feed, parse_track_keys, queue_prefetcher,
+                 render_metrics, search_plan, shell_urls, stale_asset, warmup)
+from async_providers import AsyncProviders
+from pagination import InvalidCursor
+from track import dumps
+from ytdlp_pool import ExtractionPoolFull, ExtractionTimeout
+
+logger = logging.getLogger(__name__)
+
+
+def _overloaded_response(e):
+    return JSONResponse({'error': str(e)}, status_code=e.status, headers={'Retry-After': e.retry_after_header()})
+
+
+def _client_id(request):
+    if config.RATE_LIMIT_TRUST_FORWARDED_FOR and 'x-forwarded-for' in request.headers:
+        return request.headers['x-forwarded-for'].split(',')[0].strip()
+    return request.client.host if request.client else None
+
+
+async def _disconnected(request):
+    # Past the (empty) request body, the next message is the disconnect
+    while (await request.receive())['type'] != 'http.disconnect':
+        pass
+
+
+def cancel_when_abandoned(endpoint):
+    """Cancel ``endpoint`` if its client disconnects before it answers.
+
+    The page aborts searches and stream lookups it no longer wants (a newer
+    query, another track); this stops the server from working on them.
+    Loads other requests share are shielded (see AsyncSingleFlight) and
+    still finish into the caches. The abandoned request is logged as 499.
+    """
+    @functools.wraps(endpoint)
+    async def wrapper(request):
+        work = asyncio.ensure_future(endpoint(request))
+        disconnect = asyncio.ensure_future(_disconnected(request))
+        try:
+            await asyncio.wait({work, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            disconnect.cancel()
+        if not work.done():
+            work.cancel()
+            logger.debug('request abandoned', extra={'path': request.url.path})
+            return Response(status_code=499)
+        return work.result()
+    return wrapper
+
+
+class VersionedStaticFiles(StaticFiles):
+    """StaticFiles answering a file fetched at its current ?v= with VERSIONED_ASSET_CACHE_CONTROL
+
+    An old ?v= gets a 404, as in app.py.
+    """
+
+    async def get_response(self, path, scope):
+        if stale_asset(path, Request(scope).query_params.get('v')):
+            return PlainTextResponse('Not Found', status_code=404, headers={'Cache-Control': 'no-store'})
+        return await super().get_response(path, scope)
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        version = Request(scope).query_params.get('v')
+        cache_control = asset_cache_control(os.path.relpath(full_path, self.directory), version)
+        if cache_control:
+            response.headers['Cache-Control'] = cache_control
+        return response
+
+
+async def index(request):
+    # Rendered from the background-built snapshot; never waits on JioSaavn
+    template = flask_app.jinja_env.get_template('index.html')
+    return HTMLResponse(template.render(trending_songs=home_feed.snapshot(), asset_url=asset_url),
+                        headers={'X-Shell-Version': SHELL_VERSION})
+
+
+async def service_worker(request):
+    # As in app.py: at the root so it controls the whole app, and checked on every visit
+    body = flask_app.jinja_env.get_template('sw.js').render(version=SHELL_VERSION, shell=shell_urls())
+    return Response(body, media_type='application/javascript', headers={'Cache-Control': 'no-cache'})
+
+
+async def get_providers(request):
+    return JSONResponse({'providers': PROVIDERS})
+
+
+async def cache_stats(request):
+    # Shared cache backends and the catalog are queried synchronously
+    return JSONResponse(await asyncio.to_thread(cache_stats_payload))
+
+
+async def prometheus_metrics(request):
+    body = await asyncio.to_thread(render_metrics)
+    return Response(body, media_type='text/plain; version=0.0.4')
+
+
+@cancel_when_abandoned
+async def search(request):
+    providers = request.app.state.providers
+    query = request.query_params.get('q', '')
+    provider = request.query_params.get('provider', 'all')
+    cursor = request.query_params.get('cursor')
+
+    if not query:
+        return JSONResponse({'error': 'No query provided'}, status_code=400)
+
+    logger.debug('search', extra={'query': query, 'provider': provider, 'cursor': bool(cursor)})
+
+    try:
+        if cursor:
+            positions = pagination.decode_cursor(cursor, query, provider, PAGE_TOKENS)
+            all_results, partial, positions = await providers.search_next_page(query, provider, positions)
+        else:
+            all_results, partial, counts = await providers.search_first_page(query, provider)
+            positions = first_page_positions(search_plan(provider)[0], counts)
+
+        next_cursor = pagination.encode_cursor(query, provider, positions)
+        headers = {'Cache-Control': config.PARTIAL_SEARCH_CACHE_CONTROL} if partial else None
+        return Response(dumps({'results': all_results, 'partial': partial, 'next': next_cursor}),
+                        media_type='application/json', headers=headers)
+
+    except InvalidCursor as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+    except Overloaded as e:
+        return _overloaded_response(e)
+
+    except Exception as e:
+        logger.exception('search failed', extra={'query': query, 'provider': provider})
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+@cancel_when_abandoned
+async def suggestions(request):
+    query = request.query_params.get('q', '')
+    try:
+        limit = int(request.query_params['limit']) if 'limit' in request.query_params else None
+    except ValueError:
+        limit = None
+
+    try:
+        suggestions = await request.app.state.providers.suggest(query, limit)
+        return Response(dumps({'suggestions': suggestions}), media_type='application/json')
+    except Overloaded as e:
+        return _overloaded_response(e)
+    except Exception as e:
+        logger.exception('suggest failed', extra={'query': query})
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def search_stream(request):
+    providers = request.app.state.providers
+    query = request.query_params.get('q', '')
+    provider = request.query_params.get('provider', 'all')
+
+    if not query:
+        return JSONResponse({'error': 'No query provided'}, status_code=400)
+
+    logger.debug('progressive search', extra={'query': query, 'provider': provider})
+
+    async def generate():
+        try:
+            async for event in providers.search_events(query, provider):
+                yield dumps(event) + '\n'
+        except Exception as e:
+            logger.exception('progressive search failed', extra={'query': query, 'provider': provider})
+            yield json.dumps({'event': 'error', 'error': str(e)}) + '\n'
+
+    return StreamingResponse(generate(), media_type='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
+
+
+@cancel_when_abandoned
+async def stream(request):
+    providers = request.app.state.providers
+    song_id = request.query_params.get('id', '')
+    provider = request.query_params.get('provider', 'saavn')
+
+    if not song_id:
+        return JSONResponse({'error': 'No ID provided'}, status_code=400)
+
+    logger.debug('stream', extra={'song_id': song_id, 'provider': provider})
+
+    try:
+        stream_url = await providers.resolve_stream_url(provider, song_id)
+
+        if stream_url:
+            return JSONResponse({'url': stream_url, 'provider': provider})
+        logger.warning('no stream url', extra={'song_id': song_id, 'provider': provider})
+        return JSONResponse({'error': f'Could not get stream URL from {provider}'}, status_code=500)
+
+    except Overloaded as e:
+        logger.warning('stream rejected', extra={'song_id': song_id, 'error': e})
+        return _overloaded_response(e)
+
+    except ExtractionPoolFull as e:
+        logger.warning('stream rejected', extra={'song_id': song_id, 'error': e})
+        return JSONResponse({'error': 'Too many YouTube streams being resolved, try again shortly'},
+                            status_code=503, headers={'Retry-After': '1'})
+
+    except ExtractionTimeout as e:
+        logger.warning('stream timed out', extra={'song_id': song_id, 'error': e})
+        return JSONResponse({'error': str(e)}, status_code=504)
+
+    except Exception as e:
+        logger.exception('stream failed', extra={'song_id': song_id, 'provider': provider})
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def stream_batch(request):
+    providers = request.app.state.providers
+    try:
+        payload = await request.json()
+    except ValueError:
+        payload = {}
+    tracks = payload.get('tracks') if isinstance(payload, dict) else None
+
+    if not isinstance(tracks, list) or not tracks:
+        return JSONResponse({'error': 'No tracks provided'}, status_code=400)
+    if len(tracks) > config.STREAM_BATCH_MAX:
+        return JSONResponse({'error': f'At most {config.STREAM_BATCH_MAX} tracks per batch'}, status_code=400)
+
+    keys = parse_track_keys(tracks)
+    if keys is None:
+        return JSONResponse({'error': 'Every track needs an id'}, status_code=400)
+
+    resolved = await providers.resolve_stream_urls(keys)
+    results = []
+    for provider, song_id in keys:
+        outcome = resolved[(provider, song_id)]
+        if isinstance(outcome, Exception):
+            results.append({'id': song_id, 'provider': provider, 'error': str(outcome)})
+        else:
+            results.append({'id': song_id, 'provider': provider, 'url': outcome})
+
+    return JSONResponse({'results': results})
+
+
+async def queue_prefetch(request):
+    # Resolved on queue_prefetcher's threads, into the stream cache shared with the Flask app
+    try:
+        payload = await request.json()
+    except ValueError:
+        payload = {}
+    if not isinstance(payload, dict):
+        payload = {}
+    keys = parse_track_keys(payload.get('tracks'))
+
+    if keys is None:
+        return JSONResponse({'error': 'tracks must be a list of {"id", "provider"} objects'}, status_code=400)
+
+    client = (_client_id(request), str(payload.get('session', '')))
+    return JSONResponse({'scheduled': queue_prefetcher.submit(client, keys)}, status_code=202)
+
+
+class RequestTimingMiddleware(BaseHTTPMiddleware):
+    """Per-route latency histogram and Server-Timing header, as in app.py"""
+
+    async def dispatch(self, request, call_next):
+        start = time.perf_counter()
+        metrics.start_request()
+        response = await call_next(request)
+        total = time.perf_counter() - start
+        route = request.scope.get('route')
+        metrics.request_seconds.observe(total, route.path if route else 'unmatched',
+                                        request.method, str(response.status_code))
+        response.headers['Server-Timing'] = metrics.server_timing_header(metrics.request_timings(), total)
+        return response
+
+
+class AdmissionMiddleware(BaseHTTPMiddleware):
+    """Rate limits, up-front shedding and upstream priority per route class, as admit_request in app.py"""
+
+    async def dispatch(self, request, call_next):
+        route_class = ROUTE_CLASSES.get(request.url.path)
+        admission.set_priority(route_class)
+        if route_class is not None:
+            try:
+                admission.rate_limiter.check(_client_id(request), route_class)
+                if route_class in ('search', 'suggest'):
+                    admission.check_providers(
+                        admission.providers_for(route_class, request.query_params.get('provider', 'all')))
+            except Overloaded as e:
+                logger.info('request shed', extra={'path': request.url.path, 'status': e.status, 'error': e})
+                return _overloaded_response(e)
+        return await call_next(request)
+
+
+class ResponseEncodingMiddleware(BaseHTTPMiddleware):
+    """ETag / 304, Cache-Control and compression, as encode_response in app.py"""
+
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        mimetype = response.headers.get('content-type', '').split(';')[0].strip()
+        if (request.method not in ('GET', 'HEAD') or response.status_code != 200
+                or mimetype not in responses.COMPRESSIBLE_TYPES or 'content-encoding' in response.headers):
+            return response
+        body = b''.join([chunk async for chunk in response.body_iterator])
+        with metrics.timed('encode'):
+            status, body, extra = responses.finish(
+                request.method, request.url.path, response.status_code, mimetype, body,
+                request.headers.get('if-none-match'), request.headers.get('accept-encoding'),
+                response.headers.get('cache-control')
+            )
+        headers = {name: value for name, value in response.headers.items() if name != 'content-length'}
+        for name, value in extra.items():
+            if name == 'Vary' and 'vary' in headers:
+                value = f"{headers['vary']}, {value}"
+            headers[name.lower()] = value
+        return Response(body, status_code=status, headers=headers)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # Blocking, but it runs once before the server accepts connections
+    warmup()
+    app.state.providers = AsyncProviders()
+    try:
+        yield
+    finally:
+        await app.state.providers.aclose()
+
+
+app = Starlette(
+    routes=[
+        Route('/', index),
+        Route('/sw.js', service_worker),
+        Route('/providers', get_providers),
+        Route('/cache/stats', cache_stats),
+        Route('/metrics', prometheus_metrics),
+        Route('/search', search),
+        Route('/search/stream', search_stream),
+        Route('/suggest', suggestions),
+        Route('/stream', stream),
+        Route('/stream/batch', stream_batch, methods=['POST']),
+        Route('/queue/prefetch', queue_prefetch, methods=['POST']),
+        Mount('/static', VersionedStaticFiles(directory=flask_app.static_folder), name='static'),
+    ],
+    middleware=[Middleware(RequestTimingMiddleware), Middleware(AdmissionMiddleware),
+                Middleware(ResponseEncodingMiddleware)],
+    lifespan=lifespan,
+)
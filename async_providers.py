@@ -0,0 +1,466 @@
+"""Async counterparts of the provider services, used by the ASGI serving mode.
+
+Request building, response parsing, search planning and merging, and the
+caches are shared with the sync services in app.py; only the I/O differs.
+Upstream calls go through non-blocking httpx clients, yt-dlp jobs are
+awaited on the extraction pool without tying up a thread per request, and
+calls into the SQLite catalog or a sqlite/redis cache backend run on worker
+threads (off_loop) so a slow store doesn't stall the event loop.
+"""
+import asyncio
+import logging
+
+import httpx
+
+import admission
+import config
+import http_client
+import metrics
+import pagination
+import ytmusic_parse
+from admission import Overloaded
+from app import (JioSaavnService, cached_first_page, catalog_add_tracks, catalog_lookup, catalog_remember,
+                 extraction_results, finish_stream_urls, first_page, merged_event, next_page, next_page_calls,
+                 plan_stream_urls, provider_calls, provider_deadlines, provider_event, search_cache,
+                 search_cache_key, search_limit, search_plan, stream_cache, stream_url_ttl,
+                 submit_extractions, suggest_cache, suggest_prefix, suggestions_from_shorter_prefix,
+                 with_skipped, ytdlp_pool, ytm_service)
+from fanout import FanOutResult
+from pagination import SearchPage
+from resilience import CircuitOpen, UpstreamError, hedged_async, provider_health
+from ytdlp_pool import ExtractionTimeout
+
+logger = logging.getLogger(__name__)
+
+# Whether the catalog or the cache backend can block: SQLite and Redis calls
+# wait on a disk or a network round trip, the in-memory cache is a dict
+BLOCKING_STORES = bool(config.CATALOG_PATH) or config.CACHE_BACKEND != 'memory'
+
+
+async def off_loop(fn, *args):
+    """``fn(*args)``, on a worker thread when it may block on a store (BLOCKING_STORES)"""
+    if BLOCKING_STORES:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+
+class AsyncSingleFlight:
+    """Async single-flight loading on top of a TTLCache or a shared cache.
+
+    Concurrent misses for one key await the same loader task. The task is
+    shielded, so a caller giving up (e.g. a fan-out deadline) doesn't cancel
+    it for everyone else.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.shared = getattr(cache, 'shared', False)
+        self._inflight = {}
+        # So cache.loading() sees these loads too (the queue prefetcher's threads ask it)
+        cache.flights.add(self)
+
+    def loading(self, key):
+        """True while a load of ``key`` runs on this flight; safe to call from any thread"""
+        return key in self._inflight
+
+    async def get_or_load(self, key, loader, ttl):
+        """cache.get_or_load for a coroutine ``loader``, with hits, misses and coalesced waits counted alike"""
+        value = await asyncio.to_thread(self.cache.peek, key) if self.shared else self.cache.peek(key)
+        if value is not None:
+            self.cache._count('hits')
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.cache._count('misses')
+            task = self._inflight[key] = asyncio.ensure_future(self._load(key, loader, ttl))
+        else:
+            self.cache._count('coalesced')
+        return await asyncio.shield(task)
+
+    async def _load(self, key, loader, ttl):
+        try:
+            if self.shared:
+                # One load across all worker processes, not just this loop
+                return await self.cache.load_shared_async(key, loader, ttl)
+            value = await loader()
+            self.cache.set(key, value, ttl(value) if callable(ttl) else ttl)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+
+async def fan_out_async(calls, deadlines=None, default_deadline=None):
+    """Async fan_out: run the coroutines in ``calls`` ({name: coro}) concurrently.
+
+    Same contract as fanout.fan_out, except that calls missing their
+    deadline are cancelled rather than left running.
+    """
+    deadlines = deadlines if deadlines is not None else config.PROVIDER_DEADLINES
+    if default_deadline is None:
+        default_deadline = config.DEFAULT_PROVIDER_DEADLINE
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    tasks = {name: asyncio.ensure_future(coro) for name, coro in calls.items()}
+
+    results = {}
+    missing = []
+    for name in sorted(tasks, key=lambda n: deadlines.get(n, default_deadline)):
+        remaining = deadlines.get(name, default_deadline) - (loop.time() - start)
+        try:
+            results[name] = await asyncio.wait_for(tasks[name], max(remaining, 0))
+        except asyncio.TimeoutError:
+            logger.warning('fan-out call missed its deadline', extra={'call': name})
+            missing.append(name)
+        except Exception as e:
+            logger.warning('fan-out call failed', extra={'call': name, 'error': e})
+            missing.append(name)
+
+    return FanOutResult(results, bool(missing), missing)
+
+
+async def fan_out_async_iter(calls, deadlines=None, default_deadline=None):
+    """Async fanout.fan_out_iter: yield ``(name, value)`` as each coroutine finishes.
+
+    Failures yield their exception; calls still running at their deadline
+    are cancelled and yield a TimeoutError.
+    """
+    deadlines = deadlines if deadlines is not None else config.PROVIDER_DEADLINES
+    if default_deadline is None:
+        default_deadline = config.DEFAULT_PROVIDER_DEADLINE
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    names = {asyncio.ensure_future(coro): name for name, coro in calls.items()}
+    pending = set(names)
+
+    try:
+        while pending:
+            next_deadline = min(deadlines.get(names[t], default_deadline) for t in pending)
+            done, pending = await asyncio.wait(pending, timeout=max(next_deadline - (loop.time() - start), 0),
+                                               return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                if task.exception() is None:
+                    yield names[task], task.result()
+                else:
+                    logger.warning('fan-out call failed', extra={'call': names[task], 'error': task.exception()})
+                    yield names[task], task.exception()
+
+            elapsed = loop.time() - start
+            for task in [t for t in pending if deadlines.get(names[t], default_deadline) <= elapsed]:
+                pending.discard(task)
+                task.cancel()
+                logger.warning('fan-out call missed its deadline', extra={'call': names[task]})
+                yield names[task], TimeoutError(f'{names[task]} missed its deadline')
+    finally:
+        # The consumer went away (e.g. the client disconnected)
+        for task in pending:
+            task.cancel()
+
+
+async def catalog_search_async(provider, query, limit, load):
+    """Async app.catalog_search; ``load`` is a coroutine function"""
+    results = await off_loop(catalog_lookup, provider, query, limit)
+    if results is not None:
+        return results
+    results = await load()
+    await off_loop(catalog_remember, provider, query, limit, results)
+    return results
+
+
+def _timeout(read_timeout):
+    # Per-request timeout that follows the provider's adaptive deadline (see ProviderHealth.track)
+    return httpx.Timeout(read_timeout, connect=config.HTTP_CONNECT_TIMEOUT)
+
+
+def _client(base_url, pool_size):
+    transport = httpx.AsyncHTTPTransport(
+        verify=False,
+        retries=config.HTTP_RETRIES,
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+    )
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(config.HTTP_READ_TIMEOUT, connect=config.HTTP_CONNECT_TIMEOUT),
+    )
+
+
+class AsyncJioSaavnService:
+    def __init__(self, client, search_flight):
+        self.client = client
+        self.search_flight = search_flight
+
+    async def _call(self, params, hedge=False):
+        health = provider_health['saavn']
+        async with admission.provider_limits['saavn'].slot_async():
+            with health.track() as read_timeout:
+                timeout = _timeout(read_timeout)
+                fetch = lambda: self.client.get(JioSaavnService.BASE_URL, params=params, timeout=timeout)
+                with metrics.timed('saavn_fetch'):
+                    response = await hedged_async(fetch, health.hedge_delay() if hedge else None)
+                if response.status_code != 200:
+                    raise UpstreamError(f'JioSaavn answered {response.status_code}')
+                with metrics.timed('saavn_json'):
+                    return http_client.json_body(response)
+
+    async def search(self, query, limit=20):
+        ttl = config.SEARCH_CACHE_TTLS['saavn']
+        return await self.search_flight.get_or_load(
+            search_cache_key('saavn', query, limit),
+            lambda: catalog_search_async('saavn', query, limit, lambda: self._search(query, limit)),
+            ttl=lambda results: ttl if results else 0
+        )
+
+    async def _search(self, query, limit):
+        try:
+            data = await self._call(JioSaavnService.search_params(query), hedge=config.HEDGE_SAAVN_SEARCH)
+            return JioSaavnService.parse_search_results(data, limit)
+        except (CircuitOpen, Overloaded):
+            raise
+        except Exception as e:
+            logger.warning('saavn search failed', extra={'query': query, 'error': e})
+            return []
+
+    async def search_page(self, query, page):
+        """Async JioSaavnService.search_page"""
+        ttl = config.SEARCH_CACHE_TTLS['saavn']
+
+        async def load():
+            data = await self._call(JioSaavnService.results_params(query, page))
+            return JioSaavnService.parse_results_page(data, page)
+
+        return await self.search_flight.get_or_load(
+            search_cache_key('saavn', query, ('page', page)), load, ttl=lambda result: ttl if result.tracks else 0)
+
+    async def get_trending(self, limit=15):
+        try:
+            data = await self._call(JioSaavnService.TRENDING_PARAMS)
+            results = JioSaavnService.parse_trending(data, limit)
+            await off_loop(catalog_add_tracks, results)
+            return results
+        except Exception as e:
+            logger.warning('saavn trending failed', extra={'error': e})
+            return []
+
+    async def get_song_url(self, song_id):
+        try:
+            data = await self._call(JioSaavnService.details_params([song_id]))
+            song_details = JioSaavnService.parse_song_details(data, song_id)
+            return JioSaavnService.stream_url_from_details(song_details) if song_details else None
+        except Overloaded:
+            raise
+        except Exception as e:
+            logger.warning('saavn stream url failed', extra={'song_id': song_id, 'error': e})
+            return None
+
+    async def get_song_urls(self, song_ids):
+        """{song_id: url or None}; the multi-pid chunks are fetched concurrently"""
+        batch_size = config.SAAVN_DETAILS_BATCH_SIZE
+        chunks = [song_ids[start:start + batch_size] for start in range(0, len(song_ids), batch_size)]
+
+        async def fetch(chunk):
+            try:
+                return JioSaavnService.parse_songs_details(
+                    await self._call(JioSaavnService.details_params(chunk)), chunk)
+            except Exception as e:
+                logger.warning('saavn batch details failed', extra={'songs': len(chunk), 'error': e})
+                return {}
+
+        urls = dict.fromkeys(song_ids)
+        cipher = JioSaavnService.new_cipher()
+        for details in await asyncio.gather(*(fetch(chunk) for chunk in chunks)):
+            for song_id, song_details in details.items():
+                if song_id in urls:
+                    urls[song_id] = JioSaavnService.stream_url_from_details(song_details, cipher)
+        return urls
+
+
+class AsyncYtMusicService:
+    def __init__(self, client, search_flight):
+        self.client = client
+        self.search_flight = search_flight
+
+    async def search(self, query, limit=10):
+        ttl = config.SEARCH_CACHE_TTLS['youtube']
+        return await self.search_flight.get_or_load(
+            search_cache_key('youtube', query, limit),
+            lambda: catalog_search_async('youtube', query, limit, lambda: self._search(query, limit)),
+            ttl=lambda results: ttl if results else 0
+        )
+
+    async def search_page(self, query, continuation=None):
+        """Async YtMusicService.search_page"""
+        ttl = config.SEARCH_CACHE_TTLS['youtube']
+        return await self.search_flight.get_or_load(
+            search_cache_key('youtube', query, ('page', continuation)),
+            lambda: self._fetch_page(query, continuation),
+            ttl=lambda page: ttl if page.tracks else 0
+        )
+
+    async def _fetch_page(self, query, continuation=None):
+        url, body, params = ytm_service.search_request(query, continuation)
+        health = provider_health['youtube']
+        async with admission.provider_limits['youtube'].slot_async():
+            with health.track() as read_timeout:
+                with metrics.timed('ytm_fetch'):
+                    response = await self.client.post(url, headers=ytm_service.headers, json=body,
+                                                      params=params, timeout=_timeout(read_timeout))
+
+                if response.status_code != 200:
+                    raise UpstreamError(f'YouTube Music answered {response.status_code}')
+
+                with metrics.timed('ytm_json'):
+                    data = http_client.json_body(response)
+        with metrics.timed('ytm_parse'):
+            return SearchPage(*ytmusic_parse.parse_search_page(data))
+
+    async def _search(self, query, limit):
+        try:
+            return (await self.search_page(query)).tracks[:limit]
+        except (CircuitOpen, Overloaded):
+            raise
+        except Exception as e:
+            logger.warning('youtube search failed', extra={'query': query, 'error': e})
+            return []
+
+
+class AsyncProviders:
+    """Owns the async clients and services for one event loop"""
+
+    def __init__(self):
+        self.saavn_client = _client(config.SAAVN_BASE_URL, config.SAAVN_POOL_SIZE)
+        self.ytm_client = _client(config.YTM_BASE_URL, config.YTM_POOL_SIZE)
+        search_flight = AsyncSingleFlight(search_cache)
+        self.stream_flight = AsyncSingleFlight(stream_cache)
+        self.suggest_flight = AsyncSingleFlight(suggest_cache)
+        self.saavn = AsyncJioSaavnService(self.saavn_client, search_flight)
+        self.youtube = AsyncYtMusicService(self.ytm_client, search_flight)
+
+    async def aclose(self):
+        await self.saavn_client.aclose()
+        await self.ytm_client.aclose()
+
+    def _search_calls(self, query, providers, limit=None):
+        """Async provider_search_calls: ({name: coroutine}, [skipped providers])"""
+        search_fns = {'saavn': self.saavn.search, 'youtube': self.youtube.search}
+        return provider_calls(providers, lambda name: search_fns[name](query, limit=search_limit(name, limit)))
+
+    async def search_providers(self, query, providers, limit=None):
+        """Async search_providers: skips open circuits, adaptive deadlines"""
+        calls, skipped = self._search_calls(query, providers, limit)
+        return with_skipped(await fan_out_async(calls, deadlines=provider_deadlines(calls)), skipped)
+
+    async def search_events(self, query, provider):
+        """Async app.search_events"""
+        cached = await off_loop(cached_first_page, query, provider)
+        if cached is not None:
+            yield merged_event(query, provider, *cached)
+            return
+
+        providers, limit = search_plan(provider)
+        calls, missing = self._search_calls(query, providers, limit)
+        for name in missing:
+            yield {'event': 'missing', 'provider': name}
+
+        provider_results = {}
+        async for name, value in fan_out_async_iter(calls, deadlines=provider_deadlines(calls)):
+            yield provider_event(name, value, provider_results, missing)
+
+        fanned = FanOutResult(provider_results, bool(missing), missing)
+        yield merged_event(query, provider, *await off_loop(first_page, query, provider, fanned))
+
+    async def search_first_page(self, query, provider):
+        """Async app.search_first_page: (results, partial, counts)"""
+        cached = await off_loop(cached_first_page, query, provider)
+        if cached is not None:
+            return cached
+        providers, limit = search_plan(provider)
+        fanned = await self.search_providers(query, providers, limit)
+        return await off_loop(first_page, query, provider, fanned)
+
+    async def provider_page(self, provider, query, token):
+        """Async app.provider_page"""
+        if provider == 'saavn':
+            if token == 0:
+                tracks = await self.saavn.search(query, limit=config.SEARCH_PAGE_SIZES['saavn'])
+                return SearchPage(tracks, 1 if tracks else None)
+            return await self.saavn.search_page(query, int(token))
+        if provider == 'youtube':
+            return await self.youtube.search_page(query, token)
+        raise ValueError(f'Unknown provider: {provider}')
+
+    async def search_next_page(self, query, provider, positions):
+        """Async app.search_next_page: (results, partial, positions after them)"""
+        def walk(name, position, size):
+            fetch_page = lambda token: self.provider_page(name, query, token)
+            return pagination.atake(pagination.aiter_tracks(fetch_page, position), size)
+
+        calls, skipped, next_positions = next_page_calls(provider, positions, walk)
+        fanned = with_skipped(await fan_out_async(calls, deadlines=provider_deadlines(calls)), skipped)
+        return await off_loop(next_page, query, provider, fanned, next_positions)
+
+    async def suggest(self, query, limit=None):
+        """Async app.suggest"""
+        prefix = suggest_prefix(query)
+        if len(prefix) < config.SUGGEST_MIN_CHARS:
+            return []
+
+        async def load():
+            local = await off_loop(suggestions_from_shorter_prefix, prefix)
+            if local is not None:
+                return local
+            try:
+                results = await self.saavn._search(prefix, config.SUGGEST_FETCH_LIMIT)
+            except CircuitOpen:
+                return []
+            await off_loop(catalog_add_tracks, results)
+            return results
+
+        results = await self.suggest_flight.get_or_load(
+            prefix, load, ttl=lambda results: config.SUGGEST_TTL if results else 0)
+        return results[:limit or config.SUGGEST_LIMIT]
+
+    async def extract_youtube_audio_url(self, video_id):
+        future = ytdlp_pool.submit(video_id)
+        try:
+            with metrics.timed('ytdlp_extract'):
+                return await asyncio.wait_for(asyncio.wrap_future(future), ytdlp_pool.timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise ExtractionTimeout(f'yt-dlp extraction of {video_id} took longer than {ytdlp_pool.timeout}s')
+
+    async def resolve_stream_url(self, provider, song_id):
+        """Async resolve_stream_url, sharing the stream URL cache"""
+        if provider == 'saavn':
+            loader = lambda: self.saavn.get_song_url(song_id)
+        elif provider == 'youtube':
+            loader = lambda: self.extract_youtube_audio_url(song_id)
+        else:
+            return None
+
+        return await self.stream_flight.get_or_load(
+            (provider, song_id),
+            loader,
+            ttl=lambda url: stream_url_ttl(provider, url)
+        )
+
+    async def resolve_stream_urls(self, tracks):
+        """Async resolve_stream_urls: {(provider, id): url or exception}"""
+        resolved, saavn_ids, youtube_ids = await off_loop(plan_stream_urls, tracks)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + ytdlp_pool.timeout
+
+        jobs = submit_extractions(youtube_ids)
+        saavn_urls = {}
+        if saavn_ids:
+            try:
+                saavn_urls = await self.saavn.get_song_urls(saavn_ids)
+            except Exception as e:
+                logger.warning('batch stream resolution failed', extra={'provider': 'saavn', 'error': e})
+
+        pending = [asyncio.wrap_future(job) for job in jobs.values() if not isinstance(job, Exception)]
+        if pending:
+            await asyncio.wait(pending, timeout=max(deadline - loop.time(), 0))
+        return await off_loop(finish_stream_urls, tracks, resolved, saavn_urls, extraction_results(jobs))
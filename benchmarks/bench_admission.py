@@ -0,0 +1,148 @@
+"""Benchmark admission control: /stream latency while a search flood saturates JioSaavn.
+
+upstream_sim.py serves JioSaavn with --capacity concurrent requests; the
+rest queue there, as a saturated upstream would. --searchers threads send
+uncached /search?provider=saavn requests back to back while --listeners
+threads resolve uncached /stream ids, one after another. Each mode runs the
+app in a fresh process:
+
+- off: no provider concurrency limit and no rate limits (the old behaviour)
+- priority: SAAVN_CONCURRENCY=--slots (default --capacity), so /stream calls go first
+- priority+rate: as priority, plus the per-client rate limits the README
+  suggests (all traffic here comes from one client, so most searches get 429)
+
+Run from the repository root:
+
+    python benchmarks/bench_admission.py
+    python benchmarks/bench_admission.py --searchers 24 --capacity 4 --slots 6 --latency 0.1
+
+Latencies are in ms. On a machine with few cores, keep --searchers low
+enough that JioSaavn, not the CPU, is the bottleneck.
+"""
+import argparse
+import os
+import random
+import string
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import percentile  # noqa: E402
+from upstream_sim import SimulatorSettings, start_simulator  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Serves the app on an ephemeral port in a child process and prints the port
+SERVE = '''
+from werkzeug.serving import WSGIRequestHandler, make_server
+import app
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+server = make_server('127.0.0.1', 0, app.app, threaded=True, request_handler=QuietHandler)
+print(server.server_address[1], flush=True)
+server.serve_forever()
+'''
+
+MODES = {
+    'off': {'SAAVN_CONCURRENCY': '100000', 'YTM_CONCURRENCY': '100000',
+            'STREAM_RATE_LIMIT': '0', 'SEARCH_RATE_LIMIT': '0', 'SUGGEST_RATE_LIMIT': '0'},
+    'priority': {'STREAM_RATE_LIMIT': '0', 'SEARCH_RATE_LIMIT': '0', 'SUGGEST_RATE_LIMIT': '0'},
+    'priority+rate': {'STREAM_RATE_LIMIT': '5', 'SEARCH_RATE_LIMIT': '2', 'SUGGEST_RATE_LIMIT': '10'},
+}
+
+
+def random_word(rng, length):
+    return ''.join(rng.choices(string.ascii_lowercase + string.digits, k=length))
+
+
+def run_mode(mode, args, sim_url):
+    env = dict(os.environ, SAAVN_BASE_URL=f'{sim_url}/api.php', YTM_BASE_URL=sim_url, LOG_LEVEL='ERROR',
+               CATALOG_PATH='', CACHE_BACKEND='memory', SAAVN_CONCURRENCY=str(args.slots or args.capacity),
+               SAAVN_DEADLINE='30', PROVIDER_DEADLINE='30', HTTP_READ_TIMEOUT='30', HTTP_RETRIES='0',
+               BREAKER_SLOW_CALL_SECONDS='60', ADAPTIVE_TIMEOUT_MIN='30', HOME_FEED_QUERIES=' ')
+    env.update(MODES[mode])
+    server = subprocess.Popen([sys.executable, '-c', SERVE], cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True)
+    try:
+        base_url = f'http://127.0.0.1:{server.stdout.readline().strip()}'
+        requests.get(f'{base_url}/providers', timeout=30)  # warm the worker up
+
+        stream_latencies = []
+        search_outcomes = Counter()
+        search_latencies = {}
+        lock = threading.Lock()
+        deadline = time.monotonic() + args.duration
+
+        def searcher(seed):
+            rng = random.Random(seed)
+            session = requests.Session()
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                status = session.get(f'{base_url}/search?q={random_word(rng, 12)}&provider=saavn',
+                                     timeout=60).status_code
+                with lock:
+                    search_outcomes[status] += 1
+                    search_latencies.setdefault(status, []).append(time.perf_counter() - start)
+
+        def listener(seed):
+            rng = random.Random(seed)
+            session = requests.Session()
+            time.sleep(0.5)  # let the flood build up first
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                session.get(f'{base_url}/stream?id={random_word(rng, 8)}&provider=saavn', timeout=60)
+                with lock:
+                    stream_latencies.append(time.perf_counter() - start)
+                time.sleep(0.1)
+
+        threads = [threading.Thread(target=searcher, args=(i,)) for i in range(args.searchers)]
+        threads += [threading.Thread(target=listener, args=(10000 + i,)) for i in range(args.listeners)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    stream_latencies.sort()
+    ok = sorted(search_latencies.get(200, []))
+    rejected = sorted(latency for status, latencies in search_latencies.items() if status in (429, 503)
+                      for latency in latencies)
+    print(f'{mode:<14} {percentile(stream_latencies, 50) * 1000:>10.0f} {percentile(stream_latencies, 99) * 1000:>10.0f}'
+          f' {search_outcomes[200]:>9} {percentile(ok, 50) * 1000:>9.0f}'
+          f' {search_outcomes[429]:>6} {search_outcomes[503]:>6} {percentile(rejected, 50) * 1000:>11.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--searchers', type=int, default=64)
+    parser.add_argument('--listeners', type=int, default=4)
+    parser.add_argument('--capacity', type=int, default=8, help='concurrent requests JioSaavn serves')
+    parser.add_argument('--slots', type=int, help='SAAVN_CONCURRENCY for the priority modes (default: --capacity)')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per JioSaavn request')
+    parser.add_argument('--modes', default=','.join(MODES))
+    args = parser.parse_args()
+
+    simulator = start_simulator(settings=SimulatorSettings(args.latency, 0.0, 0.0, None, None, args.capacity))
+    sim_url = f'http://127.0.0.1:{simulator.server_address[1]}'
+
+    print(f'{args.searchers} searchers and {args.listeners} listeners for {args.duration:.0f}s; '
+          f'JioSaavn serves {args.capacity} at a time, {args.latency * 1000:.0f} ms each')
+    print(f"{'mode':<14} {'stream p50':>10} {'stream p99':>10} {'search ok':>9} {'ok p50':>9} "
+          f"{'429':>6} {'503':>6} {'reject p50':>11}")
+    for mode in args.modes.split(','):
+        run_mode(mode, args, sim_url)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark MixedAPI matching: the old greedy double loop vs matching.merge_tracks.
+
+Run from the repository root:
+
+    python benchmarks/bench_matching.py
+"""
+import os
+import random
+import string
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matching import merge_tracks  # noqa: E402
+
+try:
+    # The scorer the old implementation actually used
+    from fuzzywuzzy import fuzz as legacy_fuzz
+except ImportError:
+    from rapidfuzz import fuzz as legacy_fuzz
+
+LIMITS = [10, 50, 200]
+REPEAT = 5
+
+
+def legacy_merge(query, saavn_results, yt_results, limit=10):
+    """The pre-engine MixedAPI.search_mixed merge, without its prints"""
+    def select_best_match(saavn_result, yt_result):
+        saavn_str = f"{saavn_result['title']} {saavn_result['artist']}".lower().strip()
+        yt_str = f"{yt_result['title']} {yt_result['artist']}".lower().strip()
+        query_lower = query.lower().strip()
+        saavn_score = max(legacy_fuzz.ratio(query_lower, saavn_str), legacy_fuzz.partial_ratio(query_lower, saavn_str))
+        yt_score = max(legacy_fuzz.ratio(query_lower, yt_str), legacy_fuzz.partial_ratio(query_lower, yt_str))
+        return saavn_result if saavn_score >= yt_score else yt_result
+
+    merged_results = []
+    used_yt_ids = set()
+    for saavn_item in saavn_results:
+        best_match = None
+        best_score = 80
+        saavn_str = f"{saavn_item['title']} {saavn_item['artist']}".lower().strip()
+        for yt_item in yt_results:
+            if yt_item['id'] in used_yt_ids:
+                continue
+            yt_str = f"{yt_item['title']} {yt_item['artist']}".lower().strip()
+            score = max(legacy_fuzz.ratio(saavn_str, yt_str), legacy_fuzz.partial_ratio(saavn_str, yt_str))
+            if score > best_score:
+                best_score = score
+                best_match = yt_item
+        if best_match:
+            merged_results.append(select_best_match(saavn_item, best_match))
+            used_yt_ids.add(best_match['id'])
+        else:
+            merged_results.append(saavn_item)
+    for yt_item in yt_results:
+        if yt_item['id'] not in used_yt_ids:
+            merged_results.append(yt_item)
+    return merged_results[:limit]
+
+
+def _word(rng):
+    return ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9)))
+
+
+def make_results(limit, seed=0):
+    """Two result lists where about half the songs appear on both providers"""
+    rng = random.Random(seed)
+    songs = [(' '.join(_word(rng) for _ in range(rng.randint(1, 4))).title(),
+              ', '.join(_word(rng).title() for _ in range(rng.randint(1, 2))))
+             for _ in range(limit * 2)]
+
+    saavn = [{'id': f's{i}', 'title': title, 'artist': artist}
+             for i, (title, artist) in enumerate(songs[:limit])]
+    yt = []
+    for i in range(limit):
+        if i % 2 == 0:
+            # Same song, spelled the way YouTube Music tends to
+            title, artist = songs[rng.randrange(limit)]
+            title = rng.choice([title, f'{title} (Official Audio)', f'{title} (feat. {_word(rng).title()})'])
+        else:
+            title, artist = songs[limit + i]
+        yt.append({'id': f'y{i}', 'title': title, 'artist': artist})
+    return saavn, yt
+
+
+def main():
+    print(f"{'limit':>6} {'legacy (ms)':>12} {'engine (ms)':>12} {'speedup':>8}")
+    for limit in LIMITS:
+        saavn, yt = make_results(limit)
+        query = saavn[0]['title']
+        number = max(1, 200 // limit)
+
+        legacy = min(timeit.repeat(lambda: legacy_merge(query, saavn, yt, limit),
+                                   number=number, repeat=REPEAT)) / number
+        engine = min(timeit.repeat(lambda: merge_tracks(query, saavn, yt, limit),
+                                   number=number, repeat=REPEAT)) / number
+
+        print(f"{limit:>6} {legacy * 1000:>12.2f} {engine * 1000:>12.2f} {legacy / engine:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
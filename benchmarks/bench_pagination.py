@@ -0,0 +1,70 @@
+"""Benchmark /search pagination: what each page of a deep scroll costs.
+
+Walks --pages pages of /search for a fresh query per provider, passing each
+page's ``next`` cursor back the way static/script.js does on scroll, and
+reports per page the response time and the upstream requests it made
+(counted by upstream_sim.py, which answers after --latency seconds). The
+first page makes the same requests /search made before it had cursors;
+each deeper page fetches at most one more upstream page per provider, and
+none while the previous one still has tracks to show. Last, the requests a
+search would make up front if it fetched everything --pages pages show.
+
+Runs the app in-process against the simulator. Run from the repository root:
+
+    python benchmarks/bench_pagination.py
+    python benchmarks/bench_pagination.py --pages 8 --latency 0.1
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upstream_sim import SimulatorSettings, start_simulator  # noqa: E402
+
+
+def walk(app, settings, provider, query, pages):
+    """[(seconds, upstream requests, tracks)] per page"""
+    client = app.app.test_client()
+    rows = []
+    cursor = None
+    for _ in range(pages):
+        before = sum(settings.requests.values())
+        start = time.perf_counter()
+        url = f'/search?q={query}&provider={provider}' + (f'&cursor={cursor}' if cursor else '')
+        data = client.get(url).json
+        rows.append((time.perf_counter() - start, sum(settings.requests.values()) - before, len(data['results'])))
+        cursor = data['next']
+        if not cursor:
+            break
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=6, help='pages walked per provider')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per upstream request')
+    args = parser.parse_args()
+
+    settings = SimulatorSettings(args.latency, 0.0, 0.0, None, None, None)
+    simulator = start_simulator(settings=settings)
+    sim_url = f'http://127.0.0.1:{simulator.server_address[1]}'
+    os.environ.update(SAAVN_BASE_URL=f'{sim_url}/api.php', YTM_BASE_URL=sim_url, LOG_LEVEL='ERROR',
+                      CATALOG_PATH='', CACHE_BACKEND='memory', HOME_FEED_QUERIES=' ', WARMUP_YTDLP='0',
+                      SEARCH_RATE_LIMIT='0')
+    import app
+    app.warmup()
+
+    print(f'upstream answers in {args.latency * 1000:.0f} ms; per page: ms/upstream requests')
+    print(f"{'provider':<9} " + ' '.join(f'{f"page {n}":>11}' for n in range(1, args.pages + 1))
+          + f" {'tracks':>7} {'requests':>9}")
+    for provider in ('saavn', 'youtube', 'mixed', 'all'):
+        rows = walk(app, settings, provider, f'bench {provider}', args.pages)
+        cells = ' '.join(f'{seconds * 1000:>7.0f}/{calls:<3}' for seconds, calls, _ in rows)
+        print(f'{provider:<9} {cells} {sum(tracks for _, _, tracks in rows):>7} '
+              f'{sum(calls for _, calls, _ in rows):>9}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark play-queue prefetch: how long a track change waits for /stream.
+
+--listeners listeners each play through a queue of --tracks uncached
+JioSaavn tracks, listening --listen seconds to each before pressing next,
+the way static/script.js does: /stream for the track, then (with prefetch)
+/queue/prefetch with the upcoming ones. upstream_sim.py answers every
+JioSaavn request after --latency seconds. Reported per mode: latency of the
+/stream calls made on track changes, i.e. everything after the first track.
+
+Runs the app in-process against the simulator. Run from the repository root:
+
+    python benchmarks/bench_prefetch.py
+    python benchmarks/bench_prefetch.py --latency 0.5 --listen 0.2
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loadtest import percentile  # noqa: E402
+from upstream_sim import SimulatorSettings, start_simulator  # noqa: E402
+
+
+def run_mode(app, mode, args):
+    client = app.app.test_client()
+    latencies = []
+    lock = threading.Lock()
+
+    def listener(n):
+        queue = [{'id': f'{mode}-{n}-{i}', 'provider': 'saavn'} for i in range(args.tracks)]
+        for i, track in enumerate(queue):
+            start = time.perf_counter()
+            client.get(f"/stream?id={track['id']}&provider=saavn", environ_base={'REMOTE_ADDR': f'10.0.0.{n}'})
+            if i:
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+            if mode == 'prefetch':
+                client.post('/queue/prefetch', json={'session': str(n), 'tracks': queue[i + 1:i + 1 + args.ahead]},
+                            environ_base={'REMOTE_ADDR': f'10.0.0.{n}'})
+            time.sleep(args.listen)
+
+    threads = [threading.Thread(target=listener, args=(n,)) for n in range(args.listeners)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    print(f'{mode:<10} {percentile(latencies, 50) * 1000:>12.1f} {percentile(latencies, 99) * 1000:>12.1f} '
+          f'{latencies[-1] * 1000:>12.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--listeners', type=int, default=4)
+    parser.add_argument('--tracks', type=int, default=8, help='tracks in each queue')
+    parser.add_argument('--listen', type=float, default=0.5, help='seconds spent on each track')
+    parser.add_argument('--ahead', type=int, default=3, help='upcoming tracks sent to /queue/prefetch')
+    parser.add_argument('--latency', type=float, default=0.3, help='seconds per JioSaavn request')
+    args = parser.parse_args()
+
+    simulator = start_simulator(settings=SimulatorSettings(args.latency, 0.0, 0.0, None, None, None))
+    sim_url = f'http://127.0.0.1:{simulator.server_address[1]}'
+    os.environ.update(SAAVN_BASE_URL=f'{sim_url}/api.php', YTM_BASE_URL=sim_url, LOG_LEVEL='ERROR',
+                      CATALOG_PATH='', CACHE_BACKEND='memory', HOME_FEED_QUERIES=' ', WARMUP_YTDLP='0',
+                      STREAM_RATE_LIMIT='0', PREFETCH_RATE_LIMIT='0', PREFETCH_AHEAD=str(args.ahead))
+    import app
+    app.warmup()
+
+    print(f'{args.listeners} listeners x {args.tracks} tracks, {args.listen:.1f}s per track; '
+          f'JioSaavn answers in {args.latency * 1000:.0f} ms')
+    print(f"{'mode':<10} {'change p50':>12} {'change p99':>12} {'change max':>12}")
+    for mode in ('cold', 'prefetch'):
+        run_mode(app, mode, args)
+
+
+if __name__ == '__main__':
+    main()
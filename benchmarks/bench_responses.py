@@ -0,0 +1,78 @@
+"""Benchmark the response layer on a /search answer: bytes on the wire and CPU per response.
+
+Builds --tracks-track /search payloads from synthetic JioSaavn songs and
+reports, per way of answering:
+
+- bytes sent: identity, gzip, brotli (when installed), and a 304 revalidation
+- server time per response through responses.finish: the first time an
+  answer is compressed, and once its compressed body is reused by ETag
+
+Run from the repository root:
+
+    python benchmarks/bench_responses.py
+    python benchmarks/bench_responses.py --tracks 50
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import responses  # noqa: E402
+from make_fixtures import saavn_song  # noqa: E402
+from track import dumps, saavn_track  # noqa: E402
+
+REPEAT = 5
+
+
+def per_call(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=REPEAT)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tracks', type=int, default=20, help='tracks per /search answer')
+    parser.add_argument('--number', type=int, default=500, help='responses timed per repeat')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    songs = [saavn_song(rng, i) for i in range(args.tracks)]
+    payload = {'results': [saavn_track(song) for song in songs], 'partial': False}
+    body = dumps(payload).encode()
+    tag = responses.etag(body)
+
+    def finish(accept_encoding, if_none_match=None):
+        return responses.finish('GET', '/search', 200, 'application/json', body, if_none_match, accept_encoding)
+
+    def cold(accept_encoding):
+        responses.compressed_cache.clear()
+        return finish(accept_encoding)
+
+    print(f'{args.tracks}-track /search answer, {len(body):,} bytes of JSON')
+    print(f"{'answer':>10} {'bytes':>8} {'saved':>7} {'first us':>9} {'reused us':>10}")
+    rows = [('identity', None)] + [(coding, coding) for coding in responses.CODINGS]
+    for label, accept_encoding in rows:
+        sent = len(finish(accept_encoding)[1])
+        first = per_call(lambda: cold(accept_encoding), args.number)
+        reused = per_call(lambda: finish(accept_encoding), args.number)
+        print(f'{label:>10} {sent:>8,} {1 - sent / len(body):>7.0%} {first * 1e6:>9.1f} {reused * 1e6:>10.1f}')
+    status, not_modified, _ = finish('gzip', tag)
+    assert status == 304
+    revalidate = per_call(lambda: finish('gzip', tag), args.number)
+    print(f"{'304':>10} {len(not_modified):>8,} {'100%':>7} {'':>9} {revalidate * 1e6:>10.1f}")
+    if 'br' not in responses.CODINGS:
+        print('(brotli not installed: pip install brotli to compare it)')
+
+    # The same answer through the stdlib encoder, for the JSON half of the cost
+    plain = json.loads(body)
+    stdlib = per_call(lambda: json.dumps(plain, separators=(',', ':'), sort_keys=True), args.number)
+    fast = per_call(lambda: dumps(payload), args.number)
+    print(f'\nJSON encoding: json.dumps {stdlib * 1e6:.1f} us, track.dumps {fast * 1e6:.1f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Benchmark the cache backends the way gunicorn uses them: several worker processes.
+
+Each of --workers processes runs --threads threads that request the same
+--keys popular keys in random order (think /stream ids and /search queries
+everyone asks for). A miss runs a loader that sleeps --load-latency, standing
+in for the upstream call. Reported per backend:
+
+- upstream loads across all workers (ideal: one per key)
+- hit rate over all requests
+- median and p99 latency of a cache hit
+
+Redis runs against benchmarks/redis_sim.py unless --redis-url is given.
+
+Run from the repository root:
+
+    python benchmarks/bench_shared_cache.py
+    python benchmarks/bench_shared_cache.py --workers 8 --redis-url redis://127.0.0.1:6379/0
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import RedisCache, SQLiteCache, TTLCache  # noqa: E402
+from redis_sim import start_redis_sim  # noqa: E402
+
+
+def make(backend, args, name):
+    if backend == 'memory':
+        return TTLCache(args.keys, name=name)
+    if backend == 'sqlite':
+        return SQLiteCache(args.sqlite_path, args.keys, name=name)
+    return RedisCache(args.redis_url, args.keys, name=name, prefix='bench')
+
+
+def worker(backend, args, name, loads, barrier, results):
+    cache = make(backend, args, name)
+    hit_seconds = []
+    lock = threading.Lock()
+
+    def load():
+        with loads.get_lock():
+            loads.value += 1
+        time.sleep(args.load_latency)
+        return f'https://cdn.example/{random.random()}' * 4
+
+    def run(seed):
+        rng = random.Random(seed)
+        for _ in range(args.requests):
+            key = ('youtube', f'video{rng.randrange(args.keys)}')
+            start = time.perf_counter()
+            cached = cache.get(key)
+            elapsed = time.perf_counter() - start
+            if cached is None:
+                cache.get_or_load(key, load, ttl=300)
+            else:
+                with lock:
+                    hit_seconds.append(elapsed)
+
+    barrier.wait()
+    threads = [threading.Thread(target=run, args=(os.getpid() * 100 + i,)) for i in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put(hit_seconds)
+
+
+def bench(backend, args):
+    name = f'bench{time.time_ns()}'  # fresh keys each run
+    context = multiprocessing.get_context('fork')
+    loads = context.Value('i', 0)
+    barrier = context.Barrier(args.workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(backend, args, name, loads, barrier, results))
+                 for _ in range(args.workers)]
+    for process in processes:
+        process.start()
+    hit_seconds = [seconds for _ in processes for seconds in results.get()]
+    for process in processes:
+        process.join()
+
+    total = args.workers * args.threads * args.requests
+    hit_seconds.sort()
+    p99 = hit_seconds[int(len(hit_seconds) * 0.99)] if hit_seconds else 0
+    print(f'{backend:>8} {loads.value:>8} {len(hit_seconds) / total:>9.1%} '
+          f'{statistics.median(hit_seconds) * 1e6 if hit_seconds else 0:>10.1f} {p99 * 1e6:>10.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=500, help='requests per thread')
+    parser.add_argument('--keys', type=int, default=200)
+    parser.add_argument('--load-latency', type=float, default=0.05, help='seconds per upstream load')
+    parser.add_argument('--sqlite-path', default=os.path.join(
+        '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'bench-shared-cache.db'))
+    parser.add_argument('--redis-url', help='a Redis-protocol server; default: start redis_sim.py')
+    parser.add_argument('--backends', default='memory,sqlite,redis')
+    args = parser.parse_args()
+
+    if args.redis_url is None:
+        server = start_redis_sim()
+        args.redis_url = f'redis://127.0.0.1:{server.server_address[1]}/0'
+
+    print(f'{args.workers} workers x {args.threads} threads x {args.requests} requests over {args.keys} keys')
+    print(f"{'backend':>8} {'loads':>8} {'hit rate':>9} {'hit p50 us':>10} {'hit p99 us':>10}")
+    for backend in args.backends.split(','):
+        bench(backend, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark worker startup: cold import of app.py, warmup, and first-request latency.
+
+Each run is a fresh interpreter, pointed at upstream_sim.py so nothing
+leaves the machine. Reported per run (medians over --runs):
+
+- import: ``import app``
+- warmup: ``app.warmup()``, the per-worker hook (skipped with --no-warmup,
+  so first requests pay for whatever is still lazy)
+- first/second request: the same endpoint twice through the test client
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --no-warmup --runs 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from upstream_sim import SimulatorSettings, start_simulator  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = [
+    '/providers',
+    '/search?q=startup&provider=saavn',
+    '/search?q=startup&provider=youtube',
+    '/search?q=startup&provider=mixed',
+]
+
+# Runs in the child interpreter
+CHILD = '''
+import json, sys, time
+start = time.perf_counter()
+import app
+timings = {'import': time.perf_counter() - start}
+timings['heavy_modules'] = sorted(m for m in ('yt_dlp', 'numpy', 'rapidfuzz', 'requests', 'Crypto.Cipher.DES')
+                                  if m in sys.modules)
+if WARMUP and hasattr(app, 'warmup'):
+    start = time.perf_counter()
+    app.warmup()
+    timings['warmup'] = time.perf_counter() - start
+client = app.app.test_client()
+for path in ENDPOINTS:
+    for attempt in ('first', 'second'):
+        start = time.perf_counter()
+        client.get(path)
+        timings[f'{attempt} {path}'] = time.perf_counter() - start
+print(json.dumps(timings))
+'''
+
+
+def run_child(warmup, env):
+    code = f'WARMUP = {warmup!r}\nENDPOINTS = {ENDPOINTS!r}\n' + CHILD
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True,
+                            check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--no-warmup', action='store_true', help="don't call app.warmup() before the first request")
+    parser.add_argument('--latency', type=float, default=0.02, help='simulated upstream latency (s)')
+    args = parser.parse_args()
+
+    simulator = start_simulator(settings=SimulatorSettings(args.latency, 0.0, 0.0, None, None))
+    sim_url = f'http://127.0.0.1:{simulator.server_address[1]}'
+    env = dict(os.environ, SAAVN_BASE_URL=f'{sim_url}/api.php', YTM_BASE_URL=sim_url, LOG_LEVEL='ERROR')
+
+    runs = []
+    for _ in range(args.runs):
+        # Fresh catalog each run, so first requests really go upstream
+        env['CATALOG_PATH'] = os.path.join(tempfile.mkdtemp(), 'catalog.db')
+        runs.append(run_child(not args.no_warmup, env))
+
+    print(f"heavy modules loaded by 'import app': {', '.join(runs[0]['heavy_modules']) or 'none'}")
+    print(f"{'step':<44} {'median ms':>10}")
+    for name in runs[0]:
+        if name == 'heavy_modules':
+            continue
+        print(f'{name:<44} {statistics.median(run[name] for run in runs) * 1000:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Benchmark the Track model against the plain dicts it replaced.
+
+Reports memory held per cached track at 1M tracks, both as cached and once
+every track has been served (encoded for a response), and the cost of
+encoding a /search response (20 tracks) as jsonify did it vs track.dumps,
+both the first time a track is encoded and once its JSON is reused.
+
+Run from the repository root:
+
+    python benchmarks/bench_track.py
+    python benchmarks/bench_track.py --count 200000
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from make_fixtures import saavn_song  # noqa: E402
+from track import _encoded, dumps, saavn_track  # noqa: E402
+
+POOL_SIZE = 1000
+RESPONSE_SIZE = 20
+REPEAT = 5
+
+
+def legacy_track(song):
+    """The dict JioSaavnService.parse_search_results used to build"""
+    more_info = song.get('more_info', {})
+    image_url = song.get('image', '')
+    if image_url:
+        image_url = image_url.replace('150x150', '500x500').replace('50x50', '500x500')
+    return {
+        'id': song.get('id'),
+        'title': song.get('title', ''),
+        'artist': more_info.get('singers', song.get('subtitle', '')),
+        'album': more_info.get('album', ''),
+        'image': image_url,
+        'duration': more_info.get('duration', ''),
+        'year': song.get('year', ''),
+        'language': song.get('language', ''),
+        'has_320kbps': more_info.get('320kbps') == 'true',
+        'type': 'song',
+        'provider': 'saavn'
+    }
+
+
+def legacy_dumps(payload):
+    # What Flask's jsonify does outside debug mode
+    return json.dumps(payload, separators=(',', ':'), sort_keys=True)
+
+
+def build(make, count, encoded_pool):
+    """``count`` tracks, each parsed from fresh JSON the way an upstream response would be"""
+    tracks = []
+    while len(tracks) < count:
+        songs = json.loads(encoded_pool)[:count - len(tracks)]
+        tracks.extend(make(song) for song in songs)
+    return tracks
+
+
+def served_track(song):
+    """A Track that has been in a response, with whatever its encoding left behind"""
+    track = saavn_track(song)
+    track.json()
+    return track
+
+
+def held_bytes(make, count, encoded_pool):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tracks = build(make, count, encoded_pool)
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del tracks
+    return held
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=1_000_000, help='cached tracks for the memory comparison')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pool = [saavn_song(rng, i) for i in range(POOL_SIZE)]
+    encoded_pool = json.dumps(pool)
+
+    print(f'memory held by {args.count:,} cached tracks')
+    legacy_bytes = held_bytes(legacy_track, args.count, encoded_pool)
+    track_bytes = held_bytes(saavn_track, args.count, encoded_pool)
+    served_bytes = held_bytes(served_track, args.count, encoded_pool)
+    _encoded.cache_clear()
+    print(f"{'':>14} {'total (MB)':>11} {'per track (B)':>14}")
+    print(f"{'dict':>14} {legacy_bytes / 1e6:>11.1f} {legacy_bytes / args.count:>14.0f}")
+    print(f"{'Track':>14} {track_bytes / 1e6:>11.1f} {track_bytes / args.count:>14.0f}")
+    print(f"{'Track, served':>14} {served_bytes / 1e6:>11.1f} {served_bytes / args.count:>14.0f}")
+    print(f'{legacy_bytes / served_bytes:.2f}x smaller once served')
+
+    songs = json.loads(encoded_pool)[:RESPONSE_SIZE]
+    tracks = [saavn_track(song) for song in songs]
+    # The artwork variants came after the dicts; give them the same so both encode the same answer
+    legacy_payload = {'results': [dict(legacy_track(song), images=track.images) for song, track in zip(songs, tracks)],
+                      'partial': False}
+    payload = {'results': tracks, 'partial': False}
+    assert dumps(payload) == legacy_dumps(legacy_payload)
+
+    def cold():
+        _encoded.cache_clear()
+        return dumps(payload)
+
+    number = 2000
+    legacy = min(timeit.repeat(lambda: legacy_dumps(legacy_payload), number=number, repeat=REPEAT)) / number
+    first = min(timeit.repeat(cold, number=number, repeat=REPEAT)) / number
+    reused = min(timeit.repeat(lambda: dumps(payload), number=number, repeat=REPEAT)) / number
+
+    print(f'\nencoding a {RESPONSE_SIZE}-track /search response')
+    print(f"{'':>16} {'us':>8} {'speedup':>8}")
+    print(f"{'jsonify (dict)':>16} {legacy * 1e6:>8.1f} {'':>8}")
+    print(f"{'dumps, first':>16} {first * 1e6:>8.1f} {legacy / first:>7.2f}x")
+    print(f"{'dumps, reused':>16} {reused * 1e6:>8.1f} {legacy / reused:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
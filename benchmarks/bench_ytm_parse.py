@@ -0,0 +1,185 @@
+"""Benchmark youtubei search parsing: the old .get() chains vs the compiled paths of
+ytmusic_parse.parse_search_page, the parser the app runs.
+
+For each recorded fixture (benchmarks/fixtures/ytm_search_<n>.json) reports
+items per second and memory allocated per response for:
+
+- parse: the old parser vs the compiled paths, on an already decoded body
+- decode + parse: json.loads + the old parser vs orjson + the compiled paths
+  (the stdlib decoder is used for both when orjson is not installed)
+
+Allocations are tracemalloc's peak above the starting point while one
+response is handled. Both parsers must produce the same tracks. Last, a
+fixture with layouts broken on purpose shows failures being counted.
+
+Run from the repository root:
+
+    python benchmarks/bench_ytm_parse.py
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ytmusic_parse  # noqa: E402
+from make_fixtures import FIXTURES_DIR, YTM_SIZES  # noqa: E402
+from track import youtube_track  # noqa: E402
+
+try:
+    import orjson
+    fast_loads = orjson.loads
+except ImportError:
+    fast_loads = json.loads
+
+REPEAT = 5
+
+
+def legacy_parse(data, limit=10):
+    """YtMusicService._parse_search_results as it was, minus its logging"""
+    results = []
+
+    try:
+        contents = data.get('contents', {})
+        tabs = contents.get('tabbedSearchResultsRenderer', {}).get('tabs', [])
+
+        if not tabs:
+            return []
+
+        tab_content = tabs[0].get('tabRenderer', {}).get('content', {})
+        sections = tab_content.get('sectionListRenderer', {}).get('contents', [])
+
+        for section in sections:
+            items = section.get('musicShelfRenderer', {}).get('contents', [])
+
+            for item in items:
+                if len(results) >= limit:
+                    break
+
+                try:
+                    renderer = item.get('musicResponsiveListItemRenderer', {})
+
+                    video_id = renderer.get('playlistItemData', {}).get('videoId')
+                    if not video_id:
+                        continue
+
+                    title_runs = renderer.get('flexColumns', [{}])[0].get(
+                        'musicResponsiveListItemFlexColumnRenderer', {}
+                    ).get('text', {}).get('runs', [])
+                    title = title_runs[0].get('text', '') if title_runs else ''
+
+                    subtitle_runs = []
+                    if len(renderer.get('flexColumns', [])) > 1:
+                        subtitle_runs = renderer.get('flexColumns', [])[1].get(
+                            'musicResponsiveListItemFlexColumnRenderer', {}
+                        ).get('text', {}).get('runs', [])
+
+                    artists = []
+                    album = ''
+                    duration = ''
+
+                    for run in subtitle_runs:
+                        text = run.get('text', '')
+                        endpoint = run.get('navigationEndpoint', {}).get('browseEndpoint', {})
+                        page_type = endpoint.get('browseEndpointContextSupportedConfigs', {}).get(
+                            'browseEndpointContextMusicConfig', {}
+                        ).get('pageType', '')
+
+                        if page_type == 'MUSIC_PAGE_TYPE_ARTIST':
+                            artists.append(text)
+                        elif page_type == 'MUSIC_PAGE_TYPE_ALBUM':
+                            album = text
+                        elif ':' in text and text.replace(':', '').replace(' ', '').isdigit():
+                            parts = text.split(':')
+                            if len(parts) == 2:
+                                duration = str(int(parts[0]) * 60 + int(parts[1]))
+
+                    thumbnails = renderer.get('thumbnail', {}).get(
+                        'musicThumbnailRenderer', {}
+                    ).get('thumbnail', {}).get('thumbnails', [])
+                    thumbnail = thumbnails[0].get('url', '') if thumbnails else ''
+
+                    results.append(youtube_track(video_id, title, artists, album, thumbnail, duration))
+
+                except Exception:
+                    continue
+
+    except Exception:
+        pass
+
+    return results
+
+
+def per_call(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=REPEAT)) / number
+
+
+def allocated(fn):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return peak
+
+
+def broken(data):
+    """The fixture with a few layouts changed: items missing a thumbnail, a title or a video id"""
+    data = copy.deepcopy(data)
+    items = data['contents']['tabbedSearchResultsRenderer']['tabs'][0]['tabRenderer']['content'][
+        'sectionListRenderer']['contents'][0]['musicShelfRenderer']['contents']
+    del items[0]['musicResponsiveListItemRenderer']['thumbnail']
+    items[1]['musicResponsiveListItemRenderer']['flexColumns'][0] = {'musicTwoRowItemRenderer': {}}
+    del items[2]['musicResponsiveListItemRenderer']['playlistItemData']
+    items[3] = {'musicMultiRowListItemRenderer': {}}
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=50, help='responses timed per repeat')
+    args = parser.parse_args()
+
+    print(f"{'items':>6} {'KB':>5} | {'parse: old':>11} {'compiled':>9} {'x':>5} {'old KB':>7} {'new KB':>7} | "
+          f"{'decode+parse: old':>17} {'new':>9} {'x':>5} {'old KB':>7} {'new KB':>7}")
+    for size in YTM_SIZES:
+        with open(os.path.join(FIXTURES_DIR, f'ytm_search_{size}.json'), 'rb') as f:
+            body = f.read()
+        data = json.loads(body)
+        assert ([track.to_dict() for track in legacy_parse(data, size)]
+                == [track.to_dict() for track in ytmusic_parse.parse_search_page(data)[0]])
+
+        old_parse = per_call(lambda: legacy_parse(data, size), args.number)
+        new_parse = per_call(lambda: ytmusic_parse.parse_search_page(data), args.number)
+        old_full = per_call(lambda: legacy_parse(json.loads(body), size), args.number)
+        new_full = per_call(lambda: ytmusic_parse.parse_search_page(fast_loads(body)), args.number)
+
+        old_parse_kb = allocated(lambda: legacy_parse(data, size)) / 1024
+        new_parse_kb = allocated(lambda: ytmusic_parse.parse_search_page(data)) / 1024
+        old_full_kb = allocated(lambda: legacy_parse(json.loads(body), size)) / 1024
+        new_full_kb = allocated(lambda: ytmusic_parse.parse_search_page(fast_loads(body))) / 1024
+
+        print(f'{size:>6} {len(body) / 1024:>5.0f} | {size / old_parse:>11,.0f} {size / new_parse:>9,.0f} '
+              f'{old_parse / new_parse:>5.1f} {old_parse_kb:>7.1f} {new_parse_kb:>7.1f} | '
+              f'{size / old_full:>17,.0f} {size / new_full:>9,.0f} {old_full / new_full:>5.1f} '
+              f'{old_full_kb:>7.0f} {new_full_kb:>7.0f}')
+    print('(items/s; x = speedup; KB = peak allocated per response)')
+
+    with open(os.path.join(FIXTURES_DIR, 'ytm_search_10.json'), 'rb') as f:
+        data = broken(json.loads(f.read()))
+    before = ytmusic_parse.failure_counts()
+    tracks, _ = ytmusic_parse.parse_search_page(data)
+    after = ytmusic_parse.failure_counts()
+    counted = {field: after[field] - before.get(field, 0) for field in after if after[field] != before.get(field, 0)}
+    print(f'\nbroken layouts: {len(tracks)} of 10 tracks parsed, old parser {len(legacy_parse(data, 10))}; '
+          f'failures counted: {counted}')
+
+
+if __name__ == '__main__':
+    main()
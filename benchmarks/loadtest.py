@@ -0,0 +1,159 @@
+"""Load-test the app offline: throughput and p50/p95/p99 per route.
+
+By default this starts upstream_sim.py and the app in-process, wired
+together through SAAVN_BASE_URL / YTM_BASE_URL, so nothing leaves the
+machine. Use --target to hit an already running app instead (point that app
+at the simulator yourself).
+
+    python benchmarks/loadtest.py --duration 10 --concurrency 16
+    python benchmarks/loadtest.py --scenarios search-saavn,stream-saavn --json results.json
+
+YouTube /stream resolution runs yt-dlp against youtube.com and cannot be
+simulated, so only JioSaavn streams are exercised.
+"""
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from upstream_sim import SimulatorSettings, start_simulator  # noqa: E402
+
+SCENARIOS = {
+    'index': lambda rng, q, sid: '/',
+    'search-saavn': lambda rng, q, sid: f'/search?q={q}&provider=saavn',
+    'search-youtube': lambda rng, q, sid: f'/search?q={q}&provider=youtube',
+    'search-mixed': lambda rng, q, sid: f'/search?q={q}&provider=mixed',
+    'search-all': lambda rng, q, sid: f'/search?q={q}&provider=all',
+    'stream-saavn': lambda rng, q, sid: f'/stream?id={sid}&provider=saavn',
+}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(base_url, name, duration, concurrency, queries, song_ids):
+    make_path = SCENARIOS[name]
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(seed):
+        rng = random.Random(seed)
+        session = requests.Session()
+        local_latencies = []
+        local_errors = 0
+        while time.monotonic() < deadline:
+            path = make_path(rng, rng.choice(queries), rng.choice(song_ids))
+            start = time.perf_counter()
+            try:
+                response = session.get(base_url + path, timeout=30)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            local_latencies.append(time.perf_counter() - start)
+            if not ok:
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    return {
+        'scenario': name,
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def spawn_stack(args):
+    """Start the simulator and the app on ephemeral ports; returns the app's base URL"""
+    settings = SimulatorSettings(args.latency, args.jitter, args.error_rate, args.saavn_latency, args.ytm_latency)
+    simulator = start_simulator(settings=settings)
+    sim_url = f'http://127.0.0.1:{simulator.server_address[1]}'
+    os.environ['SAAVN_BASE_URL'] = f'{sim_url}/api.php'
+    os.environ['YTM_BASE_URL'] = sim_url
+    # A fresh catalog per run, so simulated tracks never land in the real one
+    os.environ.setdefault('CATALOG_PATH', os.path.join(tempfile.mkdtemp(), 'catalog.db'))
+    # All load comes from one address: per-client limits would measure nothing but 429s
+    for route_class in ('STREAM', 'SEARCH', 'SUGGEST', 'PREFETCH'):
+        os.environ[f'{route_class}_RATE_LIMIT'] = '0'
+
+    # The app reads its settings at import time, so import only after the env is set
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    import app as app_module
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, name='app', daemon=True).start()
+    return f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', help='base URL of a running app; default spawns app + simulator')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--distinct-queries', type=int, default=200,
+                        help='size of the query pool; smaller means more cache hits')
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--saavn-latency', type=float)
+    parser.add_argument('--ytm-latency', type=float)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    queries = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10)))
+               for _ in range(args.distinct_queries)]
+    song_ids = [''.join(rng.choices(string.ascii_letters + string.digits, k=8))
+                for _ in range(args.distinct_queries)]
+
+    base_url = args.target.rstrip('/') if args.target else spawn_stack(args)
+
+    results = []
+    print(f"{'scenario':<16} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name in args.scenarios.split(','):
+        result = run_scenario(base_url, name.strip(), args.duration, args.concurrency, queries, song_ids)
+        results.append(result)
+        print(f"{result['scenario']:<16} {result['requests']:>9} {result['errors']:>7} {result['rps']:>9.1f} "
+              f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
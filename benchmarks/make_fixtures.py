@@ -0,0 +1,251 @@
+"""Generate the upstream fixtures replayed by upstream_sim.py.
+
+The files mirror the shape of real JioSaavn api.php and youtubei/v1/search
+responses (including the fields the app ignores) with deterministic fake
+content. Real recordings can be dropped into benchmarks/fixtures/ under the
+same names instead.
+
+    python benchmarks/make_fixtures.py
+"""
+import base64
+import json
+import os
+import random
+import string
+
+from Crypto.Cipher import DES
+from Crypto.Util.Padding import pad
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Number of items in each youtubei search fixture: ytm_search_<n>.json
+YTM_SIZES = [10, 20, 50, 100]
+
+SAAVN_DES_KEY = b'38346591'
+
+
+def _word(rng):
+    return ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))).title()
+
+
+def _phrase(rng, low=1, high=4):
+    return ' '.join(_word(rng) for _ in range(rng.randint(low, high)))
+
+
+def _encrypt_media_url(url):
+    cipher = DES.new(SAAVN_DES_KEY, DES.MODE_ECB)
+    return base64.b64encode(cipher.encrypt(pad(url.encode('utf-8'), DES.block_size))).decode('ascii')
+
+
+def saavn_song(rng, index, details=False):
+    """One song entry as returned by autocomplete.get / content.getTrending / song.getDetails"""
+    song_id = ''.join(rng.choices(string.ascii_letters + string.digits, k=8))
+    title = _phrase(rng)
+    singers = ', '.join(_word(rng) + ' ' + _word(rng) for _ in range(rng.randint(1, 3)))
+    album = _phrase(rng, 1, 3)
+    image = f'https://c.saavncdn.com/{index:03d}/{title.replace(" ", "-")}-Hindi-2023-20230101000000-150x150.jpg'
+    song = {
+        'id': song_id,
+        'title': title,
+        'subtitle': f'{singers} - {album}',
+        'type': 'song',
+        'image': image,
+        'perma_url': f'https://www.jiosaavn.com/song/{title.lower().replace(" ", "-")}/{song_id}',
+        'language': rng.choice(['hindi', 'english', 'punjabi', 'tamil']),
+        'year': str(rng.randint(1990, 2025)),
+        'play_count': str(rng.randint(1000, 90000000)),
+        'explicit_content': '0',
+        'list_count': '0',
+        'list_type': '',
+        'list': '',
+        'more_info': {
+            'music': singers,
+            'album_id': str(rng.randint(10000000, 99999999)),
+            'album': album,
+            'label': _phrase(rng, 1, 2) + ' Music',
+            'origin': 'search',
+            'is_dolby_content': False,
+            '320kbps': rng.choice(['true', 'false']),
+            'encrypted_media_url': _encrypt_media_url(
+                f'http://aac.saavncdn.com/{index:03d}/{song_id}_96.mp4?bitrate=96'),
+            'album_url': f'https://www.jiosaavn.com/album/{album.lower().replace(" ", "-")}/{song_id[::-1]}',
+            'duration': str(rng.randint(120, 420)),
+            'rights': {'code': '0', 'cacheable': 'true', 'delete_cached_object': 'false', 'reason': ''},
+            'has_lyrics': 'false',
+            'singers': singers,
+            'primary_artists': singers,
+            'vlink': '',
+            'triller_available': False,
+            'release_date': '2023-01-01',
+        },
+    }
+    if details:
+        song['encrypted_media_url'] = song['more_info']['encrypted_media_url']
+    return song
+
+
+def saavn_autocomplete(rng, count=20):
+    return {
+        'albums': {'data': [{'id': str(rng.randint(10 ** 7, 10 ** 8)), 'title': _phrase(rng), 'type': 'album'}
+                            for _ in range(3)], 'position': 3},
+        'songs': {'data': [saavn_song(rng, i) for i in range(count)], 'position': 1},
+        'playlists': {'data': [], 'position': 4},
+        'artists': {'data': [{'id': str(rng.randint(10 ** 5, 10 ** 6)), 'title': _phrase(rng, 2, 2),
+                              'type': 'artist'}], 'position': 2},
+        'topquery': {'data': [], 'position': 0},
+        'shows': {'data': [], 'position': 5},
+        'episodes': {'data': [], 'position': 6},
+    }
+
+
+def saavn_trending(rng, count=30):
+    return [saavn_song(rng, i) for i in range(count)]
+
+
+def _browse_run(text, browse_id, page_type):
+    return {
+        'text': text,
+        'navigationEndpoint': {
+            'clickTrackingParams': 'CAAQ' + 'x' * 40,
+            'browseEndpoint': {
+                'browseId': browse_id,
+                'browseEndpointContextSupportedConfigs': {
+                    'browseEndpointContextMusicConfig': {'pageType': page_type}
+                }
+            }
+        }
+    }
+
+
+def _menu(rng, video_id):
+    items = []
+    for label in ['Start radio', 'Play next', 'Add to queue', 'Save to library',
+                  'Add to playlist', 'Go to album', 'Go to artist', 'Share']:
+        items.append({'menuNavigationItemRenderer': {
+            'text': {'runs': [{'text': label}]},
+            'icon': {'iconType': label.upper().replace(' ', '_')},
+            'navigationEndpoint': {'clickTrackingParams': 'CAAQ' + 'y' * 40,
+                                   'watchEndpoint': {'videoId': video_id, 'params': 'wAEB'}},
+            'trackingParams': 'CAAQ' + 'z' * 40,
+        }})
+    return {'menuRenderer': {'items': items, 'trackingParams': 'CAAQ' + 'm' * 40,
+                             'accessibility': {'accessibilityData': {'label': 'Action menu'}}}}
+
+
+def ytm_item(rng):
+    video_id = ''.join(rng.choices(string.ascii_letters + string.digits + '-_', k=11))
+    title = _phrase(rng)
+    artists = [_word(rng) + ' ' + _word(rng) for _ in range(rng.randint(1, 2))]
+    album = _phrase(rng, 1, 3)
+    seconds = rng.randint(120, 420)
+
+    subtitle_runs = [{'text': 'Song'}, {'text': ' • '}]
+    for i, artist in enumerate(artists):
+        if i:
+            subtitle_runs.append({'text': ' & '})
+        subtitle_runs.append(_browse_run(artist, 'UC' + video_id * 2, 'MUSIC_PAGE_TYPE_ARTIST'))
+    subtitle_runs += [
+        {'text': ' • '},
+        _browse_run(album, 'MPREb_' + video_id, 'MUSIC_PAGE_TYPE_ALBUM'),
+        {'text': ' • '},
+        {'text': f'{seconds // 60}:{seconds % 60:02d}'},
+    ]
+
+    thumb = f'https://lh3.googleusercontent.com/{video_id}{"A" * 60}'
+    return {'musicResponsiveListItemRenderer': {
+        'trackingParams': 'CAAQ' + 't' * 40,
+        'thumbnail': {'musicThumbnailRenderer': {
+            'thumbnail': {'thumbnails': [
+                {'url': f'{thumb}=w60-h60-l90-rj', 'width': 60, 'height': 60},
+                {'url': f'{thumb}=w120-h120-l90-rj', 'width': 120, 'height': 120},
+            ]},
+            'thumbnailCrop': 'MUSIC_THUMBNAIL_CROP_UNSPECIFIED',
+            'thumbnailScale': 'MUSIC_THUMBNAIL_SCALE_ASPECT_FIT',
+            'trackingParams': 'CAAQ' + 'u' * 40,
+        }},
+        'overlay': {'musicItemThumbnailOverlayRenderer': {
+            'background': {'verticalGradient': {'gradientLayerColors': ['3422552064', '3422552064']}},
+            'content': {'musicPlayButtonRenderer': {
+                'playNavigationEndpoint': {'watchEndpoint': {'videoId': video_id}},
+                'trackingParams': 'CAAQ' + 'p' * 40,
+                'playIcon': {'iconType': 'PLAY_ARROW'},
+                'pauseIcon': {'iconType': 'PAUSE'},
+            }},
+            'contentPosition': 'MUSIC_ITEM_THUMBNAIL_OVERLAY_CONTENT_POSITION_CENTERED',
+            'displayStyle': 'MUSIC_ITEM_THUMBNAIL_OVERLAY_DISPLAY_STYLE_PERSISTENT',
+        }},
+        'flexColumns': [
+            {'musicResponsiveListItemFlexColumnRenderer': {
+                'text': {'runs': [{'text': title, 'navigationEndpoint': {
+                    'watchEndpoint': {'videoId': video_id,
+                                      'watchEndpointMusicSupportedConfigs': {'watchEndpointMusicConfig': {
+                                          'musicVideoType': 'MUSIC_VIDEO_TYPE_ATV'}}}}}]},
+                'displayPriority': 'MUSIC_RESPONSIVE_LIST_ITEM_COLUMN_DISPLAY_PRIORITY_HIGH',
+            }},
+            {'musicResponsiveListItemFlexColumnRenderer': {
+                'text': {'runs': subtitle_runs},
+                'displayPriority': 'MUSIC_RESPONSIVE_LIST_ITEM_COLUMN_DISPLAY_PRIORITY_HIGH',
+            }},
+        ],
+        'menu': _menu(rng, video_id),
+        'playlistItemData': {'videoId': video_id},
+        'flexColumnDisplayStyle': 'MUSIC_RESPONSIVE_LIST_ITEM_FLEX_COLUMN_DISPLAY_STYLE_TWO_LINE_STACK',
+        'itemHeight': 'MUSIC_ITEM_HEIGHT_DEFAULT',
+    }}
+
+
+def ytm_search(rng, count=20):
+    shelf = {
+        'title': {'runs': [{'text': 'Songs'}]},
+        'contents': [ytm_item(rng) for _ in range(count)],
+        'trackingParams': 'CAAQ' + 's' * 40,
+        'continuations': [{'nextContinuationData': {
+            'continuation': 'EqcDEg' + ''.join(rng.choices(string.ascii_letters, k=120)),
+            'clickTrackingParams': 'CAAQ' + 'c' * 40,
+        }}],
+        'shelfDivider': {'musicShelfDividerRenderer': {'hidden': True}},
+    }
+    return {
+        'responseContext': {
+            'visitorData': 'Cgt' + ''.join(rng.choices(string.ascii_letters, k=40)),
+            'serviceTrackingParams': [{'service': name, 'params': [{'key': 'e', 'value': ','.join(
+                str(rng.randint(10 ** 7, 10 ** 8)) for _ in range(40))}]}
+                for name in ['GFEEDBACK', 'CSI', 'ECATCHER']],
+        },
+        'contents': {'tabbedSearchResultsRenderer': {'tabs': [{'tabRenderer': {
+            'title': 'YT Music',
+            'selected': True,
+            'content': {'sectionListRenderer': {
+                'contents': [{'musicShelfRenderer': shelf}],
+                'header': {'chipCloudRenderer': {'chips': [
+                    {'chipCloudChipRenderer': {'text': {'runs': [{'text': label}]},
+                                               'trackingParams': 'CAAQ' + 'h' * 40}}
+                    for label in ['Songs', 'Videos', 'Albums', 'Artists', 'Playlists']]}},
+                'trackingParams': 'CAAQ' + 'l' * 40,
+            }},
+            'tabIdentifier': 'music_search_catalog',
+            'trackingParams': 'CAAQ' + 'r' * 40,
+        }}]}},
+        'trackingParams': 'CAAQ' + 'q' * 40,
+    }
+
+
+def write_fixture(name, data):
+    path = os.path.join(FIXTURES_DIR, name)
+    with open(path, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    print(f"wrote {path} ({os.path.getsize(path)} bytes)")
+
+
+def main():
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    rng = random.Random(42)
+    write_fixture('saavn_autocomplete.json', saavn_autocomplete(rng))
+    write_fixture('saavn_trending.json', saavn_trending(rng))
+    write_fixture('saavn_song_details.json', saavn_song(rng, 0, details=True))
+    for size in YTM_SIZES:
+        write_fixture(f'ytm_search_{size}.json', ytm_search(rng, size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Minimal Redis-protocol (RESP2) server: a stand-in for CACHE_BACKEND=redis.
+
+Implements only what cache.RedisCache uses (GET, SET with PX/EX/NX/XX,
+DEL, SCAN, DBSIZE, FLUSHDB, PING), in memory, with lazy expiry. Any real
+Redis-compatible server works the same; this one just needs no install:
+
+    python benchmarks/redis_sim.py --port 6399
+    CACHE_BACKEND=redis CACHE_REDIS_URL=redis://127.0.0.1:6399/0 python app.py
+"""
+import argparse
+import fnmatch
+import socketserver
+import threading
+import time
+
+
+class Store:
+    def __init__(self):
+        self._data = {}  # key -> (value, expires_at or None)
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            return entry[0] if entry else None
+
+    def set(self, key, value, ttl=None, nx=False, xx=False):
+        with self._lock:
+            now = time.monotonic()
+            exists = self._live(key, now) is not None
+            if (nx and exists) or (xx and not exists):
+                return False
+            self._data[key] = (value, now + ttl if ttl is not None else None)
+            return True
+
+    def delete(self, keys):
+        with self._lock:
+            now = time.monotonic()
+            deleted = 0
+            for key in keys:
+                if self._live(key, now) is not None:
+                    del self._data[key]
+                    deleted += 1
+            return deleted
+
+    def keys(self, pattern):
+        with self._lock:
+            now = time.monotonic()
+            return [key for key in list(self._data)
+                    if self._live(key, now) is not None and fnmatch.fnmatchcase(key, pattern)]
+
+    def size(self):
+        with self._lock:
+            now = time.monotonic()
+            return sum(1 for key in list(self._data) if self._live(key, now) is not None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def encode(reply):
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, bool):
+        return b'+OK\r\n' if reply else b'$-1\r\n'
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if isinstance(reply, Exception):
+        return f'-ERR {reply}\r\n'.encode()
+    if isinstance(reply, list):
+        return b'*%d\r\n' % len(reply) + b''.join(encode(item) for item in reply)
+    if isinstance(reply, str):
+        return f'+{reply}\r\n'.encode()
+    return b'$%d\r\n%s\r\n' % (len(reply), reply)
+
+
+def execute(store, args):
+    command = args[0].upper()
+    if command == b'GET':
+        return store.get(args[1])
+    if command == b'SET':
+        ttl, nx, xx = None, False, False
+        options = iter(args[3:])
+        for option in options:
+            option = option.upper()
+            if option == b'PX':
+                ttl = int(next(options)) / 1000
+            elif option == b'EX':
+                ttl = int(next(options))
+            elif option == b'NX':
+                nx = True
+            elif option == b'XX':
+                xx = True
+        return store.set(args[1], args[2], ttl, nx, xx)
+    if command == b'DEL':
+        return store.delete(args[1:])
+    if command == b'SCAN':
+        # The whole keyspace in one page
+        pattern = b'*'
+        for i, option in enumerate(args[2:-1], start=2):
+            if option.upper() == b'MATCH':
+                pattern = args[i + 1]
+        return [b'0', store.keys(pattern)]
+    if command == b'DBSIZE':
+        return store.size()
+    if command == b'FLUSHDB':
+        store.clear()
+        return 'OK'
+    if command == b'PING':
+        return 'PONG'
+    if command in (b'SELECT', b'CLIENT'):
+        return 'OK'
+    return ValueError(f"unknown command '{command.decode(errors='replace')}'")
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if not line.startswith(b'*'):
+                args = line.split()  # inline command, e.g. from telnet
+            else:
+                args = []
+                for _ in range(int(line[1:])):
+                    length = int(self.rfile.readline()[1:])
+                    args.append(self.rfile.read(length + 2)[:-2])
+            if not args:
+                continue
+            self.wfile.write(encode(execute(self.server.store, args)))
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 511  # Redis's default backlog; socketserver's 5 drops bursts of new workers
+
+    def __init__(self, address):
+        super().__init__(address, RespHandler)
+        self.store = Store()
+
+
+def start_redis_sim(host='127.0.0.1', port=0):
+    """Serve on a daemon thread; returns the server (``server.server_address`` has the port)"""
+    server = RespServer((host, port))
+    threading.Thread(target=server.serve_forever, name='redis-sim', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6399)
+    args = parser.parse_args()
+
+    server = RespServer((args.host, args.port))
+    print(f'Redis stand-in on redis://{args.host}:{args.port}/0')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
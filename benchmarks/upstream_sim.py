@@ -0,0 +1,199 @@
+"""Local stand-in for the JioSaavn and YouTube Music endpoints the app calls.
+
+Replays the fixtures in benchmarks/fixtures/ (see make_fixtures.py) with
+configurable latency, jitter and error injection. Point the app at it with:
+
+    python benchmarks/upstream_sim.py --port 9000 --latency 0.08 --jitter 0.04
+    SAAVN_BASE_URL=http://127.0.0.1:9000/api.php YTM_BASE_URL=http://127.0.0.1:9000 python app.py
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+# How deep the paginated searches go: search.getResults songs, youtubei pages
+SAAVN_RESULTS_TOTAL = 200
+YTM_PAGES = 5
+
+
+class Fixtures:
+    """Pre-serialized fixture bodies, keyed by the upstream call they answer"""
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR, ytm_size=20):
+        def load(name):
+            with open(os.path.join(fixtures_dir, name)) as f:
+                return json.load(f)
+
+        self.autocomplete = json.dumps(load('saavn_autocomplete.json')).encode('utf-8')
+        self.trending = json.dumps(load('saavn_trending.json')).encode('utf-8')
+        self.song_details = load('saavn_song_details.json')
+        ytm_search = load(f'ytm_search_{ytm_size}.json')
+        self.ytm_search = json.dumps(ytm_search).encode('utf-8')
+        # Deeper pages are the first ones again under new ids
+        self.saavn_songs = load('saavn_autocomplete.json')['songs']['data']
+        self.ytm_shelf = ytm_search['contents']['tabbedSearchResultsRenderer']['tabs'][0]['tabRenderer'][
+            'content']['sectionListRenderer']['contents'][0]['musicShelfRenderer']
+
+    def search_results(self, page, size, total=SAAVN_RESULTS_TOTAL):
+        """search.getResults body for page ``page`` (from 1) of ``size`` songs"""
+        start = (page - 1) * size
+        songs = []
+        for index in range(start, min(start + size, total)):
+            song = copy.deepcopy(self.saavn_songs[index % len(self.saavn_songs)])
+            song['id'] = f"{song['id']}{index:04d}"
+            songs.append(song)
+        return json.dumps({'total': total, 'start': start + 1, 'results': songs}).encode('utf-8')
+
+    def ytm_continuation(self, token, pages=YTM_PAGES):
+        """youtubei continuation body for a token this simulator handed out (``sim-<page>``)"""
+        page = int(token.rpartition('-')[2]) if token.startswith('sim-') else 1
+        shelf = copy.deepcopy(self.ytm_shelf)
+        for item in shelf['contents']:
+            data = item['musicResponsiveListItemRenderer']['playlistItemData']
+            data['videoId'] = f"{data['videoId'][:8]}{page:03d}"
+        shelf['continuations'] = ([{'nextContinuationData': {'continuation': f'sim-{page + 1}'}}]
+                                  if page + 1 < pages else [])
+        return json.dumps({'continuationContents': {'musicShelfContinuation': shelf}}).encode('utf-8')
+
+    def details_for(self, pids):
+        """song.getDetails body for the requested pids, one copy of the template each"""
+        details = {}
+        for pid in pids:
+            song = copy.deepcopy(self.song_details)
+            song['id'] = pid
+            details[pid] = song
+        return json.dumps(details).encode('utf-8')
+
+
+class SimulatorSettings:
+    def __init__(self, latency=0.05, jitter=0.02, error_rate=0.0,
+                 saavn_latency=None, ytm_latency=None, capacity=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.saavn_latency = saavn_latency
+        self.ytm_latency = ytm_latency
+        # Requests each provider works on at once; the rest queue, as a saturated upstream would
+        self.slots = {provider: threading.Semaphore(capacity) for provider in ('saavn', 'youtube')} if capacity else {}
+        # Requests answered so far, per provider
+        self.requests = {'saavn': 0, 'youtube': 0}
+        self._requests_lock = threading.Lock()
+
+    def count(self, provider):
+        with self._requests_lock:
+            self.requests[provider] += 1
+
+    def delay(self, provider):
+        base = {'saavn': self.saavn_latency, 'youtube': self.ytm_latency}.get(provider)
+        if base is None:
+            base = self.latency
+        return max(0.0, base + random.uniform(-self.jitter, self.jitter))
+
+
+def make_handler(fixtures, settings):
+    class UpstreamHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, provider, body):
+            settings.count(provider)
+            slot = settings.slots.get(provider)
+            if slot:
+                with slot:
+                    time.sleep(settings.delay(provider))
+            else:
+                time.sleep(settings.delay(provider))
+            if settings.error_rate and random.random() < settings.error_rate:
+                body, status = b'{"error": "injected failure"}', 503
+            else:
+                status = 200
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _not_found(self):
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path != '/api.php':
+                return self._not_found()
+            params = parse_qs(url.query)
+            call = params.get('__call', [''])[0]
+            if call == 'autocomplete.get':
+                self._reply('saavn', fixtures.autocomplete)
+            elif call == 'search.getResults':
+                page = int(params.get('p', ['1'])[0])
+                size = int(params.get('n', ['20'])[0])
+                self._reply('saavn', fixtures.search_results(page, size))
+            elif call == 'content.getTrending':
+                self._reply('saavn', fixtures.trending)
+            elif call == 'song.getDetails':
+                pids = [p for p in params.get('pids', [''])[0].split(',') if p]
+                self._reply('saavn', fixtures.details_for(pids))
+            else:
+                self._not_found()
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                self.rfile.read(length)
+            url = urlsplit(self.path)
+            if url.path == '/youtubei/v1/search':
+                continuation = parse_qs(url.query).get('continuation')
+                if continuation:
+                    self._reply('youtube', fixtures.ytm_continuation(continuation[0]))
+                else:
+                    self._reply('youtube', fixtures.ytm_search)
+            else:
+                self._not_found()
+
+    return UpstreamHandler
+
+
+def start_simulator(host='127.0.0.1', port=0, settings=None, fixtures=None):
+    """Serve on a daemon thread; returns the server (``server.server_address`` has the port)"""
+    server = ThreadingHTTPServer((host, port), make_handler(fixtures or Fixtures(), settings or SimulatorSettings()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='upstream-sim', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--latency', type=float, default=0.05, help='base response delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.02, help='uniform +/- jitter in seconds')
+    parser.add_argument('--saavn-latency', type=float, help='override --latency for api.php')
+    parser.add_argument('--ytm-latency', type=float, help='override --latency for youtubei')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    parser.add_argument('--capacity', type=int, help='concurrent requests per provider; the rest queue')
+    parser.add_argument('--ytm-size', type=int, default=20, help='which ytm_search_<n>.json fixture to serve')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    settings = SimulatorSettings(args.latency, args.jitter, args.error_rate, args.saavn_latency, args.ytm_latency,
+                                 args.capacity)
+    server = start_simulator(args.host, args.port, settings, Fixtures(args.fixtures, args.ytm_size))
+    print(f"Upstream simulator on http://{args.host}:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,611 @@
+"""TTL caches with single-flight loading: in-process, or shared by every worker.
+
+TTLCache lives in one process. SQLiteCache and RedisCache keep entries
+where all gunicorn workers see them, and coordinate single-flight across
+processes too, so N workers missing the same key make one upstream call.
+make_cache() picks the backend named by CACHE_BACKEND; all three have the
+same interface (get, peek, set, delete, clear, get_or_load, stats).
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import config
+from track import decode_cached, encode_cached
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries each carry their own expiry.
+
+    ``get_or_load`` coalesces concurrent misses for the same key: one caller
+    (the leader) runs the loader, everyone else waits for its result.
+    """
+
+    def __init__(self, maxsize, name=''):
+        self.maxsize = maxsize
+        self.name = name
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}  # key -> Future
+        # Async loaders on top of this cache (async_providers.AsyncSingleFlight),
+        # whose loads loading() reports too
+        self.flights = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    def _lookup(self, key):
+        # Caller must hold the lock
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def _store(self, key, value, ttl):
+        # Caller must hold the lock
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def peek(self, key, default=None):
+        """get() without counting a hit or miss, for speculative lookups"""
+        with self._lock:
+            value = self._lookup(key)
+            return default if value is _MISSING else value
+
+    def set(self, key, value, ttl):
+        if not ttl or ttl <= 0:
+            return
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def loading(self, key):
+        """True while a get_or_load for ``key`` is running its loader, here or in one of ``flights``"""
+        with self._lock:
+            if key in self._inflight:
+                return True
+        return any(flight.loading(key) for flight in list(self.flights))
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_or_load(self, key, loader, ttl):
+        """Return the cached value for ``key``, calling ``loader()`` on a miss.
+
+        ``ttl`` is either a number of seconds or a callable taking the loaded
+        value and returning seconds; a falsy ttl means "don't cache this".
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        seconds = ttl(value) if callable(ttl) else ttl
+        with self._lock:
+            if seconds and seconds > 0:
+                self._store(key, value, seconds)
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                'name': self.name,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+class SharedCache:
+    """A cache whose entries live outside the process, visible to every worker.
+
+    Subclasses store values as JSON (track.encode_cached) under string keys
+    (``<name>:<repr(key)>``) and provide a lock with an owner token and an
+    expiry. Single-flight then works at two levels: threads of one process
+    share a Future as in TTLCache, and one thread per process races for the
+    lock. The winner runs the loader; the others poll until its result shows
+    up.
+
+    A result that isn't cached (falsy ttl) is still handed to the waiting
+    processes, under a key tied to that leader's lock, so they get the same
+    answer in-process followers would. If the leader fails, its lock is
+    released without a result and a waiting process leads instead.
+
+    The backend being unreachable never fails a request: reads become misses,
+    writes are dropped and loaders run uncoordinated, and the backend is left
+    alone for CACHE_RETRY_INTERVAL before it is tried again.
+    """
+
+    shared = True
+    # Backend exceptions treated as "cache unavailable"
+    errors = ()
+
+    def __init__(self, maxsize, name='', lock_timeout=None, wait_interval=None):
+        self.maxsize = maxsize
+        self.name = name
+        self.lock_timeout = lock_timeout if lock_timeout is not None else config.CACHE_LOCK_TIMEOUT
+        self.wait_interval = wait_interval if wait_interval is not None else config.CACHE_WAIT_INTERVAL
+        self._inflight = {}  # key -> Future, for threads of this process
+        self.flights = weakref.WeakSet()  # as in TTLCache
+        self._lock = threading.Lock()
+        self._down_until = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    # ---- backend primitives ----
+    def _read(self, skey):
+        """Stored bytes, or None if missing or expired"""
+        raise NotImplementedError
+
+    def _write(self, skey, data, ttl):
+        raise NotImplementedError
+
+    def _remove(self, skey):
+        raise NotImplementedError
+
+    def _acquire(self, skey, owner):
+        """Take the lock for ``skey`` unless someone else holds it; True if taken"""
+        raise NotImplementedError
+
+    def _owner(self, skey):
+        """Token of the current lock holder, or None"""
+        raise NotImplementedError
+
+    def _release(self, skey, owner):
+        raise NotImplementedError
+
+    def _size(self):
+        raise NotImplementedError
+
+    def _clear(self):
+        raise NotImplementedError
+
+    # ---- helpers ----
+    def _skey(self, key):
+        return f'{self.name}:{key!r}'
+
+    @staticmethod
+    def _handoff_key(skey, owner):
+        # Outside the cache's own key range, so never counted in its size
+        return f'handoff:{skey}:{owner}'
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _call(self, operation, *args, default=None):
+        # After a failure, skip the backend for a while instead of paying a
+        # timeout on every call
+        if self._down_until and time.monotonic() < self._down_until:
+            return default
+        try:
+            return operation(*args)
+        except self.errors as e:
+            self._down_until = time.monotonic() + config.CACHE_RETRY_INTERVAL
+            logger.warning('shared cache unavailable', extra={'cache': self.name, 'error': repr(e)})
+            return default
+
+    def _lookup(self, skey):
+        data = self._call(self._read, skey)
+        if data is None:
+            return _MISSING
+        try:
+            return decode_cached(data)
+        except Exception as e:
+            # e.g. written by an older deploy in another format
+            logger.warning('unreadable shared cache entry', extra={'cache': self.name, 'error': repr(e)})
+            return _MISSING
+
+    # ---- TTLCache interface ----
+    def get(self, key, default=None):
+        value = self._lookup(self._skey(key))
+        if value is _MISSING:
+            self._count('misses')
+            return default
+        self._count('hits')
+        return value
+
+    def peek(self, key, default=None):
+        value = self._lookup(self._skey(key))
+        return default if value is _MISSING else value
+
+    def set(self, key, value, ttl):
+        if not ttl or ttl <= 0:
+            return
+        self._call(self._write, self._skey(key), encode_cached(value), ttl)
+
+    def loading(self, key):
+        """True while a get_or_load for ``key`` runs its loader, in this process or another"""
+        with self._lock:
+            if key in self._inflight:
+                return True
+        if any(flight.loading(key) for flight in list(self.flights)):
+            return True
+        return self._call(self._owner, self._skey(key)) is not None
+
+    def delete(self, key):
+        self._call(self._remove, self._skey(key))
+
+    def clear(self):
+        self._call(self._clear)
+
+    def get_or_load(self, key, loader, ttl):
+        """Same contract as TTLCache.get_or_load, coordinated across processes"""
+        skey = self._skey(key)
+        value = self._lookup(skey)
+        if value is not _MISSING:
+            self._count('hits')
+            return value
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            value = self._load_shared(skey, loader, ttl)
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def stats(self):
+        size = self._call(self._size, default=0)
+        with self._lock:
+            return {
+                'name': self.name,
+                'size': size,
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    # ---- cross-process single-flight ----
+    def _lead(self, skey):
+        """Owner token if this process now runs the loader, else None.
+
+        Returns a token without a lock when the backend is down, so the
+        caller loads on its own rather than waiting on nobody.
+        """
+        owner = uuid.uuid4().hex
+        acquired = self._call(self._acquire, skey, owner, default=_MISSING)
+        if acquired is _MISSING or acquired:
+            return owner
+        return None
+
+    def _publish(self, skey, owner, value, ttl):
+        seconds = ttl(value) if callable(ttl) else ttl
+        data = encode_cached(value)
+        if seconds and seconds > 0:
+            self._call(self._write, skey, data, seconds)
+        else:
+            self._call(self._write, self._handoff_key(skey, owner), data, self.lock_timeout)
+
+    def _poll(self, skey, owner):
+        """One follower check: (value or _MISSING, current lock owner)"""
+        value = self._lookup(skey)
+        if value is not _MISSING:
+            return value, owner
+        current = self._call(self._owner, skey)
+        if current != owner:
+            # That leader is done; an uncached result was left under its token
+            value = self._lookup(self._handoff_key(skey, owner))
+        return value, current
+
+    def _load_shared(self, skey, loader, ttl):
+        while True:
+            owner = self._lead(skey)
+            if owner is not None:
+                try:
+                    # Another process may have finished between our miss and the lock
+                    value = self._lookup(skey)
+                    if value is _MISSING:
+                        value = loader()
+                        self._publish(skey, owner, value, ttl)
+                    return value
+                finally:
+                    self._call(self._release, skey, owner)
+
+            leader = self._call(self._owner, skey)
+            while leader is not None:
+                time.sleep(self.wait_interval)
+                value, leader = self._poll(skey, leader)
+                if value is not _MISSING:
+                    self._count('coalesced')
+                    return value
+
+    async def load_shared_async(self, key, loader, ttl):
+        """_load_shared for a coroutine ``loader``, waiting without blocking the loop.
+
+        The backend calls are synchronous (a SQLite write can wait on the
+        file lock, a Redis call on the network), so each runs on a worker thread.
+        """
+        skey = self._skey(key)
+        while True:
+            owner = await asyncio.to_thread(self._lead, skey)
+            if owner is not None:
+                try:
+                    value = await asyncio.to_thread(self._lookup, skey)
+                    if value is _MISSING:
+                        value = await loader()
+                        await asyncio.to_thread(self._publish, skey, owner, value, ttl)
+                    return value
+                finally:
+                    await asyncio.to_thread(self._call, self._release, skey, owner)
+
+            leader = await asyncio.to_thread(self._call, self._owner, skey)
+            while leader is not None:
+                await asyncio.sleep(self.wait_interval)
+                value, leader = await asyncio.to_thread(self._poll, skey, leader)
+                if value is not _MISSING:
+                    self._count('coalesced')
+                    return value
+
+
+SQLITE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS entries_expiry ON entries (expires_at);
+
+CREATE TABLE IF NOT EXISTS locks (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+'''
+
+
+class SQLiteCache(SharedCache):
+    """Shared cache in a SQLite file, meant for tmpfs (/dev/shm) on one host.
+
+    Reads never write, so there is no LRU order to keep: past maxsize the
+    entries closest to expiry are dropped first. Trimming runs every
+    TRIM_EVERY writes from each process.
+    """
+
+    errors = (sqlite3.Error,)
+    TRIM_EVERY = 64
+
+    def __init__(self, path, maxsize, name='', **kwargs):
+        super().__init__(maxsize, name, **kwargs)
+        self.path = path
+        # Keys of this cache sort between these two: '<name>:' up to '<name>;'
+        self._low, self._high = f'{name}:', f'{name};'
+        self._local = threading.local()
+        self._writes = 0
+
+    def _conn(self):
+        # Connections don't survive a fork: gunicorn imports the app in the master
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SQLITE_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _read(self, skey):
+        row = self._conn().execute('SELECT value, expires_at FROM entries WHERE key = ?', (skey,)).fetchone()
+        if row is None:
+            return None
+        if row[1] <= time.time():
+            self._count('expirations')
+            return None
+        return row[0]
+
+    def _write(self, skey, data, ttl):
+        self._conn().execute('INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)',
+                             (skey, data, time.time() + ttl))
+        with self._lock:
+            self._writes += 1
+            trim = self._writes % self.TRIM_EVERY == 0
+        if trim:
+            self._trim()
+
+    def _trim(self):
+        conn = self._conn()
+        now = time.time()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM entries WHERE expires_at <= ?', (now,))
+            size = conn.execute('SELECT COUNT(*) FROM entries WHERE key >= ? AND key < ?',
+                                (self._low, self._high)).fetchone()[0]
+            excess = size - self.maxsize
+            if excess > 0:
+                conn.execute(
+                    'DELETE FROM entries WHERE key IN (SELECT key FROM entries WHERE key >= ? AND key < ? '
+                    'ORDER BY expires_at LIMIT ?)', (self._low, self._high, excess)
+                )
+                with self._lock:
+                    self.evictions += excess
+            conn.execute('DELETE FROM locks WHERE expires_at <= ?', (now,))
+
+    def _remove(self, skey):
+        self._conn().execute('DELETE FROM entries WHERE key = ?', (skey,))
+
+    def _acquire(self, skey, owner):
+        conn = self._conn()
+        now = time.time()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM locks WHERE key = ? AND expires_at <= ?', (skey, now))
+            taken = conn.execute('INSERT OR IGNORE INTO locks (key, owner, expires_at) VALUES (?, ?, ?)',
+                                 (skey, owner, now + self.lock_timeout)).rowcount
+        return taken == 1
+
+    def _owner(self, skey):
+        row = self._conn().execute('SELECT owner FROM locks WHERE key = ? AND expires_at > ?',
+                                   (skey, time.time())).fetchone()
+        return row[0] if row else None
+
+    def _release(self, skey, owner):
+        self._conn().execute('DELETE FROM locks WHERE key = ? AND owner = ?', (skey, owner))
+
+    def _size(self):
+        return self._conn().execute('SELECT COUNT(*) FROM entries WHERE key >= ? AND key < ? AND expires_at > ?',
+                                    (self._low, self._high, time.time())).fetchone()[0]
+
+    def _clear(self):
+        self._conn().execute('DELETE FROM entries WHERE key >= ? AND key < ?', (self._low, self._high))
+
+
+class RedisCache(SharedCache):
+    """Shared cache on a Redis-protocol server (Redis, Valkey, KeyDB, ...).
+
+    Expiry is the server's (PX); the size bound is its maxmemory policy,
+    so ``maxsize`` is only reported. Locks are ``SET NX PX`` keys.
+
+    Counting entries means a SCAN of the whole keyspace, so the count is
+    shared by every worker and redone at most every CACHE_SIZE_INTERVAL
+    seconds; the size in stats() is that old.
+    """
+
+    def __init__(self, url, maxsize, name='', prefix=None, **kwargs):
+        import redis
+
+        super().__init__(maxsize, name, **kwargs)
+        self.errors = (redis.RedisError, OSError)
+        self.prefix = f'{prefix if prefix is not None else config.CACHE_KEY_PREFIX}:'
+        self._redis = redis.Redis.from_url(url, socket_timeout=config.CACHE_SOCKET_TIMEOUT,
+                                           socket_connect_timeout=config.CACHE_SOCKET_TIMEOUT)
+
+    def _skey(self, key):
+        return self.prefix + super()._skey(key)
+
+    def _read(self, skey):
+        return self._redis.get(skey)
+
+    def _write(self, skey, data, ttl):
+        self._redis.set(skey, data, px=max(int(ttl * 1000), 1))
+
+    def _remove(self, skey):
+        self._redis.delete(skey)
+
+    def _acquire(self, skey, owner):
+        return bool(self._redis.set(f'lock:{skey}', owner, nx=True, px=int(self.lock_timeout * 1000)))
+
+    def _owner(self, skey):
+        owner = self._redis.get(f'lock:{skey}')
+        return owner.decode() if owner is not None else None
+
+    def _release(self, skey, owner):
+        # Not atomic: if our lock expired and was retaken in between, that
+        # leader loses its lock early and at worst one more fetch happens
+        if self._owner(skey) == owner:
+            self._redis.delete(f'lock:{skey}')
+
+    def _keys(self):
+        return self._redis.scan_iter(match=f'{self.prefix}{self.name}:*', count=1000)
+
+    def _size(self):
+        size_key = f'size:{self.prefix}{self.name}'
+        size = self._redis.get(size_key)
+        if size is None:
+            size = sum(1 for _ in self._keys())
+            self._redis.set(size_key, size, px=max(int(config.CACHE_SIZE_INTERVAL * 1000), 1))
+        return int(size)
+
+    def _clear(self):
+        self._redis.delete(f'size:{self.prefix}{self.name}')
+        keys = list(self._keys())
+        if keys:
+            self._redis.delete(*keys)
+
+
+def make_cache(name, maxsize):
+    """The cache called ``name`` on the backend chosen by CACHE_BACKEND"""
+    backend = config.CACHE_BACKEND
+    if backend == 'memory':
+        return TTLCache(maxsize, name=name)
+    if backend == 'sqlite':
+        return SQLiteCache(config.CACHE_SQLITE_PATH, maxsize, name=name)
+    if backend == 'redis':
+        return RedisCache(config.CACHE_REDIS_URL, maxsize, name=name)
+    raise ValueError(f'Unknown CACHE_BACKEND: {backend!r} (expected memory, sqlite or redis)')
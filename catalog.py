@@ -0,0 +1,231 @@
+"""Local track catalog: SQLite with an FTS5 index, filled from upstream search traffic.
+
+Every track a provider returns is upserted, and every search answer is
+remembered in upstream order. A repeated query is then answered from the
+catalog as long as its answer is fresh and enough of its tracks are still
+known; an unseen query is answered from the full-text index when it finds
+nearly a full page of matches. Everything else goes upstream as before.
+
+The file survives restarts, so a new process starts with a warm catalog.
+"""
+import json
+import logging
+import math
+import re
+import sqlite3
+import threading
+import time
+
+import config
+from track import Track
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tracks (
+    pk INTEGER PRIMARY KEY,
+    provider TEXT NOT NULL,
+    id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    artist TEXT NOT NULL,
+    album TEXT NOT NULL,
+    data TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    UNIQUE (provider, id)
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(
+    title, artist, album,
+    content='tracks', content_rowid='pk', tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS tracks_ai AFTER INSERT ON tracks BEGIN
+    INSERT INTO tracks_fts(rowid, title, artist, album) VALUES (new.pk, new.title, new.artist, new.album);
+END;
+
+CREATE TRIGGER IF NOT EXISTS tracks_ad AFTER DELETE ON tracks BEGIN
+    INSERT INTO tracks_fts(tracks_fts, rowid, title, artist, album)
+    VALUES ('delete', old.pk, old.title, old.artist, old.album);
+END;
+
+-- Re-seeing a track only bumps seen_at; the index is rewritten only when the text changes
+CREATE TRIGGER IF NOT EXISTS tracks_au AFTER UPDATE OF title, artist, album ON tracks
+WHEN old.title IS NOT new.title OR old.artist IS NOT new.artist OR old.album IS NOT new.album BEGIN
+    INSERT INTO tracks_fts(tracks_fts, rowid, title, artist, album)
+    VALUES ('delete', old.pk, old.title, old.artist, old.album);
+    INSERT INTO tracks_fts(rowid, title, artist, album) VALUES (new.pk, new.title, new.artist, new.album);
+END;
+
+-- The last upstream answer per normalized query
+CREATE TABLE IF NOT EXISTS queries (
+    provider TEXT NOT NULL,
+    query TEXT NOT NULL,
+    max_results INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (provider, query)
+);
+
+CREATE TABLE IF NOT EXISTS query_results (
+    provider TEXT NOT NULL,
+    query TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    PRIMARY KEY (provider, query, position)
+);
+'''
+
+UPSERT_TRACK = '''
+INSERT INTO tracks (provider, id, title, artist, album, data, seen_at) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (provider, id) DO UPDATE SET
+    title = excluded.title, artist = excluded.artist, album = excluded.album,
+    data = excluded.data, seen_at = excluded.seen_at
+'''
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def normalize_query(query):
+    # Same rule as the search cache key: case and whitespace don't matter
+    return ' '.join(query.lower().split())
+
+
+def fts_query(normalized):
+    """FTS5 MATCH expression: every word of the query, each as a prefix"""
+    return ' '.join(f'"{token}"*' for token in TOKEN_PATTERN.findall(normalized))
+
+
+class TrackCatalog:
+    """Thread-safe; each thread gets its own SQLite connection to the file"""
+
+    def __init__(self, path, query_ttl=None, track_ttl=None, min_recall=None):
+        self.path = path
+        self.query_ttl = query_ttl if query_ttl is not None else config.CATALOG_QUERY_TTL
+        self.track_ttl = track_ttl if track_ttl is not None else config.CATALOG_TRACK_TTL
+        self.min_recall = min_recall if min_recall is not None else config.CATALOG_MIN_RECALL
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.pruned = 0
+
+        self._conn().executescript(SCHEMA)
+        self.prune()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def lookup(self, provider, query, limit):
+        """Tracks to answer this search with, or None to go upstream"""
+        normalized = normalize_query(query)
+        conn = self._conn()
+        now = time.time()
+
+        known = conn.execute(
+            'SELECT max_results, total, fetched_at FROM queries WHERE provider = ? AND query = ?',
+            (provider, normalized)
+        ).fetchone()
+
+        if known is not None:
+            max_results, total, fetched_at = known
+            # Stale, or fetched with a smaller limit while upstream had more to give
+            if now - fetched_at > self.query_ttl or (max_results < limit and total >= max_results):
+                self._count('stale')
+                return None
+            rows = conn.execute(
+                'SELECT t.data FROM query_results q JOIN tracks t ON t.provider = q.provider AND t.id = q.id '
+                'WHERE q.provider = ? AND q.query = ? AND t.seen_at >= ? ORDER BY q.position LIMIT ?',
+                (provider, normalized, now - self.track_ttl, limit)
+            ).fetchall()
+            expected = min(total, limit)
+        else:
+            match = fts_query(normalized)
+            if not match:
+                self._count('misses')
+                return None
+            rows = conn.execute(
+                'SELECT t.data FROM tracks_fts JOIN tracks t ON t.pk = tracks_fts.rowid '
+                'WHERE tracks_fts MATCH ? AND t.provider = ? AND t.seen_at >= ? ORDER BY tracks_fts.rank LIMIT ?',
+                (match, provider, now - self.track_ttl, limit)
+            ).fetchall()
+            expected = limit
+
+        if not rows or len(rows) < math.ceil(expected * self.min_recall):
+            self._count('misses')
+            return None
+
+        self._count('hits')
+        return [Track.from_dict(json.loads(data)) for (data,) in rows]
+
+    def remember(self, provider, query, limit, results):
+        """Store an upstream search answer and upsert its tracks"""
+        normalized = normalize_query(query)
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            self._upsert(conn, results, now)
+            conn.execute('DELETE FROM query_results WHERE provider = ? AND query = ?', (provider, normalized))
+            conn.executemany(
+                'INSERT INTO query_results (provider, query, position, id) VALUES (?, ?, ?, ?)',
+                [(provider, normalized, position, str(track['id'])) for position, track in enumerate(results)]
+            )
+            conn.execute(
+                'INSERT OR REPLACE INTO queries (provider, query, max_results, total, fetched_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (provider, normalized, limit, len(results), now)
+            )
+
+    def add_tracks(self, tracks):
+        """Upsert tracks seen outside a search (e.g. trending)"""
+        conn = self._conn()
+        with conn:
+            self._upsert(conn, tracks, time.time())
+
+    @staticmethod
+    def _upsert(conn, tracks, now):
+        conn.executemany(UPSERT_TRACK, [
+            (track['provider'], str(track['id']), track.get('title') or '', track.get('artist') or '',
+             track.get('album') or '', track.json(), now)
+            for track in tracks if track.get('id')
+        ])
+
+    def prune(self):
+        """Drop tracks and answers that haven't been seen upstream for track_ttl"""
+        cutoff = time.time() - self.track_ttl
+        conn = self._conn()
+        with conn:
+            pruned = conn.execute('DELETE FROM tracks WHERE seen_at < ?', (cutoff,)).rowcount
+            conn.execute(
+                'DELETE FROM query_results WHERE (provider, query) IN '
+                '(SELECT provider, query FROM queries WHERE fetched_at < ?)', (cutoff,)
+            )
+            conn.execute('DELETE FROM queries WHERE fetched_at < ?', (cutoff,))
+        with self._lock:
+            self.pruned += pruned
+
+    def stats(self):
+        """Same shape as TTLCache.stats(); expirations counts stale answers"""
+        size = self._conn().execute('SELECT COUNT(*) FROM tracks').fetchone()[0]
+        with self._lock:
+            return {
+                'name': 'catalog',
+                'size': size,
+                'maxsize': None,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': 0,
+                'evictions': self.pruned,
+                'expirations': self.stale,
+            }
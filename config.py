@@ -0,0 +1,237 @@
+"""Runtime settings, read once from environment variables."""
+import os
+import tempfile
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return float(default)
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return int(default)
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# ==================== Upstream endpoints ====================
+# Point these at benchmarks/upstream_sim.py to run without the real services
+SAAVN_BASE_URL = os.environ.get('SAAVN_BASE_URL', 'https://www.jiosaavn.com/api.php')
+YTM_BASE_URL = os.environ.get('YTM_BASE_URL', 'https://music.youtube.com').rstrip('/')
+
+# ==================== Provider fan-out ====================
+# Per-provider deadline (seconds) for a single search in a fan-out
+PROVIDER_DEADLINES = {
+    'saavn': _env_float('SAAVN_DEADLINE', 3.0),
+    'youtube': _env_float('YTM_DEADLINE', 4.0),
+}
+DEFAULT_PROVIDER_DEADLINE = _env_float('PROVIDER_DEADLINE', 4.0)
+FANOUT_WORKERS = _env_int('FANOUT_WORKERS', 16)
+
+# ==================== Upstream HTTP ====================
+HTTP_CONNECT_TIMEOUT = _env_float('HTTP_CONNECT_TIMEOUT', 3.05)
+HTTP_READ_TIMEOUT = _env_float('HTTP_READ_TIMEOUT', 10.0)
+# Retries only apply to idempotent requests; backoff is backoff * 2**(n-1) seconds
+HTTP_RETRIES = _env_int('HTTP_RETRIES', 2)
+HTTP_RETRY_BACKOFF = _env_float('HTTP_RETRY_BACKOFF', 0.2)
+# Keep-alive connections kept per upstream host
+SAAVN_POOL_SIZE = _env_int('SAAVN_POOL_SIZE', 20)
+YTM_POOL_SIZE = _env_int('YTM_POOL_SIZE', 20)
+
+# ==================== Cache backend ====================
+# Where the search, typeahead, stream URL and home feed caches live:
+# 'memory' (per process), 'sqlite' (a file every worker on the host shares)
+# or 'redis' (any Redis-protocol server, shared across hosts)
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory').strip().lower()
+# Put the SQLite file on tmpfs: it is a cache, and disk fsyncs would dominate
+CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH', os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'spotifypremium-cache.db'))
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://127.0.0.1:6379/0')
+CACHE_KEY_PREFIX = os.environ.get('CACHE_KEY_PREFIX', 'spotifypremium')
+CACHE_SOCKET_TIMEOUT = _env_float('CACHE_SOCKET_TIMEOUT', 0.5)
+# Seconds a worker stops using an unreachable backend before trying it again
+CACHE_RETRY_INTERVAL = _env_float('CACHE_RETRY_INTERVAL', 5)
+# Longest a worker waits on another worker's load of the same key before
+# loading it itself; keep above the slowest loader (YTDLP_JOB_TIMEOUT)
+CACHE_LOCK_TIMEOUT = _env_float('CACHE_LOCK_TIMEOUT', 30)
+# How often a waiting worker checks whether that load has finished
+CACHE_WAIT_INTERVAL = _env_float('CACHE_WAIT_INTERVAL', 0.01)
+# Seconds a Redis cache's entry count is reused for: counting scans the keyspace
+CACHE_SIZE_INTERVAL = _env_float('CACHE_SIZE_INTERVAL', 60)
+
+# ==================== Search cache ====================
+SEARCH_CACHE_SIZE = _env_int('SEARCH_CACHE_SIZE', 2048)
+# Seconds a search result is reused, per provider ('mixed' is the merged result)
+SEARCH_CACHE_TTLS = {
+    'saavn': _env_float('SAAVN_SEARCH_TTL', 300),
+    'youtube': _env_float('YTM_SEARCH_TTL', 600),
+    'mixed': _env_float('MIXED_SEARCH_TTL', 300),
+}
+
+# ==================== Search pagination ====================
+# Tracks per /search page, per provider; a 'mixed' page merges this many of each.
+# 'all' pages carry a page of each provider
+SEARCH_PAGE_SIZES = {
+    'saavn': _env_int('SAAVN_PAGE_SIZE', 20),
+    'youtube': _env_int('YTM_PAGE_SIZE', 10),
+    'mixed': _env_int('MIXED_PAGE_SIZE', 10),
+}
+# Songs per JioSaavn search.getResults call (the pages after the first)
+SAAVN_RESULTS_PAGE_SIZE = _env_int('SAAVN_RESULTS_PAGE_SIZE', 20)
+# Deepest search.getResults page a cursor may ask for
+SAAVN_MAX_PAGE = _env_int('SAAVN_MAX_PAGE', 100)
+
+# ==================== Track catalog ====================
+# SQLite file that keeps track metadata and search answers across restarts;
+# set to an empty string to disable the catalog
+CATALOG_PATH = os.environ.get('CATALOG_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'catalog.db'))
+# Seconds a remembered search answer is served locally before asking upstream again
+CATALOG_QUERY_TTL = _env_float('CATALOG_QUERY_TTL', 86400)
+# Tracks not seen upstream for this long are no longer served, and pruned at startup
+CATALOG_TRACK_TTL = _env_float('CATALOG_TRACK_TTL', 30 * 86400)
+# Share of the expected results the catalog must have before it answers a search
+CATALOG_MIN_RECALL = _env_float('CATALOG_MIN_RECALL', 0.8)
+
+# ==================== Typeahead ====================
+SUGGEST_CACHE_SIZE = _env_int('SUGGEST_CACHE_SIZE', 4096)
+SUGGEST_TTL = _env_float('SUGGEST_TTL', 600)
+# Prefixes shorter than this get no suggestions and never go upstream
+SUGGEST_MIN_CHARS = _env_int('SUGGEST_MIN_CHARS', 2)
+# Suggestions returned by default, and fetched per upstream call (the extra
+# ones are what longer prefixes are filtered from)
+SUGGEST_LIMIT = _env_int('SUGGEST_LIMIT', 8)
+SUGGEST_FETCH_LIMIT = _env_int('SUGGEST_FETCH_LIMIT', 20)
+# A shorter cached prefix answers a longer one if at least this many of its
+# suggestions still match
+SUGGEST_MIN_RESULTS = _env_int('SUGGEST_MIN_RESULTS', 3)
+
+# ==================== Stream URL cache ====================
+STREAM_CACHE_SIZE = _env_int('STREAM_CACHE_SIZE', 4096)
+# Seconds a resolved stream URL is reused when the URL carries no expiry of its own
+STREAM_URL_TTLS = {
+    'saavn': _env_float('SAAVN_STREAM_TTL', 3600),
+    'youtube': _env_float('YTM_STREAM_TTL', 1800),
+}
+# Signed URLs are dropped this many seconds before they actually expire
+STREAM_EXPIRY_MARGIN = _env_float('STREAM_EXPIRY_MARGIN', 120)
+
+# ==================== yt-dlp extraction pool ====================
+# 'thread' shares the web process; 'process' isolates extraction in child processes
+YTDLP_POOL_MODE = os.environ.get('YTDLP_POOL_MODE', 'thread')
+YTDLP_WORKERS = _env_int('YTDLP_WORKERS', 4)
+# Jobs allowed to wait for a free worker before new ones are rejected
+YTDLP_QUEUE_SIZE = _env_int('YTDLP_QUEUE_SIZE', 16)
+YTDLP_JOB_TIMEOUT = _env_float('YTDLP_JOB_TIMEOUT', 20.0)
+
+# ==================== Home feed ====================
+HOME_FEED_QUERIES = [q.strip() for q in os.environ.get(
+    'HOME_FEED_QUERIES', 'Saiyara,War,Rolling,Where have you been').split(',') if q.strip()]
+HOME_FEED_TRENDING_LIMIT = _env_int('HOME_FEED_TRENDING_LIMIT', 12)
+# Seconds between background rebuilds of the home feed
+HOME_FEED_REFRESH_INTERVAL = _env_float('HOME_FEED_REFRESH_INTERVAL', 600)
+# Retry sooner while there is no snapshot at all
+HOME_FEED_RETRY_INTERVAL = _env_float('HOME_FEED_RETRY_INTERVAL', 30)
+
+# ==================== Batch stream resolution ====================
+STREAM_BATCH_MAX = _env_int('STREAM_BATCH_MAX', 50)
+# YouTube extractions one batch may start; keeps a long queue from filling the yt-dlp pool
+STREAM_BATCH_MAX_YOUTUBE = _env_int('STREAM_BATCH_MAX_YOUTUBE', 4)
+# Song ids sent per multi-pid song.getDetails request
+SAAVN_DETAILS_BATCH_SIZE = _env_int('SAAVN_DETAILS_BATCH_SIZE', 20)
+
+# ==================== Response encoding ====================
+# JSON and HTML bodies smaller than this go out uncompressed
+COMPRESS_MIN_SIZE = _env_int('COMPRESS_MIN_SIZE', 512)
+GZIP_LEVEL = _env_int('GZIP_LEVEL', 6)
+# Brotli is offered when the brotli package is installed
+BROTLI_QUALITY = _env_int('BROTLI_QUALITY', 5)
+# Compressed bodies kept by ETag and coding, so a popular answer is compressed once
+COMPRESSED_CACHE_SIZE = _env_int('COMPRESSED_CACHE_SIZE', 256)
+COMPRESSED_CACHE_TTL = _env_float('COMPRESSED_CACHE_TTL', 600)
+# Cache-Control per path. JSON and HTML answers all carry an ETag, so once
+# max-age runs out a client revalidates and usually gets a bodiless 304
+CACHE_CONTROL = {
+    '/': os.environ.get('INDEX_CACHE_CONTROL', 'no-cache'),
+    '/providers': os.environ.get('PROVIDERS_CACHE_CONTROL', 'public, max-age=86400'),
+    '/search': os.environ.get('SEARCH_CACHE_CONTROL', 'public, max-age=60'),
+}
+# A /search answer missing a provider: the next request may well be complete
+PARTIAL_SEARCH_CACHE_CONTROL = os.environ.get('PARTIAL_SEARCH_CACHE_CONTROL', 'no-store')
+
+# ==================== App shell ====================
+# Static files the page links as /static/<name>?v=<hash of the file> and the
+# service worker (/sw.js) precaches along with the page
+SHELL_ASSETS = ('style.css', 'script.js')
+# Cache-Control for a static file fetched at its current ?v=: a change to the
+# file changes its URL, so browsers can keep it without revalidating
+VERSIONED_ASSET_CACHE_CONTROL = os.environ.get('VERSIONED_ASSET_CACHE_CONTROL', 'public, max-age=31536000, immutable')
+
+# ==================== Play-queue prefetch ====================
+# Upcoming tracks per listener whose stream URLs are resolved ahead of time
+PREFETCH_AHEAD = _env_int('PREFETCH_AHEAD', 3)
+# Threads resolving queues in the background, per worker process
+PREFETCH_WORKERS = _env_int('PREFETCH_WORKERS', 2)
+# Seconds a queue's tracks may wait to be resolved before they are dropped
+PREFETCH_BUDGET = _env_float('PREFETCH_BUDGET', 60)
+# Queues waiting for a prefetch thread; new ones are turned away beyond this
+PREFETCH_QUEUE_SIZE = _env_int('PREFETCH_QUEUE_SIZE', 64)
+
+# ==================== Startup ====================
+# Load yt-dlp and start an extraction worker during warmup; turn off for
+# workers that only serve JioSaavn so they never load yt-dlp at all
+WARMUP_YTDLP = _env_bool('WARMUP_YTDLP', True)
+
+# ==================== Admission control ====================
+# Per-client token buckets by route class: (requests per second, burst).
+# A rate of 0 turns that limit off. Buckets are per worker process.
+# Off by default: clients are told apart by their address, and behind a
+# reverse proxy every user has the proxy's unless
+# RATE_LIMIT_TRUST_FORWARDED_FOR is on. The README suggests rates.
+RATE_LIMITS = {
+    'stream': (_env_float('STREAM_RATE_LIMIT', 0), _env_int('STREAM_RATE_BURST', 20)),
+    'search': (_env_float('SEARCH_RATE_LIMIT', 0), _env_int('SEARCH_RATE_BURST', 10)),
+    'suggest': (_env_float('SUGGEST_RATE_LIMIT', 0), _env_int('SUGGEST_RATE_BURST', 20)),
+    'prefetch': (_env_float('PREFETCH_RATE_LIMIT', 0), _env_int('PREFETCH_RATE_BURST', 10)),
+}
+# Clients whose buckets are kept (least recently seen are dropped first)
+RATE_LIMIT_CLIENTS = _env_int('RATE_LIMIT_CLIENTS', 10000)
+# Identify clients by the first X-Forwarded-For address; only behind a proxy that sets it
+RATE_LIMIT_TRUST_FORWARDED_FOR = _env_bool('RATE_LIMIT_TRUST_FORWARDED_FOR', False)
+# Concurrent upstream calls per provider in one worker; /stream goes first when they are all busy
+PROVIDER_CONCURRENCY = {
+    'saavn': _env_int('SAAVN_CONCURRENCY', 16),
+    'youtube': _env_int('YTM_CONCURRENCY', 8),
+}
+# Calls allowed to wait for a provider slot, and seconds each may wait before a 503
+ADMISSION_QUEUE_SIZE = _env_int('ADMISSION_QUEUE_SIZE', 32)
+ADMISSION_MAX_WAIT = _env_float('ADMISSION_MAX_WAIT', 2.0)
+
+# ==================== Logging ====================
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+
+# ==================== Provider health ====================
+# A breaker opens when FAILURE_RATIO of the last WINDOW calls (at least
+# MIN_CALLS seen) failed or took longer than SLOW_CALL_SECONDS
+BREAKER_WINDOW = _env_int('BREAKER_WINDOW', 20)
+BREAKER_MIN_CALLS = _env_int('BREAKER_MIN_CALLS', 5)
+BREAKER_FAILURE_RATIO = _env_float('BREAKER_FAILURE_RATIO', 0.5)
+BREAKER_SLOW_CALL_SECONDS = _env_float('BREAKER_SLOW_CALL_SECONDS', 3.0)
+# Seconds an open breaker rejects calls before letting a probe through
+BREAKER_COOLDOWN = _env_float('BREAKER_COOLDOWN', 30)
+# Adaptive timeout = p99 latency * MULTIPLIER, between MIN and the provider deadline
+LATENCY_WINDOW = _env_int('LATENCY_WINDOW', 200)
+LATENCY_MIN_SAMPLES = _env_int('LATENCY_MIN_SAMPLES', 20)
+ADAPTIVE_TIMEOUT_MULTIPLIER = _env_float('ADAPTIVE_TIMEOUT_MULTIPLIER', 2.0)
+ADAPTIVE_TIMEOUT_MIN = _env_float('ADAPTIVE_TIMEOUT_MIN', 0.5)
+# Send a duplicate JioSaavn autocomplete request once the first passes p95
+HEDGE_SAAVN_SEARCH = _env_bool('HEDGE_SAAVN_SEARCH', False)
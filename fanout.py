@@ -0,0 +1,90 @@
+"""Run provider calls in parallel, each with its own deadline."""
+import contextvars
+import logging
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# results: {name: value} for every call that finished in time and did not raise
+# partial: True when at least one call was dropped
+# missing: names of the dropped calls
+FanOutResult = namedtuple('FanOutResult', ['results', 'partial', 'missing'])
+
+_executor = ThreadPoolExecutor(max_workers=config.FANOUT_WORKERS, thread_name_prefix='fanout')
+
+
+def fan_out(calls, deadlines=None, default_deadline=None):
+    """Run every callable in ``calls`` ({name: fn}) concurrently.
+
+    Each call gets ``deadlines[name]`` seconds (measured from the start of the
+    fan-out) to finish. Calls that time out or raise are left out of the
+    result and reported in ``missing``; a straggler keeps running in the pool
+    but nobody waits for it.
+    """
+    deadlines = deadlines if deadlines is not None else config.PROVIDER_DEADLINES
+    if default_deadline is None:
+        default_deadline = config.DEFAULT_PROVIDER_DEADLINE
+
+    start = time.monotonic()
+    # Each call runs in a copy of the caller's context so per-request state
+    # (e.g. Server-Timing stage timings) follows it into the pool
+    futures = {name: _executor.submit(contextvars.copy_context().run, fn) for name, fn in calls.items()}
+
+    results = {}
+    missing = []
+    # Wait on the shortest deadlines first so the total wait is the max, not the sum
+    for name in sorted(futures, key=lambda n: deadlines.get(n, default_deadline)):
+        remaining = deadlines.get(name, default_deadline) - (time.monotonic() - start)
+        try:
+            results[name] = futures[name].result(timeout=max(remaining, 0))
+        except FutureTimeout:
+            logger.warning('fan-out call missed its deadline', extra={'call': name})
+            missing.append(name)
+        except Exception as e:
+            logger.warning('fan-out call failed', extra={'call': name, 'error': e})
+            missing.append(name)
+
+    return FanOutResult(results, bool(missing), missing)
+
+
+def fan_out_iter(calls, deadlines=None, default_deadline=None):
+    """Like fan_out, but yield ``(name, value)`` as soon as each call finishes.
+
+    Calls that raise yield their exception as the value; calls still running
+    at their deadline yield a TimeoutError and are abandoned.
+    """
+    deadlines = deadlines if deadlines is not None else config.PROVIDER_DEADLINES
+    if default_deadline is None:
+        default_deadline = config.DEFAULT_PROVIDER_DEADLINE
+
+    start = time.monotonic()
+    names = {_executor.submit(contextvars.copy_context().run, fn): name for name, fn in calls.items()}
+    pending = set(names)
+
+    try:
+        while pending:
+            elapsed = time.monotonic() - start
+            next_deadline = min(deadlines.get(names[f], default_deadline) for f in pending)
+            done, pending = wait(pending, timeout=max(next_deadline - elapsed, 0), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    yield names[future], future.result()
+                except Exception as e:
+                    logger.warning('fan-out call failed', extra={'call': names[future], 'error': e})
+                    yield names[future], e
+
+            elapsed = time.monotonic() - start
+            for future in [f for f in pending if deadlines.get(names[f], default_deadline) <= elapsed]:
+                pending.discard(future)
+                logger.warning('fan-out call missed its deadline', extra={'call': names[future]})
+                yield names[future], TimeoutError(f'{names[future]} missed its deadline')
+    finally:
+        # The consumer went away (e.g. the client closed a streamed search):
+        # calls still queued for a pool thread are dropped; running ones can't be stopped
+        for future in pending:
+            future.cancel()
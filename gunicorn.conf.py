@@ -0,0 +1,24 @@
+"""gunicorn settings for the WSGI app: gunicorn -c gunicorn.conf.py app:app
+
+The master imports the app and its heavy dependencies once (preload), and
+every forked worker warms itself up before it starts accepting requests.
+"""
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8080')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+worker_class = 'gthread'
+preload_app = True
+
+
+def when_ready(server):
+    # Master, after the app is loaded and before any worker is forked
+    import app
+    app.preload()
+
+
+def post_worker_init(worker):
+    # Each worker, after the fork: sessions, threads and the catalog connection
+    import app
+    app.warmup()
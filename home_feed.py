@@ -0,0 +1,71 @@
+"""Home page feed, rebuilt in the background and served from memory."""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class HomeFeed:
+    """Holds the latest home-feed snapshot and refreshes it on a daemon thread.
+
+    ``builder`` returns a list of tracks. A failed or empty build never
+    replaces a good snapshot, so readers keep getting the stale one.
+
+    With a shared ``cache``, every worker runs its own refresher but each
+    snapshot is built once and picked up by the rest. It is shared for half
+    an interval: a refresh reusing one just before it expired would
+    otherwise leave a snapshot nearly two intervals old.
+    """
+
+    SHARED_TTL_FACTOR = 0.5
+
+    def __init__(self, builder, interval=600, retry_interval=30, cache=None):
+        self.builder = builder
+        self.cache = cache
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self._snapshot = []
+        self.built_at = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def snapshot(self):
+        return self._snapshot
+
+    def refresh(self):
+        """Build a new snapshot now; returns True if it replaced the old one"""
+        try:
+            if self.cache is not None:
+                ttl = self.interval * self.SHARED_TTL_FACTOR
+                tracks = self.cache.get_or_load('home', self.builder, ttl=lambda tracks: ttl if tracks else 0)
+            else:
+                tracks = self.builder()
+        except Exception:
+            logger.exception('home feed refresh failed')
+            return False
+        if not tracks:
+            logger.warning('home feed refresh returned nothing, keeping previous snapshot')
+            return False
+        self._snapshot = tracks
+        self.built_at = time.time()
+        logger.info('home feed refreshed', extra={'tracks': len(tracks)})
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            wait = self.interval if self._snapshot else self.retry_interval
+            self._stop.wait(wait)
+
+    def start(self):
+        """Start the refresher thread (idempotent)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='home-feed', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,104 @@
+"""Shared, pooled HTTP session for every upstream call.
+
+requests is imported when the session is first built, not at import time.
+"""
+import threading
+from urllib.parse import urlsplit
+
+import config
+
+try:
+    import orjson
+except ImportError:  # response.json() it is
+    orjson = None
+
+def _origin(url):
+    parts = urlsplit(url)
+    return f'{parts.scheme}://{parts.netloc}'
+
+
+# Hosts with their own keep-alive pool: (origin, pool size, POST is read-only)
+# The youtubei search endpoint is a POST that never mutates anything, so it is
+# safe to retry like a GET.
+UPSTREAM_HOSTS = [
+    (_origin(config.SAAVN_BASE_URL), config.SAAVN_POOL_SIZE, False),
+    (_origin(config.YTM_BASE_URL), config.YTM_POOL_SIZE, True),
+]
+
+DEFAULT_TIMEOUT = (config.HTTP_CONNECT_TIMEOUT, config.HTTP_READ_TIMEOUT)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _retry_policy(retry_post=False):
+    from urllib3.util.retry import Retry
+
+    methods = {'GET', 'HEAD', 'OPTIONS'}
+    if retry_post:
+        methods.add('POST')
+    return Retry(
+        total=config.HTTP_RETRIES,
+        backoff_factor=config.HTTP_RETRY_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(methods),
+        raise_on_status=False,
+    )
+
+
+def _build_session():
+    import requests
+    import urllib3
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    # SSL verification is disabled for corporate proxy compatibility
+    session.verify = False
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    default_adapter = HTTPAdapter(max_retries=_retry_policy())
+    session.mount('https://', default_adapter)
+    session.mount('http://', default_adapter)
+
+    for base_url, pool_size, retry_post in UPSTREAM_HOSTS:
+        session.mount(base_url, HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            max_retries=_retry_policy(retry_post),
+        ))
+    return session
+
+
+def get_session():
+    """Return the process-wide session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def get(url, **kwargs):
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+    return get_session().get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+    return get_session().post(url, **kwargs)
+
+
+def json_body(response):
+    """Decode a JSON response (requests or httpx) with orjson when it is installed.
+
+    orjson parses the whole body several times faster than the stdlib
+    decoder behind response.json(). A body that isn't UTF-8 goes through
+    response.json(), which works out the charset.
+    """
+    if orjson is None:
+        return response.json()
+    try:
+        return orjson.loads(response.content)
+    except orjson.JSONDecodeError:
+        return response.json()
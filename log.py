@@ -0,0 +1,42 @@
+"""Level-gated, key=value (logfmt) logging."""
+import logging
+
+import config
+
+# Attributes every LogRecord has; anything else came in through ``extra=``
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class LogfmtFormatter(logging.Formatter):
+    """ts=... level=... logger=... msg="..." plus every ``extra`` field"""
+
+    def format(self, record):
+        fields = [
+            ('ts', self.formatTime(record, '%Y-%m-%dT%H:%M:%S')),
+            ('level', record.levelname.lower()),
+            ('logger', record.name),
+            ('msg', record.getMessage()),
+        ]
+        fields += [(key, value) for key, value in record.__dict__.items() if key not in _RESERVED]
+        line = ' '.join(f'{key}={_quote(value)}' for key, value in fields)
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+def _quote(value):
+    text = str(value)
+    if not text or any(c in text for c in ' "=\n'):
+        return '"' + text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+    return text
+
+
+def configure_logging(level=None):
+    """Send logs to stderr as logfmt at LOG_LEVEL (default INFO)"""
+    handler = logging.StreamHandler()
+    handler.setFormatter(LogfmtFormatter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel((level or config.LOG_LEVEL).upper())
+    # httpx logs every request at INFO, which would put it back on the hot path
+    logging.getLogger('httpx').setLevel(logging.WARNING)
@@ -0,0 +1,181 @@
+"""Cross-provider track matching used by MixedAPI.
+
+Every track is normalized once, all pairs are scored in a single batched
+pass, and pairs are assigned one-to-one so the total match score is as high
+as possible.
+"""
+import re
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+# Two tracks are the same song only if they score above this
+MATCH_THRESHOLD = 80
+
+# "(feat. X)", "[ft X]" and a trailing "feat. X" carry no identity: the
+# providers list guest artists differently
+FEAT_PATTERN = re.compile(r'[\(\[]\s*(?:feat|ft|featuring)\b[^\)\]]*[\)\]]|\s(?:feat|ft|featuring)\b\.?.*$')
+# "(Remix)", "- DJ X Remix", "(Remixed by X)" all become a single "remix" token
+# so a remix never matches the original but does match another spelling of itself
+REMIX_PATTERN = re.compile(r'[\(\[][^\)\]]*\bremix(?:ed)?\b[^\)\]]*[\)\]]|\s-\s[^-]*\bremix(?:ed)?\b.*$')
+# Bracketed noise that only one provider tends to add
+NOISE_PATTERN = re.compile(r'[\(\[][^\)\]]*\b(?:official|audio|video|lyric|lyrics|from|full song|hd)\b[^\)\]]*[\)\]]')
+PUNCTUATION_PATTERN = re.compile(r'[^\w\s]+')
+
+
+def normalize_title(title):
+    title = (title or '').lower()
+    title = FEAT_PATTERN.sub(' ', title)
+    title = REMIX_PATTERN.sub(' remix ', title)
+    title = NOISE_PATTERN.sub(' ', title)
+    return ' '.join(PUNCTUATION_PATTERN.sub(' ', title).split())
+
+
+def normalize_artist(artist):
+    return ' '.join(PUNCTUATION_PATTERN.sub(' ', (artist or '').lower()).split())
+
+
+def match_key(track):
+    """The string a track is compared by: normalized "title artist" """
+    return f"{normalize_title(track.get('title'))} {normalize_artist(track.get('artist'))}".strip()
+
+
+def score_matrix(left_keys, right_keys):
+    """max(ratio, partial_ratio) for every (left, right) pair, as a float matrix"""
+    if not left_keys or not right_keys:
+        return np.zeros((len(left_keys), len(right_keys)))
+    ratio = process.cdist(left_keys, right_keys, scorer=fuzz.ratio, workers=-1)
+    partial = process.cdist(left_keys, right_keys, scorer=fuzz.partial_ratio, workers=-1)
+    return np.maximum(ratio, partial)
+
+
+def _hungarian(cost):
+    """Minimum-cost assignment for a rows <= cols cost matrix.
+
+    Returns assignment[row] = col. O(rows^2 * cols).
+    """
+    n, m = len(cost), len(cost[0])
+    inf = float('inf')
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    p = [0] * (m + 1)  # p[col] = row assigned to col (1-based, 0 = free)
+    way = [0] * (m + 1)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            delta = inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = cost[i0 - 1][j - 1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    assignment = [None] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            assignment[p[j] - 1] = j - 1
+    return assignment
+
+
+def assign(scores, threshold=MATCH_THRESHOLD):
+    """One-to-one pairs (row, col) maximizing the total score of pairs above ``threshold``.
+
+    Only pairs above the threshold can match, so the bipartite graph splits
+    into small connected components and each one is solved on its own.
+    """
+    rows, cols = np.nonzero(scores > threshold)
+    if len(rows) == 0:
+        return []
+
+    # Union-find over rows (0..n-1) and cols (n..n+m-1)
+    n = scores.shape[0]
+    parent = list(range(n + scores.shape[1]))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for r, c in zip(rows.tolist(), cols.tolist()):
+        parent[find(r)] = find(n + c)
+
+    components = {}
+    for r, c in zip(rows.tolist(), cols.tolist()):
+        comp_rows, comp_cols = components.setdefault(find(r), ({}, {}))
+        comp_rows.setdefault(r, None)
+        comp_cols.setdefault(c, None)
+
+    pairs = []
+    for comp_rows, comp_cols in components.values():
+        comp_rows, comp_cols = list(comp_rows), list(comp_cols)
+        if len(comp_rows) == 1 and len(comp_cols) == 1:
+            pairs.append((comp_rows[0], comp_cols[0]))
+            continue
+
+        sub = scores[np.ix_(comp_rows, comp_cols)]
+        # Pairs at or below the threshold cost 0, i.e. they are as good as no match
+        cost = np.where(sub > threshold, -sub, 0.0)
+        transposed = len(comp_rows) > len(comp_cols)
+        if transposed:
+            cost = cost.T
+        for i, j in enumerate(_hungarian(cost.tolist())):
+            if j is None or cost[i][j] == 0:
+                continue
+            r, c = (j, i) if transposed else (i, j)
+            pairs.append((comp_rows[r], comp_cols[c]))
+
+    return sorted(pairs)
+
+
+def merge_tracks(query, left, right, limit=10, threshold=MATCH_THRESHOLD):
+    """Merge two providers' results, keeping one track per matched song.
+
+    Of each matched pair the track closer to ``query`` wins (ties go to
+    ``left``). Order follows ``left``, then the unmatched ``right`` tracks.
+    """
+    left_keys = [match_key(t) for t in left]
+    right_keys = [match_key(t) for t in right]
+
+    pairs = dict(assign(score_matrix(left_keys, right_keys), threshold))
+
+    query_scores = score_matrix([' '.join(PUNCTUATION_PATTERN.sub(' ', query.lower()).split())],
+                                left_keys + right_keys)[0]
+    left_query_scores = query_scores[:len(left)]
+    right_query_scores = query_scores[len(left):]
+
+    merged = []
+    for i, track in enumerate(left):
+        j = pairs.get(i)
+        if j is not None and right_query_scores[j] > left_query_scores[i]:
+            merged.append(right[j])
+        else:
+            merged.append(track)
+
+    matched_right = set(pairs.values())
+    merged.extend(t for j, t in enumerate(right) if j not in matched_right)
+    return merged[:limit]
@@ -0,0 +1,116 @@
+"""Per-stage latency histograms, Prometheus text export and Server-Timing."""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers cache hits (sub-ms) up to slow yt-dlp extractions
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, rendered in Prometheus text format"""
+
+    def __init__(self, name, documentation, labelnames, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labelvalues, series in sorted(snapshot.items()):
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labelvalues))
+            sep = ',' if labels else ''
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {series[len(self.buckets)]}')
+            lines.append(f'{self.name}_sum{{{labels}}} {series[-1]}')
+            lines.append(f'{self.name}_count{{{labels}}} {series[len(self.buckets)]}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+stage_seconds = Histogram(
+    'stage_duration_seconds', 'Time spent in each stage of request handling', ['stage'])
+request_seconds = Histogram(
+    'http_request_duration_seconds', 'End-to-end request latency', ['route', 'method', 'status'])
+
+# Stage timings of the request being handled, for its Server-Timing header.
+# fan_out copies the context into its worker threads, so stages run there
+# are attributed to the request that started them.
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+def start_request():
+    """Start collecting stage timings for the current request"""
+    _request_timings.set([])
+
+
+def request_timings():
+    return _request_timings.get() or []
+
+
+def record(stage, seconds):
+    stage_seconds.observe(seconds, stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage):
+    """Time the enclosed block as ``stage``"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def server_timing_header(timings, total=None):
+    """Server-Timing value; repeated stages are summed, concurrent ones overlap"""
+    durations = {}
+    for stage, seconds in timings:
+        durations[stage] = durations.get(stage, 0.0) + seconds
+    parts = [f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in durations.items()]
+    if total is not None:
+        parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
+
+
+def render_cache_stats(caches):
+    """Prometheus lines for TTLCache.stats() dicts"""
+    lines = []
+    counters = ['hits', 'misses', 'coalesced', 'evictions', 'expirations']
+    for counter in counters:
+        lines.append(f'# TYPE cache_{counter}_total counter')
+        for stats in caches:
+            lines.append(f'cache_{counter}_total{{cache="{stats["name"]}"}} {stats[counter]}')
+    lines.append('# TYPE cache_entries gauge')
+    for stats in caches:
+        lines.append(f'cache_entries{{cache="{stats["name"]}"}} {stats["size"]}')
+    return lines
+
+
+def render(extra_lines=()):
+    lines = stage_seconds.render() + request_seconds.render() + list(extra_lines)
+    return '\n'.join(lines) + '\n'
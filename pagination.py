@@ -0,0 +1,125 @@
+"""Cursor pagination for /search.
+
+A provider's search is a chain of pages (SearchPage), each naming the token
+of the next one: a JioSaavn page number, a youtubei continuation. Where a
+provider's results continue is a *position*, ``[token, offset]`` into the
+page at ``token``, or None once they are exhausted.
+
+iter_tracks / aiter_tracks walk the pages from a position as generators,
+fetching a page only when the walk reaches it, so a /search page costs the
+upstream pages it shows and nothing beyond. The positions of every provider
+in a search are carried by the client in an opaque cursor; the server keeps
+no per-client state and any worker can answer the next page.
+"""
+import base64
+import binascii
+import json
+from collections import namedtuple
+
+# tracks: the page's tracks; next: token of the following page, None on the last
+SearchPage = namedtuple('SearchPage', ['tracks', 'next'])
+
+
+class InvalidCursor(ValueError):
+    """A cursor that is malformed or belongs to another search"""
+
+
+def _after(page, token, index):
+    """Position of the track following ``page.tracks[index]``"""
+    if index + 1 < len(page.tracks):
+        return [token, index + 1]
+    if page.next is not None:
+        return [page.next, 0]
+    return None
+
+
+def iter_tracks(fetch_page, position):
+    """Yield (track, position after it) from ``position`` on.
+
+    ``fetch_page(token)`` returns the SearchPage at ``token``; it is only
+    called when the previous page has been used up. Stops at the last page,
+    or at an empty one so a provider can't keep the walk going.
+    """
+    while position is not None:
+        token, offset = position
+        page = fetch_page(token)
+        for index in range(offset, len(page.tracks)):
+            yield page.tracks[index], _after(page, token, index)
+        if not page.tracks or page.next is None:
+            return
+        position = [page.next, 0]
+
+
+async def aiter_tracks(fetch_page, position):
+    """iter_tracks for an async ``fetch_page``"""
+    while position is not None:
+        token, offset = position
+        page = await fetch_page(token)
+        for index in range(offset, len(page.tracks)):
+            yield page.tracks[index], _after(page, token, index)
+        if not page.tracks or page.next is None:
+            return
+        position = [page.next, 0]
+
+
+def take(tracks, count):
+    """(up to ``count`` tracks of an iter_tracks walk, the position after them)"""
+    taken = []
+    for track, position in tracks:
+        taken.append(track)
+        if len(taken) >= count:
+            break
+    else:
+        # Walked off the end (or nothing was left): nothing more to fetch
+        position = None
+    return taken, position
+
+
+async def atake(tracks, count):
+    """take for an aiter_tracks walk"""
+    taken = []
+    async for track, position in tracks:
+        taken.append(track)
+        if len(taken) >= count:
+            break
+    else:
+        position = None
+    await tracks.aclose()
+    return taken, position
+
+
+def _normalize(query):
+    return ' '.join(query.lower().split())
+
+
+def encode_cursor(query, provider, positions):
+    """Opaque cursor for the page after this one, or None when no provider has more"""
+    if all(position is None for position in positions.values()):
+        return None
+    state = {'q': _normalize(query), 'p': provider, 's': positions}
+    raw = json.dumps(state, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor, query, provider, tokens):
+    """{provider name: position} from a cursor issued for this query and provider
+
+    ``tokens`` maps each provider a cursor may name to a check of its page
+    tokens; other providers, or tokens failing the check, make it malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        state = json.loads(raw)
+        positions = state['s']
+        matches = state['q'] == _normalize(query) and state['p'] == provider
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor('Malformed cursor')
+    if not matches:
+        raise InvalidCursor('Cursor belongs to another search')
+    if not isinstance(positions, dict) or not all(
+            name in tokens and (position is None or (
+                isinstance(position, list) and len(position) == 2 and tokens[name](position[0])
+                and type(position[1]) is int and position[1] >= 0))
+            for name, position in positions.items()):
+        raise InvalidCursor('Malformed cursor')
+    return positions
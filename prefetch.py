@@ -0,0 +1,127 @@
+"""Background resolution of stream URLs for the tracks a listener plays next."""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class StopPrefetch(Exception):
+    """Raised by ``resolve`` to drop the rest of a queue, e.g. while upstream is saturated"""
+
+
+class SkipPrefetch(Exception):
+    """Raised by ``resolve`` to pass over one track, e.g. one a play is resolving already"""
+
+
+class QueuePrefetcher:
+    """Resolves the upcoming tracks of each listener's queue on a few daemon threads.
+
+    ``resolve(provider, song_id)`` resolves one track into the stream cache;
+    it may raise StopPrefetch to give up on the rest of the queue, or
+    SkipPrefetch to pass over just this track. Tracks go
+    in queue order, one at a time per queue, so the next track is ready
+    first.
+
+    Each client has at most one queue. A newer queue from the same client
+    replaces the old one: the old queue's tracks that haven't started are
+    dropped (a resolution already running still finishes and is cached), as
+    are tracks not started within ``budget`` seconds. At most
+    ``max_pending`` queues wait for a thread; more are turned away.
+    """
+
+    OUTCOMES = ('resolved', 'failed', 'skipped', 'cancelled', 'expired', 'shed', 'rejected')
+
+    def __init__(self, resolve, workers=2, max_tracks=3, budget=60.0, max_pending=64):
+        self.resolve = resolve
+        self.workers = workers
+        self.max_tracks = max_tracks
+        self.budget = budget
+        self.max_pending = max_pending
+        self._generations = {}  # client -> generation of its current queue
+        self._next_generation = 0
+        self._pending = 0
+        self._counts = dict.fromkeys(self.OUTCOMES, 0)  # tracks by outcome
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='prefetch')
+        return self._executor
+
+    def submit(self, client, tracks):
+        """Replace ``client``'s queue with ``tracks`` ((provider, id) pairs, next first).
+
+        Returns the number of tracks scheduled: 0 when ``tracks`` is empty
+        (which just cancels the old queue) or when too many queues are waiting.
+        """
+        tracks = list(dict.fromkeys(tracks))[:self.max_tracks]
+        with self._lock:
+            self._generations.pop(client, None)
+            if not tracks:
+                return 0
+            if self._pending >= self.max_pending:
+                self._counts['rejected'] += len(tracks)
+                return 0
+            self._next_generation += 1
+            generation = self._generations[client] = self._next_generation
+            self._pending += 1
+        deadline = time.monotonic() + self.budget
+        self._get_executor().submit(self._run, client, generation, tracks, deadline)
+        return len(tracks)
+
+    def _current(self, client, generation):
+        return self._generations.get(client) == generation
+
+    def _run(self, client, generation, tracks, deadline):
+        try:
+            for i, (provider, song_id) in enumerate(tracks):
+                if not self._current(client, generation):
+                    self._count('cancelled', len(tracks) - i)
+                    return
+                if time.monotonic() > deadline:
+                    self._count('expired', len(tracks) - i)
+                    return
+                try:
+                    url = self.resolve(provider, song_id)
+                except StopPrefetch as e:
+                    logger.debug('prefetch stopped', extra={'client': client, 'error': e})
+                    self._count('shed', len(tracks) - i)
+                    return
+                except SkipPrefetch:
+                    self._count('skipped')
+                    continue
+                except Exception as e:
+                    logger.warning('prefetch failed', extra={'provider': provider, 'song_id': song_id, 'error': e})
+                    url = None
+                self._count('resolved' if url else 'failed')
+        finally:
+            with self._lock:
+                self._pending -= 1
+                if self._generations.get(client) == generation:
+                    del self._generations[client]
+
+    def _count(self, outcome, n=1):
+        with self._lock:
+            self._counts[outcome] += n
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, pending=self._pending, queues=len(self._generations))
+
+    def render_metrics(self):
+        """Prometheus lines: upcoming tracks by outcome and queues not finished yet"""
+        stats = self.stats()
+        lines = ['# TYPE prefetch_tracks_total counter']
+        for outcome in self.OUTCOMES:
+            lines.append(f'prefetch_tracks_total{{outcome="{outcome}"}} {stats[outcome]}')
+        lines += ['# TYPE prefetch_pending_queues gauge', f'prefetch_pending_queues {stats["pending"]}']
+        return lines
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,251 @@
+"""Per-provider health: circuit breakers, adaptive timeouts and hedged calls."""
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+import config
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class CircuitOpen(Exception):
+    """The provider's breaker is open; the call was not attempted"""
+
+
+class UpstreamError(Exception):
+    """The provider answered, but not with something usable"""
+
+
+_TIMEOUT_NAMES = frozenset(['TimeoutError', 'Timeout', 'TimeoutException'])
+
+
+def is_timeout(error):
+    """Whether ``error`` means the call ran out of time.
+
+    Covers builtin, urllib3/requests and httpx timeouts, also when wrapped:
+    after retries requests raises a ConnectionError around urllib3's
+    MaxRetryError, whose ``reason`` is the ReadTimeoutError.
+    """
+    seen = set()
+    pending = [error]
+    while pending:
+        error = pending.pop()
+        if error is None or id(error) in seen:
+            continue
+        seen.add(id(error))
+        if any(cls.__name__ in _TIMEOUT_NAMES for cls in type(error).__mro__):
+            return True
+        pending.extend([error.__cause__, error.__context__, getattr(error, 'reason', None)])
+        pending.extend(arg for arg in error.args if isinstance(arg, BaseException))
+    return False
+
+
+class ProviderHealth:
+    """Tracks one provider's recent calls.
+
+    A call counts as failed if it raised or took longer than
+    ``slow_call_seconds``. Once at least ``min_calls`` of the last ``window``
+    calls were seen and the failed share reaches ``failure_ratio``, the
+    breaker opens for ``cooldown`` seconds. After that a single probe call is
+    let through (half-open), with the full configured deadline: success
+    closes the breaker, failure re-opens it.
+
+    The adaptive timeout learns from every call that ran its course. A call
+    that timed out or was slow is a censored sample: it took at least its
+    elapsed time, and leaving it out would let the timeout only ever shrink.
+    """
+
+    def __init__(self, name, deadline, window=None, min_calls=None, failure_ratio=None,
+                 slow_call_seconds=None, cooldown=None):
+        self.name = name
+        self.deadline = deadline
+        self.window = window or config.BREAKER_WINDOW
+        self.min_calls = min_calls or config.BREAKER_MIN_CALLS
+        self.failure_ratio = failure_ratio or config.BREAKER_FAILURE_RATIO
+        self.slow_call_seconds = slow_call_seconds or config.BREAKER_SLOW_CALL_SECONDS
+        self.cooldown = cooldown or config.BREAKER_COOLDOWN
+
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=self.window)  # True = failed
+        self._latencies = deque(maxlen=config.LATENCY_WINDOW)  # includes censored samples (timeouts)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    # ---------- breaker ----------
+    def allow(self):
+        """Whether a call may go out now; claims the probe slot when half-open"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    return False
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == HALF_OPEN:
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def is_open(self):
+        """True while calls are being rejected: open and still cooling down, or half-open with its probe out"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                return self._probe_in_flight
+            return self.state == OPEN and time.monotonic() - self._opened_at < self.cooldown
+
+    def record(self, seconds, failed, timed_out=False):
+        """Note one call's outcome; a ``timed_out`` call ran at least ``seconds``"""
+        slow = seconds > self.slow_call_seconds
+        failed = failed or slow
+        with self._lock:
+            if not failed or timed_out or slow:
+                self._latencies.append(seconds)
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+                if failed:
+                    self._trip()
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    logger.info('circuit closed', extra={'provider': self.name})
+                return
+
+            self._outcomes.append(failed)
+            if (self.state == CLOSED and len(self._outcomes) >= self.min_calls
+                    and sum(self._outcomes) / len(self._outcomes) >= self.failure_ratio):
+                self._trip()
+
+    def abandon(self):
+        """A call given up by its caller before its deadline: no verdict on the provider"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                # Let the next call probe instead
+                self._probe_in_flight = False
+
+    def _trip(self):
+        # Caller must hold the lock
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        logger.warning('circuit opened', extra={'provider': self.name, 'cooldown': self.cooldown})
+
+    @contextmanager
+    def track(self):
+        """Guard and time one upstream call; yields its timeout, raises CircuitOpen instead of calling"""
+        if not self.allow():
+            raise CircuitOpen(f'{self.name} circuit is open')
+        timeout = self.timeout()
+        start = time.perf_counter()
+        try:
+            yield timeout
+        except BaseException as e:
+            seconds = time.perf_counter() - start
+            if isinstance(e, (asyncio.CancelledError, GeneratorExit)) and seconds < timeout:
+                # Cancelled early (e.g. the client went away), not by a deadline
+                self.abandon()
+            else:
+                self.record(seconds, failed=True, timed_out=is_timeout(e) or isinstance(e, asyncio.CancelledError))
+            raise
+        self.record(time.perf_counter() - start, failed=False)
+
+    # ---------- latency ----------
+    def percentile(self, pct):
+        """Latency percentile of recent calls, or None with too few samples"""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < config.LATENCY_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+    def timeout(self):
+        """Adaptive deadline: p99 * multiplier, kept within [minimum, configured deadline].
+
+        The configured deadline while the breaker isn't closed, so a probe
+        isn't cut short by latencies from before the provider slowed down.
+        """
+        with self._lock:
+            if self.state != CLOSED:
+                return self.deadline
+        p99 = self.percentile(99)
+        if p99 is None:
+            return self.deadline
+        return min(self.deadline, max(config.ADAPTIVE_TIMEOUT_MIN, p99 * config.ADAPTIVE_TIMEOUT_MULTIPLIER))
+
+    def hedge_delay(self):
+        """How long to wait before sending a duplicate request (None = don't hedge yet)"""
+        return self.percentile(95)
+
+
+_hedge_executor = ThreadPoolExecutor(max_workers=config.FANOUT_WORKERS, thread_name_prefix='hedge')
+
+
+def hedged(fn, delay):
+    """Call ``fn``; if it hasn't returned after ``delay`` seconds, call it again
+    and return whichever copy finishes first. ``delay=None`` means no hedge.
+
+    A copy that fails is ignored as long as the other one can still succeed.
+    """
+    if delay is None:
+        return fn()
+
+    first = _hedge_executor.submit(contextvars.copy_context().run, fn)
+    done, _ = wait([first], timeout=delay)
+    if done:
+        return first.result()
+
+    logger.debug('sending hedged request')
+    second = _hedge_executor.submit(contextvars.copy_context().run, fn)
+    pending = {first, second}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None or not pending:
+                return future.result()
+
+
+async def hedged_async(make_coro, delay):
+    """Async ``hedged``: ``make_coro`` is called once per copy"""
+    if delay is None:
+        return await make_coro()
+
+    first = asyncio.ensure_future(make_coro())
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done:
+        return first.result()
+
+    logger.debug('sending hedged request')
+    pending = {first, asyncio.ensure_future(make_coro())}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None or not pending:
+                    return task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+provider_health = {
+    'saavn': ProviderHealth('saavn', config.PROVIDER_DEADLINES['saavn']),
+    'youtube': ProviderHealth('youtube', config.PROVIDER_DEADLINES['youtube']),
+}
+
+
+def render_metrics():
+    """Prometheus gauges for breaker state and current adaptive timeouts"""
+    lines = ['# TYPE provider_circuit_open gauge']
+    for name, health in provider_health.items():
+        lines.append(f'provider_circuit_open{{provider="{name}"}} {1 if health.is_open() else 0}')
+    lines.append('# TYPE provider_adaptive_timeout_seconds gauge')
+    for name, health in provider_health.items():
+        lines.append(f'provider_adaptive_timeout_seconds{{provider="{name}"}} {health.timeout()}')
+    return lines
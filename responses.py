@@ -0,0 +1,123 @@
+"""Response encoding shared by the Flask and ASGI apps: JSON, compression, ETags.
+
+finish() takes a complete 200 answer and gives it a content-hash ETag
+(answering a matching If-None-Match with 304), the path's Cache-Control and
+the best compression the client accepts. Streamed answers (NDJSON search)
+and static files don't go through it; static files get content_version
+URLs instead.
+"""
+import gzip
+import hashlib
+
+from flask.json.provider import DefaultJSONProvider
+
+import config
+from cache import TTLCache
+from track import dumps
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = frozenset(['application/json', 'text/html'])
+# Preferred first when the client weighs them equally
+CODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+compressed_cache = TTLCache(config.COMPRESSED_CACHE_SIZE, name='compressed')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify through track.dumps: orjson when installed, Tracks spliced in from their cached encoding"""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return dumps(obj)
+        except TypeError:
+            # Dates, decimals and the like: Flask's encoder knows them
+            return super().dumps(obj)
+
+
+def negotiate_encoding(accept_encoding):
+    """Best content-coding ``accept_encoding`` allows: 'br', 'gzip' or None for identity"""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.partition(';')
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for coding in CODINGS:
+        weight = weights.get(coding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def etag(body):
+    """Weak validator from the content; weak, so one tag covers every content-coding"""
+    return 'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def content_version(*paths):
+    """Short hash of the files' contents, for versioned URLs: changes whenever any of them does"""
+    digest = hashlib.blake2b(digest_size=8)
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def etag_matches(if_none_match, tag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = tag[2:]
+    return any(candidate.strip().removeprefix('W/') == opaque for candidate in if_none_match.split(','))
+
+
+def _compress(body, coding):
+    if coding == 'br':
+        return brotli.compress(body, quality=config.BROTLI_QUALITY)
+    # mtime=0 keeps the output a function of the body alone
+    return gzip.compress(body, compresslevel=config.GZIP_LEVEL, mtime=0)
+
+
+def compress(body, coding, tag):
+    return compressed_cache.get_or_load((tag, coding), lambda: _compress(body, coding),
+                                        ttl=config.COMPRESSED_CACHE_TTL)
+
+
+def finish(method, path, status, mimetype, body, if_none_match, accept_encoding, cache_control=None):
+    """(status, body, headers to add) for a complete answer to ``method path``
+
+    ``cache_control`` is the Cache-Control the answer already has, which
+    takes precedence over the path's.
+    """
+    headers = {}
+    if method not in ('GET', 'HEAD') or status != 200 or mimetype not in COMPRESSIBLE_TYPES:
+        return status, body, headers
+    if path in config.CACHE_CONTROL and not cache_control:
+        headers['Cache-Control'] = config.CACHE_CONTROL[path]
+    compressible = len(body) >= config.COMPRESS_MIN_SIZE
+    if compressible:
+        headers['Vary'] = 'Accept-Encoding'
+    tag = headers['ETag'] = etag(body)
+    if etag_matches(if_none_match, tag):
+        return 304, b'', headers
+    if compressible:
+        coding = negotiate_encoding(accept_encoding)
+        if coding is not None:
+            body = compress(body, coding, tag)
+            headers['Content-Encoding'] = coding
+    return status, body, headers
@@ -4,6 +4,7 @@ const searchBtn = document.getElementById('searchBtn');
 const searchResults = document.getElementById('searchResults');
 const loading = document.getElementById('loading');
 const emptyState = document.getElementById('emptyState');
+const suggestionsBox = document.getElementById('suggestions');
 
 // Full Page Player Elements
 const fullpagePlayer = document.getElementById('fullpagePlayer');
@@ -47,10 +48,8 @@ let isLiked = false;
 document.addEventListener('DOMContentLoaded', () => {
     const trendingSongs = document.querySelectorAll('.result-item[data-track]');
     trendingSongs.forEach(item => {
-        item.addEventListener('click', () => {
-            const trackData = JSON.parse(item.getAttribute('data-track'));
-            playTrack(trackData);
-        });
+        item.track = JSON.parse(item.getAttribute('data-track'));
+        item.addEventListener('click', () => playFromList(item));
     });
 });
 
@@ -62,6 +61,121 @@ searchInput.addEventListener('keypress', (e) => {
     }
 });
 
+// ==================== Typeahead ====================
+// Requests wait until typing pauses, and a newer keystroke aborts the request
+// still in flight, so a burst of typing costs one /suggest call
+const SUGGEST_DEBOUNCE_MS = 150;
+const SUGGEST_MIN_CHARS = 2;
+let suggestTimer = null;
+let suggestController = null;
+
+searchInput.addEventListener('input', () => {
+    clearTimeout(suggestTimer);
+    if (suggestController) suggestController.abort();
+    
+    const query = searchInput.value.trim();
+    if (query.length < SUGGEST_MIN_CHARS) {
+        hideSuggestions();
+        return;
+    }
+    suggestTimer = setTimeout(() => fetchSuggestions(query), SUGGEST_DEBOUNCE_MS);
+});
+
+searchInput.addEventListener('keydown', (e) => {
+    if (e.key === 'Escape') hideSuggestions();
+});
+
+document.addEventListener('click', (e) => {
+    if (!suggestionsBox.contains(e.target) && e.target !== searchInput) hideSuggestions();
+});
+
+async function fetchSuggestions(query) {
+    const controller = new AbortController();
+    suggestController = controller;
+    
+    try {
+        const response = await fetch(`/suggest?q=${encodeURIComponent(query)}`, { signal: controller.signal });
+        const data = await response.json();
+        if (controller === suggestController) showSuggestions(data.suggestions || []);
+    } catch (error) {
+        if (error.name !== 'AbortError') console.error('Suggest error:', error);
+    }
+}
+
+function showSuggestions(suggestions) {
+    suggestionsBox.innerHTML = '';
+    if (suggestions.length === 0) {
+        hideSuggestions();
+        return;
+    }
+    
+    suggestions.forEach(track => {
+        const item = document.createElement('div');
+        item.className = 'suggestion-item';
+        
+        const img = document.createElement('img');
+        setArtwork(img, track, '36px', 'https://via.placeholder.com/36?text=%E2%99%AA');
+        img.alt = '';
+        
+        const text = document.createElement('div');
+        const title = document.createElement('div');
+        title.className = 'suggestion-title';
+        title.textContent = track.title;
+        const artist = document.createElement('div');
+        artist.className = 'suggestion-artist';
+        artist.textContent = track.artist || 'Unknown Artist';
+        text.appendChild(title);
+        text.appendChild(artist);
+        
+        item.appendChild(img);
+        item.appendChild(text);
+        item.addEventListener('click', () => {
+            searchInput.value = track.title;
+            performSearch();
+        });
+        suggestionsBox.appendChild(item);
+    });
+    suggestionsBox.style.display = 'block';
+}
+
+function hideSuggestions() {
+    clearTimeout(suggestTimer);
+    if (suggestController) {
+        suggestController.abort();
+        suggestController = null;
+    }
+    suggestionsBox.style.display = 'none';
+}
+
+// ==================== Search Cache ====================
+// The last few searches' results, with the cursor of their next page, so
+// repeating one (back to an earlier query, or to a provider) shows it at
+// once without asking the server. The least recently used goes first, and
+// an entry expires after a few minutes like the server's own answers
+const SEARCH_CACHE_SIZE = 20;
+const SEARCH_CACHE_TTL_MS = 5 * 60 * 1000;
+const searchCache = new Map();
+
+function searchCacheKey(query, provider) {
+    return `${provider}\n${query.toLowerCase().split(/\s+/).join(' ')}`;
+}
+
+function cachedSearch(key) {
+    const entry = searchCache.get(key);
+    if (!entry) return null;
+    searchCache.delete(key);
+    if (Date.now() - entry.time > SEARCH_CACHE_TTL_MS) return null;
+    // Re-inserted: a Map iterates in insertion order, so the oldest key is the least recently used
+    searchCache.set(key, entry);
+    return entry;
+}
+
+function cacheSearch(key, results, next) {
+    searchCache.delete(key);
+    searchCache.set(key, { results, next, time: Date.now() });
+    if (searchCache.size > SEARCH_CACHE_SIZE) searchCache.delete(searchCache.keys().next().value);
+}
+
 async function performSearch() {
     const query = searchInput.value.trim();
     const provider = providerSelect.value;
@@ -70,34 +184,97 @@ async function performSearch() {
         return;
     }
     
-    loading.style.display = 'flex';
+    hideSuggestions();
+    // The search still in flight (or its next page) is moot now: abort it
+    // so the server stops working on it
+    if (searchController) searchController.abort();
+    const controller = searchController = new AbortController();
     searchResults.innerHTML = '';
+    shownKeys.clear();
+    const key = searchCacheKey(query, provider);
+    const context = searchContext = { query, provider, key, signal: controller.signal };
+    nextCursor = null;
     if (emptyState) emptyState.style.display = 'none';
     
-    try {
-        const response = await fetch(`/search?q=${encodeURIComponent(query)}&provider=${provider}`);
-        const data = await response.json();
-        
+    const cached = cachedSearch(key);
+    if (cached) {
         loading.style.display = 'none';
+        displayResults(cached.results);
+        nextCursor = cached.next;
+        return;
+    }
+    loading.style.display = 'flex';
+    
+    try {
+        const response = await fetch(`/search/stream?q=${encodeURIComponent(query)}&provider=${provider}`,
+                                     { signal: controller.signal });
         
-        if (data.error) {
-            showEmptyState('Error: ' + data.error);
+        if (!response.ok || !response.body) {
+            const data = await response.json();
+            loading.style.display = 'none';
+            showEmptyState('Error: ' + (data.error || response.statusText));
             return;
         }
         
-        if (data.length === 0) {
-            showEmptyState('No results found');
-            return;
+        // Results arrive as NDJSON events: one per provider as it answers, then the final ranking
+        let shown = [];
+        for await (const event of readEvents(response.body)) {
+            if (context !== searchContext) return;
+            if (event.event === 'provider' && event.results.length > 0) {
+                loading.style.display = 'none';
+                appendResults(event.results);
+                shown = shown.concat(event.results);
+            } else if (event.event === 'merged') {
+                loading.style.display = 'none';
+                nextCursor = event.next || null;
+                if (event.partial) {
+                    console.warn('Some providers did not respond in time; showing partial results');
+                } else if (event.results.length > 0) {
+                    cacheSearch(key, event.results, nextCursor);
+                }
+                if (event.results.length === 0) {
+                    searchResults.innerHTML = '';
+                    showEmptyState('No results found');
+                } else if (!sameResults(shown, event.results)) {
+                    displayResults(event.results);
+                }
+            } else if (event.event === 'error') {
+                loading.style.display = 'none';
+                showEmptyState('Error: ' + event.error);
+            }
         }
-        
-        displayResults(data);
     } catch (error) {
+        // Superseded by a newer search, which has the spinner now
+        if (error.name === 'AbortError') return;
         loading.style.display = 'none';
         showEmptyState('Error searching. Please try again.');
         console.error('Search error:', error);
     }
 }
 
+async function* readEvents(body) {
+    const reader = body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        
+        const lines = buffered.split('\n');
+        buffered = lines.pop();
+        for (const line of lines) {
+            if (line.trim()) yield JSON.parse(line);
+        }
+    }
+    if (buffered.trim()) yield JSON.parse(buffered);
+}
+
+function sameResults(a, b) {
+    return a.length === b.length && a.every((item, i) => item.id === b[i].id && item.provider === b[i].provider);
+}
+
 function showEmptyState(message) {
     if (emptyState) {
         emptyState.style.display = 'flex';
@@ -107,10 +284,19 @@ function showEmptyState(message) {
 
 function displayResults(data) {
     searchResults.innerHTML = '';
-    
-    // Handle flat array of results
+    shownKeys.clear();
+    appendResults(data);
+}
+
+function appendResults(data) {
+    // Handle flat array of results; a track already in the list isn't shown twice
     if (Array.isArray(data) && data.length > 0) {
-        data.forEach((item, index) => {
+        data.filter(item => {
+            const key = `${item.provider}:${item.id}`;
+            if (shownKeys.has(key)) return false;
+            shownKeys.add(key);
+            return true;
+        }).forEach((item, index) => {
             const resultItem = createResultItem(item);
             resultItem.style.animationDelay = `${index * 0.05}s`;
             searchResults.appendChild(resultItem);
@@ -123,11 +309,10 @@ function createResultItem(item) {
     div.className = 'result-item';
     
     const img = document.createElement('img');
-    img.src = item.image || 'https://via.placeholder.com/200?text=No+Image';
+    img.loading = 'lazy';
+    img.decoding = 'async';
+    setArtwork(img, item, RESULT_IMAGE_SIZES, 'https://via.placeholder.com/200?text=No+Image');
     img.alt = item.title;
-    img.onerror = function() {
-        this.src = 'https://via.placeholder.com/200?text=No+Image';
-    };
     
     const info = document.createElement('div');
     info.className = 'result-info';
@@ -152,23 +337,137 @@ function createResultItem(item) {
     div.appendChild(info);
     
     // Add play functionality
-    div.addEventListener('click', () => playTrack(item));
+    div.track = item;
+    div.addEventListener('click', () => playFromList(div));
     
     return div;
 }
 
+// ==================== Artwork ====================
+// Tracks carry their artwork at each size the provider serves (images,
+// smallest first). Result rows, suggestions and the mini player let the
+// browser pick the smallest one that fills the slot at the screen's pixel
+// density; result rows also load only as they scroll into view
+const RESULT_IMAGE_SIZES = searchResults.dataset.imageSizes || '100vw';
+
+function setArtwork(img, track, sizes, placeholder) {
+    img.onerror = function() {
+        this.removeAttribute('srcset');
+        this.src = placeholder;
+    };
+    // srcset and sizes first, so the browser never starts on the full-size src
+    if (track.images && track.images.length > 0) {
+        img.sizes = sizes;
+        img.srcset = track.images.map(variant => `${variant.url} ${variant.width}w`).join(', ');
+    } else {
+        img.removeAttribute('srcset');
+    }
+    img.src = track.image || placeholder;
+}
+
+// ==================== Result Pages ====================
+// A search shows its first page. The pages after it are fetched from
+// /search with the cursor of the last one, only once the list has been
+// scrolled near its end. A new search aborts the last one's requests
+let searchContext = null;
+let searchController = null;
+let nextCursor = null;
+let loadingMore = false;
+let sentinelVisible = false;
+const shownKeys = new Set();
+
+const resultsSentinel = document.createElement('div');
+resultsSentinel.className = 'results-sentinel';
+searchResults.after(resultsSentinel);
+
+new IntersectionObserver(entries => {
+    sentinelVisible = entries.some(entry => entry.isIntersecting);
+    if (sentinelVisible) loadMoreResults();
+}, { rootMargin: '600px 0px' }).observe(resultsSentinel);
+
+async function loadMoreResults() {
+    if (!nextCursor || loadingMore) return;
+    const context = searchContext;
+    loadingMore = true;
+    
+    try {
+        const params = new URLSearchParams({ q: context.query, provider: context.provider, cursor: nextCursor });
+        const response = await fetch(`/search?${params}`, { signal: context.signal });
+        const data = await response.json();
+        // Another search started meanwhile
+        if (context !== searchContext) return;
+        if (!response.ok) {
+            console.warn('Could not load more results:', data.error || response.statusText);
+            if (response.status === 400) nextCursor = null;
+            return;
+        }
+        if (data.partial) {
+            console.warn('Some providers did not respond in time; they are retried on the next page');
+        }
+        nextCursor = data.next || null;
+        appendResults(data.results);
+        const cached = searchCache.get(context.key);
+        if (cached) {
+            cached.results = cached.results.concat(data.results);
+            cached.next = nextCursor;
+        }
+    } catch (error) {
+        if (error.name !== 'AbortError') console.error('Load more error:', error);
+        return;
+    } finally {
+        loadingMore = false;
+    }
+    
+    // A page of tracks already shown doesn't move the sentinel out of view
+    if (sentinelVisible) loadMoreResults();
+}
+
+// ==================== Play Queue ====================
+// The queue is the list a track was picked from. Whenever a track starts,
+// the next few are sent to /queue/prefetch so the server resolves their
+// stream URLs while this one plays, and next/previous start without waiting
+const PREFETCH_AHEAD = 3;
+const sessionId = Math.random().toString(36).slice(2);
+let playQueue = [];
+let queueIndex = -1;
+// The /stream lookup in flight; picking another track aborts it
+let streamController = null;
+
+function playFromList(element) {
+    playQueue = Array.from(searchResults.querySelectorAll('.result-item'), item => item.track).filter(Boolean);
+    queueIndex = playQueue.indexOf(element.track);
+    playTrack(element.track);
+}
+
+function playQueued(offset) {
+    const index = queueIndex + offset;
+    if (index < 0 || index >= playQueue.length) return;
+    queueIndex = index;
+    playTrack(playQueue[index]);
+}
+
+function prefetchUpcoming() {
+    // An empty list still goes out: it cancels what was prefetched for the old queue
+    const upcoming = playQueue.slice(queueIndex + 1, queueIndex + 1 + PREFETCH_AHEAD)
+        .map(track => ({ id: track.id, provider: track.provider }));
+    fetch('/queue/prefetch', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ session: sessionId, tracks: upcoming })
+    }).catch(err => console.warn('Prefetch error:', err));
+}
+
 async function playTrack(track) {
     currentTrack = track;
+    if (streamController) streamController.abort();
+    const controller = streamController = new AbortController();
     
     // Update Mini Player UI
-    miniImage.src = track.image || 'https://via.placeholder.com/80?text=No+Image';
-    miniImage.onerror = function() {
-        this.src = 'https://via.placeholder.com/80?text=No+Image';
-    };
+    setArtwork(miniImage, track, '56px', 'https://via.placeholder.com/80?text=No+Image');
     miniTitle.textContent = track.title;
     miniArtist.textContent = track.artist || 'Unknown Artist';
     
-    // Update Full Player UI
+    // Update Full Player UI: the one place the full-size artwork is loaded
     fullPlayerImage.src = track.image || 'https://via.placeholder.com/400?text=No+Image';
     fullPlayerImage.onerror = function() {
         this.src = 'https://via.placeholder.com/400?text=No+Image';
@@ -188,9 +487,13 @@ async function playTrack(track) {
     
     try {
         // Get stream URL from backend
-        const response = await fetch(`/stream?id=${encodeURIComponent(track.id)}&provider=${track.provider}`);
+        const response = await fetch(`/stream?id=${encodeURIComponent(track.id)}&provider=${track.provider}`,
+                                     { signal: controller.signal });
         const data = await response.json();
         
+        // Skipped past this track while its URL was resolving
+        if (currentTrack !== track) return;
+        
         if (data.error) {
             alert(`Error: ${data.error}`);
             return;
@@ -198,6 +501,7 @@ async function playTrack(track) {
         
         if (data.url) {
             audioPlayer.src = data.url;
+            prefetchUpcoming();
             audioPlayer.play().then(() => {
                 isPlaying = true;
                 updatePlayButtons();
@@ -209,6 +513,8 @@ async function playTrack(track) {
             alert('Could not play this track');
         }
     } catch (error) {
+        // Skipped to another track before this one's URL came back
+        if (error.name === 'AbortError') return;
         console.error('Play error:', error);
         alert('Error playing track');
     }
@@ -290,6 +596,7 @@ audioPlayer.addEventListener('pause', () => {
 audioPlayer.addEventListener('ended', () => {
     isPlaying = false;
     updatePlayButtons();
+    playQueued(1);
 });
 
 // Progress bar click to seek - Full Player
@@ -339,13 +646,9 @@ shuffleBtnFull.addEventListener('click', () => {
     console.log('Shuffle toggled');
 });
 
-prevBtnFull.addEventListener('click', () => {
-    console.log('Previous track');
-});
+prevBtnFull.addEventListener('click', () => playQueued(-1));
 
-nextBtnFull.addEventListener('click', () => {
-    console.log('Next track');
-});
+nextBtnFull.addEventListener('click', () => playQueued(1));
 
 repeatBtnFull.addEventListener('click', () => {
     repeatBtnFull.classList.toggle('active');
@@ -353,13 +656,9 @@ repeatBtnFull.addEventListener('click', () => {
 });
 
 // Control buttons - Mini Player
-miniPrevBtn.addEventListener('click', () => {
-    console.log('Previous track');
-});
+miniPrevBtn.addEventListener('click', () => playQueued(-1));
 
-miniNextBtn.addEventListener('click', () => {
-    console.log('Next track');
-});
+miniNextBtn.addEventListener('click', () => playQueued(1));
 
 // Format time helper
 function formatTime(seconds) {
@@ -397,3 +696,11 @@ document.addEventListener('keydown', (e) => {
     }
 });
 
+// ==================== Service Worker ====================
+// Keeps the page, style.css and script.js so a repeat visit renders without
+// the network (see templates/sw.js)
+if ('serviceWorker' in navigator) {
+    window.addEventListener('load', () => {
+        navigator.serviceWorker.register('/sw.js').catch(err => console.warn('Service worker error:', err));
+    });
+}
@@ -0,0 +1,78 @@
+// Service worker: keeps the app shell (the page, its stylesheet and script)
+// so a repeat visit renders without waiting on the network.
+//
+// Rendered by the server (/sw.js): VERSION hashes the shell's files, so any
+// change to them gives this script new bytes, which installs a new worker
+// with a fresh cache. The old cache stays until a page of this version has
+// been served: a page loaded from it just before the switch still finds its
+// assets there, and the server answers their old ?v= URLs with a 404.
+const VERSION = {{ version|tojson }};
+const CACHE = `shell-${VERSION}`;
+const SHELL = {{ shell|tojson }};
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(CACHE)
+            .then(cache => cache.addAll(SHELL))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(self.clients.claim());
+});
+
+function currentPage(response) {
+    return response && response.headers.get('X-Shell-Version') === VERSION;
+}
+
+function dropOldCaches() {
+    return caches.keys().then(keys => Promise.all(
+        keys.filter(key => key.startsWith('shell-') && key !== CACHE).map(key => caches.delete(key))
+    ));
+}
+
+// The page: answered from the cache at once and refreshed in the background,
+// so the next visit gets the current trending list. A cached page of another
+// version would ask for asset URLs that are gone, so then the network goes
+// first, and the cached page is only the offline fallback
+async function servePage(event) {
+    const cache = await caches.open(CACHE);
+    const cached = await cache.match('/');
+    const fresh = fetch(event.request).then(response => {
+        if (response.ok && currentPage(response)) cache.put('/', response.clone());
+        return response;
+    });
+    if (!currentPage(cached)) {
+        return fresh.catch(() => cached || caches.match('/').then(older => older || Response.error()));
+    }
+    event.waitUntil(Promise.all([fresh.catch(() => {}), dropOldCaches()]));
+    return cached;
+}
+
+// A versioned asset never changes under its URL: the cache is always right
+async function serveAsset(request, url) {
+    const cached = await caches.match(request);
+    if (cached) return cached;
+    const response = await fetch(request);
+    // Only the current versions: the server has no other
+    if (response.ok && SHELL.includes(url.pathname + url.search)) {
+        const cache = await caches.open(CACHE);
+        cache.put(request, response.clone());
+    }
+    return response;
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) return;
+
+    if (request.mode === 'navigate' && url.pathname === '/') {
+        event.respondWith(servePage(event));
+    } else if (url.pathname.startsWith('/static/') && url.searchParams.has('v')) {
+        event.respondWith(serveAsset(request, url));
+    }
+    // Searches, streams and the rest of the API go to the network untouched
+});
@@ -0,0 +1,242 @@
+"""Track: the one in-memory shape of a search result, whatever the provider."""
+import json
+import sys
+from functools import lru_cache
+from operator import attrgetter
+
+from pagination import SearchPage
+
+FIELDS = ('id', 'title', 'artist', 'album', 'image', 'duration', 'year', 'language', 'has_320kbps', 'type',
+          'provider')
+_FIELD_SET = frozenset(FIELDS)
+# to_dict() emits keys already sorted, so encoding a track can skip sorting.
+# It also emits ``images``, which is derived from ``image`` rather than stored
+_SORTED_FIELDS = tuple(sorted(FIELDS + ('images',)))
+_sorted_values = attrgetter(*_SORTED_FIELDS)
+# Tracks whose JSON is kept for reuse: enough for the answers being served
+# right now, while a cache of a million tracks holds no encoded copies
+ENCODED_TRACKS = 4096
+
+# Artwork widths each provider's CDN serves, smallest first; ``image`` is the
+# largest. JioSaavn has these three; YouTube Music scales to any size
+IMAGE_SIZES = {
+    'saavn': (50, 150, 500),
+    'youtube': (60, 120, 240, 500),
+}
+# The size token in a full-size artwork URL, and its format at another width
+_IMAGE_SIZE_TOKENS = {
+    'saavn': ('500x500', '{0}x{0}'),
+    'youtube': ('w500-h500', 'w{0}-h{0}'),
+}
+
+try:
+    import orjson
+except ImportError:  # the stdlib encoder gives the same JSON, a few times slower
+    orjson = None
+
+# Compact, keys sorted, like Flask's jsonify outside debug mode (orjson
+# leaves non-ASCII characters unescaped, which is the same JSON). Datetimes
+# and dataclasses raise TypeError with either encoder, as json.dumps does
+if orjson is not None:
+    _PASSTHROUGH = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def _encode(obj):
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | _PASSTHROUGH).decode()
+
+    def _encode_sorted(obj):
+        return orjson.dumps(obj, option=_PASSTHROUGH).decode()
+else:
+    _encode = json.JSONEncoder(separators=(',', ':'), sort_keys=True).encode
+    _encode_sorted = json.JSONEncoder(separators=(',', ':')).encode
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Track:
+    """A song from any provider.
+
+    ``__slots__`` keeps a cached track at a fraction of the size of the dict
+    it replaces, and the low-cardinality fields (year, language, type,
+    provider) are interned so every cached track shares one copy of each.
+    Read access works like a dict (``track['title']``, ``track.get('album')``)
+    so matching, templates and the catalog don't care which they get.
+
+    Tracks are not modified once built, which lets ``json()`` reuse the
+    encoding of the last ENCODED_TRACKS tracks served for every response
+    they appear in. Fields a provider doesn't have are None and left out of
+    the JSON.
+    """
+
+    __slots__ = FIELDS
+
+    def __init__(self, id, title='', artist='', album='', image='', duration='', year=None, language=None,
+                 has_320kbps=None, type='song', provider=None):
+        self.id = id
+        self.title = title
+        self.artist = artist
+        self.album = album
+        self.image = image
+        self.duration = duration
+        self.year = _intern(year)
+        self.language = _intern(language)
+        self.has_320kbps = has_320kbps
+        self.type = _intern(type)
+        self.provider = _intern(provider)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data[name] for name in FIELDS if name in data})
+
+    @property
+    def images(self):
+        """The artwork at every size the provider serves (see image_variants)"""
+        return image_variants(self.provider, self.image)
+
+    def to_dict(self):
+        return {name: value for name, value in zip(_SORTED_FIELDS, _sorted_values(self)) if value is not None}
+
+    def json(self):
+        return _encoded(self)
+
+    def get(self, key, default=None):
+        value = getattr(self, key) if key in _FIELD_SET else None
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __reduce__(self):
+        # Pickled as its JSON, which also re-interns the fields
+        return _track_from_json, (self.json(),)
+
+    def __repr__(self):
+        return f'Track({self.provider}:{self.id} {self.title!r})'
+
+
+def _track_from_json(data):
+    return Track.from_dict(json.loads(data))
+
+
+# Keyed by the track itself (tracks hash by identity)
+@lru_cache(maxsize=ENCODED_TRACKS)
+def _encoded(track):
+    return _encode_sorted(track.to_dict())
+
+
+# ==================== Artwork ====================
+def image_variants(provider, image):
+    """``[{'url', 'width'}]`` of full-size artwork ``image`` at each of the provider's sizes, smallest first.
+
+    None when the URL doesn't carry a size the provider's CDN rewrites.
+    Lists pick the smallest that fills their slot (srcset), the full player
+    uses ``image`` itself.
+    """
+    token = _IMAGE_SIZE_TOKENS.get(provider)
+    if not image or token is None or token[0] not in image:
+        return None
+    full, sized = token
+    return [{'url': image.replace(full, sized.format(width)), 'width': width} for width in IMAGE_SIZES[provider]]
+
+
+# ==================== Provider normalizers ====================
+def saavn_image(url):
+    """JioSaavn artwork at 500x500: good quality without slow loading"""
+    if not url:
+        return ''
+    return url.replace('150x150', '500x500').replace('50x50', '500x500')
+
+
+def saavn_artist(song, more_info):
+    """Singers of a JioSaavn song; search.getResults (api_version 4) lists them in an artist map"""
+    if 'singers' in more_info:
+        return more_info['singers']
+    primary = (more_info.get('artistMap') or {}).get('primary_artists') or []
+    names = [artist.get('name') for artist in primary if isinstance(artist, dict) and artist.get('name')]
+    return ', '.join(names) if names else song.get('subtitle', '')
+
+
+def saavn_track(song):
+    """Track from a JioSaavn song object (search, trending)"""
+    more_info = song.get('more_info', {})
+    return Track(
+        id=song.get('id'),
+        title=song.get('title', ''),
+        artist=saavn_artist(song, more_info),
+        album=more_info.get('album', ''),
+        image=saavn_image(song.get('image', '')),
+        duration=more_info.get('duration', ''),
+        year=song.get('year', ''),
+        language=song.get('language', ''),
+        has_320kbps=more_info.get('320kbps') == 'true',
+        provider='saavn',
+    )
+
+
+def youtube_track(video_id, title, artists, album, thumbnail, duration):
+    """Track from the fields of a YouTube Music search result"""
+    return Track(
+        id=video_id,
+        title=title,
+        artist=', '.join(artists),
+        album=album,
+        image=thumbnail.replace('w60-h60', 'w500-h500'),
+        duration=duration,
+        provider='youtube',
+    )
+
+
+# ==================== Serialization ====================
+def dumps(obj):
+    """JSON for a response payload, splicing in each Track's cached encoding"""
+    if isinstance(obj, Track):
+        return obj.json()
+    if isinstance(obj, list):
+        return '[' + ','.join(map(dumps, obj)) + ']'
+    if isinstance(obj, dict):
+        return '{' + ','.join(f'{_encode(key)}:{dumps(value)}' for key, value in sorted(obj.items())) + '}'
+    return _encode(obj)
+
+
+def encode_cached(value):
+    """Bytes for a shared cache entry: JSON tagged so decode_cached rebuilds Tracks and SearchPages
+
+    Tracks are spliced in from their own encoding. Anything else must be
+    plain JSON (str, number, None, list, dict with string keys).
+    """
+    return _encode_tagged(value).encode()
+
+
+def _encode_tagged(value):
+    if isinstance(value, Track):
+        return '{"track":' + value.json() + '}'
+    if isinstance(value, SearchPage):
+        return '{"page":[' + _encode_tagged(value.tracks) + ',' + _encode(value.next) + ']}'
+    if isinstance(value, list):
+        return '[' + ','.join(map(_encode_tagged, value)) + ']'
+    return '{"value":' + _encode(value) + '}'
+
+
+def decode_cached(data):
+    """The value encode_cached turned into ``data``"""
+    return _decode_tagged(_loads(data))
+
+
+def _decode_tagged(obj):
+    if isinstance(obj, list):
+        return [_decode_tagged(item) for item in obj]
+    (kind, value), = obj.items()
+    if kind == 'track':
+        return Track.from_dict(value)
+    if kind == 'page':
+        return SearchPage(_decode_tagged(value[0]), value[1])
+    return value
@@ -0,0 +1,213 @@
+"""Bounded pool of long-lived yt-dlp extractors for YouTube audio URLs."""
+import atexit
+import logging
+import os
+import random
+import string
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from http.cookies import SimpleCookie
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionPoolFull(Exception):
+    """Every worker is busy and the wait queue is full"""
+
+
+class ExtractionTimeout(Exception):
+    """An extraction job did not finish within the job timeout"""
+
+
+YDL_OPTS = {
+    'format': 'bestaudio/best',
+    'quiet': True,
+    'no_warnings': True,
+    'nocheckcertificate': True,
+    'socket_timeout': 30,
+    'http_chunk_size': 10485760,
+    'extractor_retries': 3,
+    'retries': 3,
+    'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'referer': 'https://www.youtube.com/',
+    'headers': {
+        'Accept': '*/*',
+        'Accept-Language': 'en',
+        'Accept-Encoding': 'gzip, deflate',
+        'Content-Type': 'application/json',
+        'Origin': 'https://www.youtube.com',
+        'Cookie': 'CONSENT=YES+1',
+    },
+    'extractor_args': {
+        'youtube': {
+            'player_client': ['android', 'web'],
+            'skip': ['hls', 'dash', 'translated_subs']
+        }
+    }
+}
+
+# One extractor per worker thread (or per worker process in process mode)
+_worker = threading.local()
+
+
+def _write_cookie_file():
+    """Write a Netscape cookie file with a fresh visitor identity"""
+    cookie = SimpleCookie()
+
+    # Use the CONSENT cookie that works
+    cookie['CONSENT'] = 'YES+1'
+
+    # Generate realistic visitor ID
+    cookie['VISITOR_INFO1_LIVE'] = ''.join(random.choices(string.ascii_letters + string.digits + '_-', k=22))
+
+    # Add PREF cookie
+    cookie['PREF'] = f'tz=America.New_York&f6={random.randint(10000, 99999)}&f5={random.randint(20000, 29999)}'
+
+    cookie_file = tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.txt')
+    cookie_file.write('# Netscape HTTP Cookie File\n')
+    cookie_file.write('# This is a generated file! Do not edit.\n\n')
+    for key in cookie:
+        # domain, include subdomains, path, secure, expires (year 2038), name, value
+        cookie_file.write(f'.youtube.com\tTRUE\t/\tTRUE\t2147483647\t{key}\t{cookie[key].value}\n')
+    cookie_file.close()
+    return cookie_file.name
+
+
+def _remove_file(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def _init_worker():
+    """Build this worker's extractor once; it is reused for every job"""
+    # yt-dlp is slow to import, so a worker that never plays YouTube never loads it
+    import yt_dlp
+
+    cookie_path = _write_cookie_file()
+    atexit.register(_remove_file, cookie_path)
+    _worker.ydl = yt_dlp.YoutubeDL(dict(YDL_OPTS, cookiefile=cookie_path))
+
+
+def _pick_audio_url(info):
+    """Pick the best audio URL out of a yt-dlp info dict"""
+    # Try to get the best audio format URL directly
+    if 'url' in info:
+        return info['url']
+
+    formats = info.get('formats') or []
+
+    # Filter audio-only formats and take the highest bitrate
+    audio_formats = [f for f in formats
+                     if f.get('acodec') != 'none' and f.get('vcodec') == 'none']
+    if audio_formats:
+        best_audio = max(audio_formats, key=lambda x: x.get('abr', 0) or 0)
+        return best_audio.get('url')
+
+    # Fallback: get any format with audio
+    for fmt in formats:
+        if fmt.get('acodec') != 'none' and fmt.get('url'):
+            return fmt['url']
+
+    return None
+
+
+def _noop():
+    pass
+
+
+def _extract(video_id):
+    if getattr(_worker, 'ydl', None) is None:
+        _init_worker()
+    try:
+        info = _worker.ydl.extract_info(f'https://www.youtube.com/watch?v={video_id}', download=False)
+        return _pick_audio_url(info)
+    except Exception:
+        logger.exception('yt-dlp extraction failed', extra={'video_id': video_id})
+        return None
+
+
+class YtDlpPool:
+    """Runs extractions on a fixed set of warm workers.
+
+    At most ``workers + queue_size`` jobs are admitted at once; beyond that
+    ``extract`` fails fast with ExtractionPoolFull instead of queueing, so a
+    burst of YouTube plays cannot tie up the threads serving searches.
+    """
+
+    def __init__(self, workers=4, queue_size=16, timeout=20.0, mode='thread'):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.mode = mode
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._jobs = 0  # admitted and not finished
+        self._jobs_lock = threading.Lock()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    if self.mode == 'process':
+                        self._executor = ProcessPoolExecutor(
+                            max_workers=self.workers, initializer=_init_worker)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.workers, initializer=_init_worker,
+                            thread_name_prefix='ytdlp')
+        return self._executor
+
+    def submit(self, video_id):
+        """Queue an extraction and return its concurrent.futures.Future.
+
+        Raises ExtractionPoolFull instead of queueing beyond the bound. The
+        caller is responsible for the job timeout (see ``extract``).
+        """
+        if not self._slots.acquire(blocking=False):
+            raise ExtractionPoolFull(f'yt-dlp pool is saturated ({self.workers} workers, {self.queue_size} queued)')
+
+        with self._jobs_lock:
+            self._jobs += 1
+        try:
+            future = self._get_executor().submit(_extract, video_id)
+        except Exception:
+            self._job_done()
+            raise
+        future.add_done_callback(lambda _: self._job_done())
+        return future
+
+    def _job_done(self):
+        with self._jobs_lock:
+            self._jobs -= 1
+        self._slots.release()
+
+    def idle_workers(self):
+        """Workers a new job would start on right away, without queueing"""
+        with self._jobs_lock:
+            return max(self.workers - self._jobs, 0)
+
+    def extract(self, video_id):
+        """Return the best audio URL for ``video_id``, or None if there is none"""
+        future = self.submit(video_id)
+        try:
+            with metrics.timed('ytdlp_extract'):
+                return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # Drop it if it never started; a running job finishes in the background
+            future.cancel()
+            raise ExtractionTimeout(f'yt-dlp extraction of {video_id} took longer than {self.timeout}s')
+
+    def warm(self):
+        """Start one worker now so the first YouTube play doesn't pay for loading yt-dlp"""
+        self._get_executor().submit(_noop).result()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,160 @@
+"""Search results out of youtubei responses, by precompiled paths.
+
+A youtubei search answer buries the few fields a track needs under deep
+renderer trees. The paths to them are declared once below and compiled into
+getters (see compile_path), instead of chains of ``.get(..., {})`` calls
+that build a default at every step.
+
+When YouTube changes a layout, a path stops resolving. That is counted as
+an extraction failure for the field (exported on /metrics, see
+render_metrics) and the item is skipped or the field left empty; nothing is
+raised or logged per item.
+"""
+import threading
+from collections import defaultdict
+
+from track import youtube_track
+
+
+def compile_path(spec):
+    """Getter for the value at ``spec`` ('a.0.b': dict keys, and list indices for all-digit parts).
+
+    The getter is generated as straight-line code, ``data['a'][0]['b']``
+    inside one try block, the way dataclasses builds its methods: a walk
+    costs one Python call, the subscripts all run in C. It returns
+    ``default`` (None) when any step is missing or of the wrong type.
+    """
+    steps = ''.join(f'[{int(part)}]' if part.isdigit() else f'[{part!r}]' for part in spec.split('.'))
+    source = (
+        'def get(data, default=None):\n'
+        '    try:\n'
+        f'        return data{steps}\n'
+        '    except (KeyError, IndexError, TypeError):\n'
+        '        return default\n'
+    )
+    namespace = {}
+    exec(source, namespace)
+    get = namespace['get']
+    get.__name__ = get.__qualname__ = f'get_{spec}'
+    return get
+
+
+# Shelves of the first tab; the songs are in the one with a musicShelfRenderer
+SHELVES = compile_path('contents.tabbedSearchResultsRenderer.tabs.0.tabRenderer.content.sectionListRenderer.contents')
+# A continuation answer holds just the songs shelf's next items, in the same
+# layout as a musicShelfRenderer
+CONTINUATION_SHELF = compile_path('continuationContents.musicShelfContinuation')
+# Of a songs shelf: the token for its next page, absent on the last one
+NEXT_CONTINUATION = compile_path('continuations.0.nextContinuationData.continuation')
+RENDERER = compile_path('musicResponsiveListItemRenderer')
+
+# Fields of a musicResponsiveListItemRenderer. The first flex column is the
+# title; the second is runs of artists, album and duration between separators.
+VIDEO_ID = compile_path('playlistItemData.videoId')
+TITLE = compile_path('flexColumns.0.musicResponsiveListItemFlexColumnRenderer.text.runs.0.text')
+SUBTITLE = compile_path('flexColumns.1.musicResponsiveListItemFlexColumnRenderer.text.runs')
+THUMBNAIL = compile_path('thumbnail.musicThumbnailRenderer.thumbnail.thumbnails.0.url')
+# Of a subtitle run: its text, and (under navigationEndpoint) what its link opens,
+# which tells an artist from an album
+TEXT = compile_path('text')
+PAGE_TYPE = compile_path('browseEndpoint.browseEndpointContextSupportedConfigs.browseEndpointContextMusicConfig.pageType')
+
+_failures = defaultdict(int)  # field -> count
+_failures_lock = threading.Lock()
+
+
+def _fail(field):
+    with _failures_lock:
+        _failures[field] += 1
+
+
+def failure_counts():
+    with _failures_lock:
+        return dict(_failures)
+
+
+def parse_search_page(data):
+    """(tracks, continuation) of a songs search or of one of its continuations.
+
+    ``continuation`` is the token of the next page, None on the last.
+    """
+    shelf = CONTINUATION_SHELF(data)
+    if shelf is None:
+        shelves = SHELVES(data)
+        if not isinstance(shelves, list):
+            _fail('shelves')
+            return [], None
+        shelf = next((section['musicShelfRenderer'] for section in shelves
+                      if isinstance(section, dict) and 'musicShelfRenderer' in section), None)
+        if shelf is None:
+            return [], None
+
+    items = shelf.get('contents') if isinstance(shelf, dict) else None
+    if not isinstance(items, list):
+        _fail('shelf')
+        return [], None
+    results = []
+    for item in items:
+        track = parse_item(item)
+        if track is not None:
+            results.append(track)
+
+    continuation = NEXT_CONTINUATION(shelf)
+    return results, continuation if isinstance(continuation, str) else None
+
+
+def parse_item(item):
+    """Track from one shelf item, or None when it has no video id"""
+    renderer = RENDERER(item)
+    if not isinstance(renderer, dict):
+        _fail('item')
+        return None
+
+    video_id = VIDEO_ID(renderer)
+    if not video_id or not isinstance(video_id, str):
+        _fail('video_id')
+        return None
+
+    title = TITLE(renderer)
+    if not isinstance(title, str):
+        _fail('title')
+        title = ''
+
+    artists = []
+    album = ''
+    duration = ''
+    runs = SUBTITLE(renderer)
+    if not isinstance(runs, list):
+        _fail('subtitle')
+        runs = ()
+    for run in runs:
+        text = TEXT(run)
+        if not isinstance(text, str):
+            continue
+        endpoint = run.get('navigationEndpoint')
+        if endpoint is not None:
+            page_type = PAGE_TYPE(endpoint)
+            if page_type == 'MUSIC_PAGE_TYPE_ARTIST':
+                artists.append(text)
+            elif page_type == 'MUSIC_PAGE_TYPE_ALBUM':
+                album = text
+        elif ':' in text:
+            # Separators (' • ') and the duration are plain runs without a link
+            minutes, _, seconds = text.partition(':')
+            if minutes.strip().isdecimal() and seconds.strip().isdecimal():
+                duration = str(int(minutes) * 60 + int(seconds))
+
+    thumbnail = THUMBNAIL(renderer)
+    if not isinstance(thumbnail, str):
+        _fail('thumbnail')
+        thumbnail = ''
+
+    return youtube_track(video_id, title, artists, album, thumbnail, duration)
+
+
+def render_metrics():
+    """Prometheus counter of youtubei fields that could not be extracted"""
+    lines = ['# TYPE ytm_extraction_failures_total counter']
+    for field, count in sorted(failure_counts().items()):
+        lines.append(f'ytm_extraction_failures_total{{field="{field}"}} {count}')
+    return lines